@@ -6,10 +6,38 @@ Working OSINT Platform API - bypass container issues
 import sys
 import os
 import asyncio
+import base64
+import bisect
+import contextvars
+import csv
+import functools
+import gzip
 import hashlib
+import heapq
+import hmac
+import inspect
+import itertools
+import mimetypes
+import mmap
+import multiprocessing
+import queue
+import random
+import re
 import secrets
+import shutil
+import socket
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime, timedelta
+from array import array
+from datetime import date, datetime, timedelta
 from typing import Dict, Any, Optional, List
 import json
 
@@ -40,6 +68,225 @@ API_CONFIG = {
     "MAX_REQUESTS_PER_HOUR": 100
 }
 
+# Análisis masivo de dominios (/api/v1/domain/bulk-analyze)
+BULK_ANALYSIS_CONFIG = {
+    "MAX_DOMAINS": 5000,        # Máximo de dominios por petición
+    "DEFAULT_CONCURRENCY": 20,  # Dominios analizados a la vez
+    "MAX_CONCURRENCY": 100,
+    "DOMAIN_TIMEOUT": 10.0,     # Segundos por dominio antes de marcarlo como fallido
+    "MAX_DOMAIN_TIMEOUT": 60.0
+}
+
+# Base de datos de investigaciones (SQLite en modo WAL)
+DATABASE_CONFIG = {
+    "PATH": "data/investigations.sqlite3",
+    "POOL_SIZE": 8,             # Conexiones reutilizadas entre peticiones
+    "BUSY_TIMEOUT_MS": 5000,
+    "STATEMENT_CACHE": 256      # Sentencias preparadas cacheadas por conexión
+}
+
+# Tokens firmados (HMAC con SECRET_KEY), válidos en cualquier worker
+TOKEN_CONFIG = {
+    "TTL_SECONDS": 8 * 3600,      # Duración de una sesión
+    "VERIFIED_CACHE_SIZE": 4096   # Tokens ya verificados que se recuerdan (LRU)
+}
+
+# Hash de contraseñas (PBKDF2) en un pool de hilos dedicado
+PASSWORD_HASH_CONFIG = {
+    "ITERATIONS": 100000,  # Se puede subir: los hashes antiguos se re-generan al hacer login
+    "WORKERS": 4,          # Hashes PBKDF2 simultáneos como máximo
+    "MAX_QUEUE": 64        # Trabajos en espera antes de responder 503
+}
+
+# Series temporales de actividad (buffers circulares por granularidad)
+ROLLUP_CONFIG = {
+    # Buckets que se conservan por granularidad
+    "RETENTION": {"day": 1096, "week": 160, "month": 60, "quarter": 24},
+    "MAX_POINTS": 250  # Puntos máximos por gráfica; rangos mayores se agregan en el servidor
+}
+
+# Registro de actividad (segmentos de solo-anexado en disco)
+ACTIVITY_LOG_CONFIG = {
+    "DIRECTORY": "data/activity",
+    "SEGMENT_BYTES": 16 * 1024 * 1024,  # Tamaño a partir del cual se abre un segmento nuevo
+    "MAX_SEGMENTS": 64,                 # Segmentos conservados; los más antiguos se borran
+    "BATCH_SIZE": 256,                  # Eventos pendientes que fuerzan una escritura inmediata
+    "FLUSH_INTERVAL": 0.5,              # Segundos máximos que un evento espera en memoria
+    "FSYNC": False,                     # fsync tras cada lote (más durable, más lento)
+    "PAGE_SIZE": 50,
+    "MAX_PAGE_SIZE": 500
+}
+
+# Informes personalizados (/api/v1/reports/custom)
+CUSTOM_REPORT_CONFIG = {
+    "CACHE_ENTRIES": 256,  # Resultados cacheados (LRU) hasta que cambian los datos del usuario
+    "MAX_METRICS": 32,
+    "MAX_FILTERS": 32
+}
+
+# Archivos estáticos (static/dist se genera con build_static.py)
+STATIC_CONFIG = {
+    "SOURCE": "static",
+    "BUILD": "static/dist",
+    "IMMUTABLE_MAX_AGE": 365 * 24 * 3600  # Archivos con hash en el nombre: nunca cambian
+}
+
+# Exportación de informes (cola de trabajos, ficheros generados en procesos aparte)
+EXPORT_CONFIG = {
+    "DIRECTORY": "data/exports",
+    "WORKERS": 2,                 # Procesos generando ficheros a la vez
+    "MAX_QUEUE": 32,              # Trabajos en espera antes de responder 503
+    "CHUNK_ROWS": 500,            # Filas leídas y escritas por bloque
+    "RETENTION_SECONDS": 24 * 3600,
+    "FORMATS": {"csv": "text/csv", "json": "application/json", "pdf": "application/pdf"},
+    "ALIASES": {"excel": "csv"}   # Excel abre el CSV directamente
+}
+
+# Límite de peticiones entrantes por usuario y ruta, y control de admisión global
+INBOUND_LIMIT_CONFIG = {
+    "ENABLED": True,
+    "WINDOW_SECONDS": 60,   # Ventana deslizante
+    "DEFAULT_LIMIT": 300,   # Peticiones por usuario y ventana para rutas sin límite propio
+    # Límites por prefijo de ruta (cada prefijo tiene su propia ventana por usuario)
+    "ROUTE_LIMITS": {
+        "/api/v1/image/analyze": 10,
+        "/api/v1/image/bulk-analyze": 3,
+        "/api/v1/domain/bulk-analyze": 3,
+        "/api/v1/domain/profile": 30,
+        "/auth/login": 10,
+        "/auth/register": 5
+    },
+    "EXEMPT_PREFIXES": ["/health", "/static"],
+    "MAX_IN_FLIGHT": 256,        # Peticiones simultáneas antes de responder 503
+    "MAX_LOOP_LAG_MS": 250,      # Retraso del event loop antes de responder 503
+    "LAG_PROBE_INTERVAL": 0.5
+}
+
+# ETag / If-None-Match para rutas GET que se consultan una y otra vez
+CONDITIONAL_GET_CONFIG = {
+    # Prefijo -> modo. "versioned": ETag a partir de la versión de datos del usuario
+    # (304 sin ejecutar el handler); "hash": ETag a partir del cuerpo; None: sin ETag
+    "ROUTES": {
+        "/api/v1/reports/": "versioned",
+        "/api/v1/reports/export": None,
+        "/api/v1/reports/download": None,
+        "/api/v1/investigations": "versioned",
+        "/auth/profile": "hash"
+    },
+    "CACHE_CONTROL": "private, no-cache",  # El navegador guarda la respuesta pero siempre revalida
+    "MAX_BUFFER_BYTES": 2 * 1024 * 1024    # Respuestas mayores se envían sin ETag en modo "hash"
+}
+
+# Resolución DNS propia (UDP con reintento por TCP) para consultas de dominios y emails
+DNS_CONFIG = {
+    "UPSTREAMS": [],             # Resolvedores recursivos; vacío = los de /etc/resolv.conf
+    "PORT": 53,
+    "TIMEOUT": 2.0,              # Segundos por intento
+    "ATTEMPTS": 3,               # Intentos por consulta, rotando entre upstreams
+    "SOCKETS_PER_UPSTREAM": 4,   # Sockets UDP compartidos por todas las consultas
+    "MAX_IN_FLIGHT": 512,        # Consultas simultáneas en la red
+    "CACHE_ENTRIES": 100000,
+    "MAX_TTL": 86400,            # Tope del TTL de las respuestas positivas
+    "NEGATIVE_TTL": 300          # Tope (y valor por defecto) para NXDOMAIN / sin registros
+}
+
+# Cliente WHOIS (puerto 43) con seguimiento de referencias registro -> registrador
+WHOIS_CONFIG = {
+    "BOOTSTRAP_SERVER": "whois.iana.org",  # Indica el servidor WHOIS de cada TLD
+    "SERVERS": {},               # TLD -> servidor ("host" o "host:puerto"), se salta la consulta a IANA
+    "PORT": 43,
+    "TIMEOUT": 10.0,
+    "MAX_PER_SERVER": 2,         # Consultas simultáneas por servidor WHOIS (limitan mucho)
+    "MIN_INTERVAL": 0.5,         # Segundos mínimos entre consultas al mismo servidor
+    "MAX_REFERRALS": 2,
+    "MAX_RESPONSE_BYTES": 256 * 1024,
+    "CACHE_TTL": 86400,          # Los datos WHOIS cambian poco: 24 horas
+    "CACHE_ENTRIES": 20000
+}
+
+# Enumeración de subdominios por fuerza bruta (wordlist + resolvedor propio)
+SUBDOMAIN_CONFIG = {
+    "WORDLIST": "data/subdomains.txt",  # Una etiqueta por línea; si no existe, lista integrada
+    "DEFAULT_CONCURRENCY": 500,  # Consultas DNS simultáneas por enumeración
+    "MAX_CONCURRENCY": 2000,
+    "TIMEOUT": 1.0,              # Más corto que DNS_CONFIG: un fallo aquí solo pierde una etiqueta
+    "ATTEMPTS": 2,
+    "SOCKETS": 16,               # Sockets UDP por upstream para repartir la carga
+    "CACHE_ENTRIES": 50000,
+    "WILDCARD_PROBES": 3,        # Etiquetas aleatorias para detectar DNS comodín
+    "PROGRESS_INTERVAL": 1.0     # Segundos entre eventos de progreso en el stream
+}
+
+# Índice de subdominios a partir de volcados de Certificate Transparency (ingest_ct.py)
+CT_INDEX_CONFIG = {
+    "PATH": "data/ct_index.bin",
+    "PUBLIC_SUFFIX_LIST": "data/public_suffix_list.dat",  # publicsuffix.org; si no existe, lista integrada
+    "BUCKETS": 256,              # Ficheros temporales de la ingesta (memoria ~ 1/BUCKETS del volcado)
+    "LOOKUP_LIMIT": 10000        # Nombres máximos devueltos por dominio
+}
+
+# Almacén local de DNS pasivo (load_passive_dns.py) para dominios relacionados
+PASSIVE_DNS_CONFIG = {
+    "PATH": "data/passive_dns.bin",
+    "BUCKETS": 256,              # Ficheros temporales por tabla, 2 x BUCKETS abiertos (memoria ~ 1/BUCKETS de las filas)
+    "LOOKUP_LIMIT": 1000,        # Filas máximas por dominio o por IP (las más recientes)
+    "MAX_VALUE_LENGTH": 1024,    # Los TXT se recortan a esta longitud
+    "ACTIVE_DAYS": 30,           # Visto hace menos de esto = relación activa
+    "MAX_RELATED_ADDRESSES": 20  # IPs consultadas para same_ip y para historical
+}
+
+# Caché en memoria de resultados de inteligencia de dominios
+DOMAIN_CACHE_CONFIG = {
+    "MAX_ENTRIES": 10000,  # Entradas (faceta, dominio) antes de expulsar por LRU
+    "DEFAULT_TTL": 300,    # Segundos, para facetas sin TTL propio
+    "TTL_SECONDS": {
+        "basic_info": 900,
+        "whois": 86400,
+        "dns": 300,
+        "subdomains": 3600,
+        "technology": 3600,
+        "security": 1800,
+        "geolocation": 3600,
+        "related": 3600,
+        "bulk_summary": 900
+    }
+}
+
+# Clientes HTTP compartidos por proveedor (pool de conexiones keep-alive)
+PROVIDER_HTTP_CONFIG = {
+    "CONNECT_TIMEOUT": 5.0,
+    "READ_TIMEOUT": 15.0,
+    "KEEPALIVE_EXPIRY": 30.0,
+    "PROVIDERS": {
+        "hibp": {"base_url": "https://haveibeenpwned.com/api/v3", "max_connections": 4, "http2": True},
+        "hunter": {"base_url": "https://api.hunter.io/v2", "max_connections": 8, "http2": True},
+        "shodan": {"base_url": "https://api.shodan.io", "max_connections": 4, "http2": False},
+        "virustotal": {"base_url": "https://www.virustotal.com/api/v3", "max_connections": 4, "http2": True}
+    }
+}
+
+# Cuota saliente por proveedor (token bucket sobre MAX_REQUESTS_PER_HOUR)
+PROVIDER_QUOTA_CONFIG = {
+    "BURST": 10,                   # Peticiones que se pueden enviar de golpe
+    "INTERACTIVE_MAX_WAIT": 30.0,  # Segundos; si la espera estimada es mayor se responde 503
+    "DEFAULT_RETRY_AFTER": 60.0,   # Pausa tras un 429 sin cabecera Retry-After
+    "PER_HOUR": {}                 # Opcional: {"hibp": 600} para sobrescribir MAX_REQUESTS_PER_HOUR
+}
+
+# Caché persistente (SQLite) de respuestas de proveedores de pago
+PROVIDER_CACHE_CONFIG = {
+    "PATH": "data/provider_cache.sqlite3",
+    "MAX_BYTES": 64 * 1024 * 1024,  # Tamaño máximo de payloads comprimidos
+    "DEFAULT_TTL": 3600,
+    # TTL en segundos por proveedor y endpoint ("default" aplica al resto)
+    "TTL_SECONDS": {
+        "hibp": {"default": 86400, "breachedaccount": 86400},
+        "hunter": {"default": 7 * 86400, "people/find": 7 * 86400},
+        "shodan": {"default": 86400, "dns/domain": 86400},
+        "virustotal": {"default": 6 * 3600, "domains": 6 * 3600}
+    }
+}
+
 # Función para verificar si las APIs están configuradas
 def check_api_config():
     """Verifica si las APIs están configuradas correctamente"""
@@ -58,24 +305,44 @@ def check_api_config():
     return len(missing_keys) == 0
 
 try:
-    from fastapi import FastAPI, HTTPException, Depends, status
+    from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
     from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
     from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.staticfiles import StaticFiles
-    from fastapi.responses import FileResponse
+    from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+    from fastapi.datastructures import DefaultPlaceholder
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.routing import APIRoute
     from pydantic import BaseModel, EmailStr
     import uvicorn
     import httpx
-    import requests
 except ImportError as e:
     print(f"❌ Missing dependencies: {e}")
-    print("Try: pip install fastapi uvicorn httpx requests pydantic[email]")
+    print("Try: pip install fastapi uvicorn httpx[http2] pydantic[email]")
     sys.exit(1)
 
-# Simple in-memory storage (replace with database in production)
+# HTTP/2 opcional: httpx lo necesita instalado como extra (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Serialización JSON rápida opcional (pip install orjson); sin ella se usa json de la stdlib
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Límite de ficheros abiertos (solo Unix); lo usan las cargas masivas con ficheros temporales
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Caché en memoria de la tabla users (ver UserRepository)
 users_db: Dict[str, Dict] = {}
-investigations_db: Dict[str, Dict] = {}
-auth_tokens: Dict[str, str] = {}
 
 # Security
 security = HTTPBearer()
@@ -96,29 +363,180 @@ class EmailInvestigation(BaseModel):
     check_breaches: bool = True
     check_social: bool = True
 
-class Investigation(BaseModel):
-    name: str
-    description: Optional[str] = None
-    type: str = "email"
+# JSON responses
+def encode_json(content: Any) -> bytes:
+    """Encode plain JSON data (dict/list/str/numbers/bool/None/datetime); TypeError on anything else"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=json_default).encode()
+
+def json_default(value: Any) -> Any:
+    # Igual que orjson: fechas en ISO 8601, el resto no es JSON plano
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def render_json(content: Any) -> bytes:
+    """Encode a response payload, going through jsonable_encoder only when it is not plain JSON data"""
+    try:
+        return encode_json(content)
+    except TypeError:
+        return encode_json(jsonable_encoder(content))
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+class FastJSONRoute(APIRoute):
+    """Route whose dict/list results skip FastAPI's jsonable_encoder pass.
+
+    Only applies to async endpoints without a response model or return
+    annotation, since those would need validation; their plain payloads go
+    straight to FastJSONResponse, other results take the normal path.
+    """
+    
+    def __init__(self, path: str, endpoint, **kwargs):
+        response_model = kwargs.get("response_model")
+        if (
+            asyncio.iscoroutinefunction(endpoint)
+            and (response_model is None or isinstance(response_model, DefaultPlaceholder))
+            and inspect.signature(endpoint).return_annotation is inspect.Signature.empty
+        ):
+            endpoint = self._fast_endpoint(endpoint, kwargs.get("status_code") or 200)
+        super().__init__(path, endpoint, **kwargs)
+    
+    @staticmethod
+    def _fast_endpoint(endpoint, status_code: int):
+        @functools.wraps(endpoint)
+        async def fast_endpoint(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            if isinstance(result, (dict, list)):
+                return FastJSONResponse(result, status_code=status_code)
+            return result
+        return fast_endpoint
+
+class NDJSONResponse(StreamingResponse):
+    """Streams an async or plain iterable of JSON items, one line per item"""
+    
+    media_type = "application/x-ndjson"
+    
+    def __init__(self, items, **kwargs):
+        kwargs.setdefault("headers", {"X-Accel-Buffering": "no"})
+        super().__init__(self._lines(items), media_type=self.media_type, **kwargs)
+    
+    @staticmethod
+    async def _lines(items):
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                yield render_json(item) + b"\n"
+        else:
+            for item in items:
+                yield render_json(item) + b"\n"
 
 # Create FastAPI app
 app = FastAPI(
     title="OSINT Intelligence Platform",
     description="Professional OSINT platform for email, social media, and domain intelligence",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
+app.router.route_class = FastJSONRoute
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+class StaticAssets:
+    """ASGI app for /static: the build output of build_static.py when present, else the sources.
+
+    Built files are served precompressed (br or gzip, per Accept-Encoding).
+    Fingerprinted names listed in the build manifest are cached as
+    immutable; everything else is revalidated with its ETag.
+    """
+    
+    ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+    
+    def __init__(self, source: str, build: str, immutable_max_age: int):
+        self.source = Path(source).resolve()
+        self.build = Path(build).resolve()
+        self.immutable_max_age = immutable_max_age
+        self._immutable: set = set()
+        self._manifest_mtime: Optional[float] = None
+    
+    def _load_manifest(self) -> bool:
+        """Pick up a (re)built manifest; False when there is no build"""
+        try:
+            mtime = (self.build / "manifest.json").stat().st_mtime
+        except FileNotFoundError:
+            self._immutable, self._manifest_mtime = set(), None
+            return False
+        if mtime != self._manifest_mtime:
+            manifest = json.loads((self.build / "manifest.json").read_text(encoding="utf-8"))
+            self._immutable, self._manifest_mtime = set(manifest["assets"].values()), mtime
+        return True
+    
+    @staticmethod
+    def _resolve(root: Path, path: str) -> Optional[Path]:
+        candidate = (root / path).resolve()
+        if candidate.is_relative_to(root) and candidate.is_file():
+            return candidate
+        return None
+    
+    @staticmethod
+    def _accepted_encodings(accept_encoding: str) -> set:
+        accepted = set()
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(name.strip().lower())
+        return accepted
+    
+    def response(self, path: str, headers) -> Response:
+        path = path.lstrip("/") or "index.html"
+        built = self._resolve(self.build, path) if self._load_manifest() else None
+        file = built or self._resolve(self.source, path)
+        if file is None:
+            return PlainTextResponse("Not Found", status_code=404)
+        
+        served, encoding = file, None
+        if built is not None:
+            accepted = self._accepted_encodings(headers.get("accept-encoding", ""))
+            for name, suffix in self.ENCODINGS:
+                variant = file.with_name(file.name + suffix)
+                if name in accepted and variant.is_file():
+                    served, encoding = variant, name
+                    break
+        
+        stat_result = served.stat()
+        response_headers = {
+            "Cache-Control": (
+                f"public, max-age={self.immutable_max_age}, immutable"
+                if built is not None and file.name in self._immutable else "no-cache"
+            ),
+            "ETag": f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"',
+            "Vary": "Accept-Encoding"
+        }
+        if encoding:
+            response_headers["Content-Encoding"] = encoding
+        if response_headers["ETag"] in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=response_headers)
+        return FileResponse(
+            served,
+            media_type=mimetypes.guess_type(file.name)[0] or "application/octet-stream",
+            headers=response_headers,
+            stat_result=stat_result
+        )
+    
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+        else:
+            # Según la versión de Starlette, Mount deja la ruta completa o solo el resto
+            path, root_path = scope["path"], scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+            response = self.response(path, headers)
+        await response(scope, receive, send)
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+static_assets = StaticAssets(STATIC_CONFIG["SOURCE"], STATIC_CONFIG["BUILD"], STATIC_CONFIG["IMMUTABLE_MAX_AGE"])
+app.mount("/static", static_assets, name="static")
 
 # Verificar configuración de APIs al iniciar
 print("🚀 Iniciando OSINT Platform...")
@@ -129,129 +547,1202 @@ else:
     print(f"🔑 APIs configuradas: {'✅' if api_status else '❌'}")
 
 # Utility functions
-def hash_password(password: str) -> str:
-    """Hash password with salt"""
+LEGACY_PASSWORD_ITERATIONS = 100000  # Hashes "salt:hash" creados antes del formato con prefijo
+
+def hash_password(password: str, iterations: Optional[int] = None) -> str:
+    """Hash password with salt as pbkdf2_sha256$<iterations>$<salt>$<hash>"""
+    iterations = iterations or PASSWORD_HASH_CONFIG["ITERATIONS"]
     salt = secrets.token_hex(16)
-    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-    return f"{salt}:{pwd_hash.hex()}"
+    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations)
+    return f"pbkdf2_sha256${iterations}${salt}${pwd_hash.hex()}"
+
+def parse_password_hash(hashed: str) -> tuple:
+    """Split a stored hash into (iterations, salt, hex digest)"""
+    if hashed.startswith("pbkdf2_sha256$"):
+        _, iterations, salt, pwd_hash = hashed.split('$')
+        return int(iterations), salt, pwd_hash
+    salt, pwd_hash = hashed.split(':')
+    return LEGACY_PASSWORD_ITERATIONS, salt, pwd_hash
 
 def verify_password(password: str, hashed: str) -> bool:
     """Verify password against hash"""
     try:
-        salt, pwd_hash = hashed.split(':')
-        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex() == pwd_hash
-    except:
+        iterations, salt, pwd_hash = parse_password_hash(hashed)
+    except (ValueError, AttributeError):
+        return False
+    candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    return hmac.compare_digest(candidate, pwd_hash)
+
+def password_needs_rehash(hashed: str) -> bool:
+    """True when a stored hash uses fewer iterations than currently configured"""
+    try:
+        return parse_password_hash(hashed)[0] < PASSWORD_HASH_CONFIG["ITERATIONS"]
+    except (ValueError, AttributeError):
         return False
 
+# PBKDF2 libera el GIL, así que un pool de hilos da paralelismo real sin bloquear el event loop
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONFIG["WORKERS"],
+    thread_name_prefix="pbkdf2"
+)
+password_hash_stats = {"queued": 0, "running": 0, "completed": 0, "rejected": 0}
+password_hash_slots: Optional[asyncio.Semaphore] = None
+
+async def run_password_job(func, *args):
+    """Run a hashing function on the PBKDF2 pool, capping concurrent and queued jobs"""
+    global password_hash_slots
+    if password_hash_slots is None:
+        password_hash_slots = asyncio.Semaphore(PASSWORD_HASH_CONFIG["WORKERS"])
+    if password_hash_stats["queued"] >= PASSWORD_HASH_CONFIG["MAX_QUEUE"]:
+        password_hash_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication service busy, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    
+    password_hash_stats["queued"] += 1
+    try:
+        await password_hash_slots.acquire()
+    finally:
+        password_hash_stats["queued"] -= 1
+    password_hash_stats["running"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_hash_executor, func, *args)
+    finally:
+        password_hash_stats["running"] -= 1
+        password_hash_stats["completed"] += 1
+        password_hash_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_job(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await run_password_job(verify_password, password, hashed)
+
+# Tokens: base64url(payload JSON) + "." + base64url(HMAC-SHA256(SECRET_KEY, payload))
+# Las revocaciones viven en SQLite (tabla revoked_tokens, compartida por los workers);
+# revoked_tokens solo guarda en caché las que este worker ya ha visto
+revoked_tokens: Dict[str, float] = {}  # jti -> exp, solo hasta que el token caduca
+verified_tokens: "OrderedDict[str, Dict]" = OrderedDict()
+
+def b64url_encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def sign_token_payload(payload_b64: str) -> str:
+    return b64url_encode(hmac.new(SECRET_KEY.encode(), payload_b64.encode(), hashlib.sha256).digest())
+
 def create_token(user_id: str) -> str:
-    """Create simple auth token"""
-    token = secrets.token_urlsafe(32)
-    auth_tokens[token] = user_id
-    return token
+    """Create a signed auth token for a users_db key, expiring after TOKEN_CONFIG TTL"""
+    now = int(time.time())
+    payload = {
+        "sub": user_id,
+        "uid": users_db[user_id]["id"],
+        "iat": now,
+        "exp": now + TOKEN_CONFIG["TTL_SECONDS"],
+        "jti": secrets.token_urlsafe(9)
+    }
+    payload_b64 = b64url_encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{payload_b64}.{sign_token_payload(payload_b64)}"
+
+def verify_token(token: str, check_revoked: bool = True) -> Optional[Dict]:
+    """Return the payload of a valid, unexpired, unrevoked token, or None.
+
+    The revocation check reads the shared store (blocking) even for cached
+    verifications; `check_revoked=False` skips it and only proves who
+    signed in.
+    """
+    now = time.time()
+    payload = verified_tokens.get(token)
+    if payload is None:
+        payload_b64, _, signature = token.partition(".")
+        # Se comparan bytes: compare_digest rechaza str con caracteres no ASCII (TypeError)
+        expected = sign_token_payload(payload_b64).encode()
+        if not signature or not hmac.compare_digest(signature.encode("utf-8"), expected):
+            return None
+        try:
+            payload = json.loads(b64url_decode(payload_b64))
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        verified_tokens[token] = payload
+        if len(verified_tokens) > TOKEN_CONFIG["VERIFIED_CACHE_SIZE"]:
+            verified_tokens.popitem(last=False)
+    else:
+        verified_tokens.move_to_end(token)
+    
+    if payload.get("exp", 0) <= now or (check_revoked and revoked_token_store.is_revoked(payload.get("jti"))):
+        verified_tokens.pop(token, None)
+        return None
+    return payload
+
+def revoke_token(token: str):
+    """Add a token to the shared denylist until it would have expired anyway (blocking)"""
+    payload = verify_token(token)
+    if payload is None:
+        return
+    revoked_token_store.revoke(payload["jti"], payload["exp"])
+    verified_tokens.pop(token, None)
+
+def resolve_user_from_token(token: str, load: bool = False, check_revoked: bool = True) -> Optional[Dict]:
+    """Return the user a token belongs to, or None; `load` also looks up users missing from the cache (blocking)"""
+    payload = verify_token(token, check_revoked)
+    if payload is None:
+        return None
+    user = cached_user(payload["sub"]) if load else users_db.get(payload["sub"])
+    if user is None or user["id"] != payload.get("uid"):
+        return None
+    return user
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict:
     """Get current user from token"""
-    token = credentials.credentials
-    user_id = auth_tokens.get(token)
-    if not user_id or user_id not in users_db:
+    # Dependencia síncrona: FastAPI la ejecuta en el threadpool, puede consultar la base de datos
+    user = resolve_user_from_token(credentials.credentials, load=True)
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid token")
-    return users_db[user_id]
+    return user
+
+# === INBOUND RATE LIMITING & ADMISSION CONTROL ===
+
+class SlidingWindowLimiter:
+    """Sliding-window log limiter: at most `limit` hits per key in any `window` seconds"""
+    
+    def __init__(self, window: float):
+        self.window = window
+        self._hits: Dict[tuple, deque] = {}
+        self._calls = 0
+    
+    def hit(self, key: tuple, limit: int) -> tuple:
+        """Record a hit; returns (allowed, remaining, retry_after_seconds)"""
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        
+        self._calls += 1
+        if self._calls % 1000 == 0:
+            self._purge(now)
+        
+        if len(hits) >= limit:
+            return False, 0, hits[0] + self.window - now
+        hits.append(now)
+        return True, limit - len(hits), 0.0
+    
+    def _purge(self, now: float):
+        stale = [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - self.window]
+        for key in stale:
+            del self._hits[key]
+
+class EventLoopLagMonitor:
+    """Measures how late a periodic sleep wakes up, as a proxy for event-loop saturation"""
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _probe(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = (time.monotonic() - started - self.interval) * 1000
+            # Media móvil para no reaccionar a un único pico
+            self.lag_ms = max(0.0, 0.7 * self.lag_ms + 0.3 * lag)
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+inbound_limiter = SlidingWindowLimiter(INBOUND_LIMIT_CONFIG["WINDOW_SECONDS"])
+loop_lag_monitor = EventLoopLagMonitor(INBOUND_LIMIT_CONFIG["LAG_PROBE_INTERVAL"])
+admission_stats = {"in_flight": 0, "rate_limited": 0, "shed": 0}
+
+def inbound_route_rule(path: str) -> tuple:
+    """Longest configured prefix matching `path` and its limit, else the default bucket"""
+    best = None
+    for prefix in INBOUND_LIMIT_CONFIG["ROUTE_LIMITS"]:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    if best is None:
+        return "*", INBOUND_LIMIT_CONFIG["DEFAULT_LIMIT"]
+    return best, INBOUND_LIMIT_CONFIG["ROUTE_LIMITS"][best]
+
+def inbound_identity(scope: Dict) -> str:
+    """Rate-limit identity: the authenticated user, else the client IP"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                # Corre en el bucle de eventos: sin consultar revocaciones, basta la firma
+                # para saber de quién es (la dependencia de auth rechaza el token después)
+                user = resolve_user_from_token(token.strip(), check_revoked=False)
+                if user is not None:
+                    return f"user:{user['id']}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+class InboundRateLimitMiddleware:
+    """ASGI middleware: global load shedding, then per-user, per-route sliding windows"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (scope["type"] != "http" or scope.get("method") == "OPTIONS"
+                or not INBOUND_LIMIT_CONFIG["ENABLED"]
+                or any(path.startswith(prefix) for prefix in INBOUND_LIMIT_CONFIG["EXEMPT_PREFIXES"])):
+            await self.app(scope, receive, send)
+            return
+        
+        if (admission_stats["in_flight"] >= INBOUND_LIMIT_CONFIG["MAX_IN_FLIGHT"]
+                or loop_lag_monitor.lag_ms > INBOUND_LIMIT_CONFIG["MAX_LOOP_LAG_MS"]):
+            admission_stats["shed"] += 1
+            response = JSONResponse(
+                status_code=503,
+                headers={"Retry-After": "1"},
+                content={"detail": "Server busy, retry shortly"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        rule, limit = inbound_route_rule(path)
+        allowed, remaining, retry_after = inbound_limiter.hit((inbound_identity(scope), rule), limit)
+        if not allowed:
+            admission_stats["rate_limited"] += 1
+            response = JSONResponse(
+                status_code=429,
+                headers={
+                    "Retry-After": str(max(1, int(retry_after + 0.999))),
+                    "X-RateLimit-Limit": str(limit),
+                    "X-RateLimit-Remaining": "0"
+                },
+                content={"detail": "Rate limit exceeded"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        admission_stats["in_flight"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_stats["in_flight"] -= 1
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    loop_lag_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_lag_monitor():
+    await loop_lag_monitor.stop()
+
+# === CONDITIONAL GET (ETag / 304) ===
+
+def conditional_get_mode(path: str) -> Optional[str]:
+    best = None
+    for prefix in CONDITIONAL_GET_CONFIG["ROUTES"]:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return CONDITIONAL_GET_CONFIG["ROUTES"][best] if best is not None else None
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def versioned_etag(scope: Dict, headers: Dict) -> Optional[str]:
+    """ETag from the caller's shared data versions, the date and the URL; None without a valid token (blocking)"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    user = resolve_user_from_token(token.strip())
+    if user is None:
+        return None
+    versions = user_data_versions.all(user["id"])
+    key = "|".join((
+        user["id"],
+        str(versions.get("data", 0)),
+        str(versions.get("activity", 0)),
+        date.today().isoformat(),  # Los informes dependen del día (rangos relativos, mes actual)
+        scope["path"],
+        scope.get("query_string", b"").decode("latin-1")
+    ))
+    return f'"v{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+def conditional_headers(etag: str) -> List[tuple]:
+    return [
+        (b"etag", etag.encode()),
+        (b"cache-control", CONDITIONAL_GET_CONFIG["CACHE_CONTROL"].encode()),
+        (b"vary", b"Authorization")
+    ]
+
+class ConditionalGetMiddleware:
+    """ETags and If-None-Match handling for the GET routes in CONDITIONAL_GET_CONFIG.
+
+    "versioned" routes know their ETag before the handler runs, so a match
+    is answered with 304 without doing any work. "hash" routes buffer the
+    200 response and hash the body, which saves the transfer only.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        mode = conditional_get_mode(scope["path"])
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        if_none_match = headers.get("if-none-match")
+        
+        if mode == "versioned":
+            etag = await asyncio.to_thread(versioned_etag, scope, headers)
+            if etag is None:
+                # Sin usuario válido: el handler responde 401
+                await self.app(scope, receive, send)
+                return
+            if etag_matches(if_none_match, etag):
+                await self._not_modified(send, etag)
+                return
+            
+            async def send_with_etag(message):
+                if message["type"] == "http.response.start" and message["status"] == 200:
+                    message = {**message, "headers": list(message.get("headers", [])) + conditional_headers(etag)}
+                await send(message)
+            
+            await self.app(scope, receive, send_with_etag)
+            return
+        
+        start: Optional[Dict] = None
+        chunks: List[bytes] = []
+        size = 0
+        passthrough = False
+        
+        async def send_buffered(message):
+            nonlocal start, size, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if message.get("more_body"):
+                if size > CONDITIONAL_GET_CONFIG["MAX_BUFFER_BYTES"]:
+                    passthrough = True
+                    await send(start)
+                    await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                return
+            body = b"".join(chunks)
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            if etag_matches(if_none_match, etag):
+                await self._not_modified(send, etag)
+                return
+            await send({**start, "headers": list(start.get("headers", [])) + conditional_headers(etag)})
+            await send({"type": "http.response.body", "body": body})
+        
+        await self.app(scope, receive, send_buffered)
+    
+    @staticmethod
+    async def _not_modified(send, etag: str):
+        await send({"type": "http.response.start", "status": 304, "headers": conditional_headers(etag)})
+        await send({"type": "http.response.body", "body": b""})
+
+# Orden: el limitador envuelve al GET condicional, así los 304 también cuentan
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(InboundRateLimitMiddleware)
+
+# CORS middleware (added last so it wraps the limiter and 429/503 responses carry CORS headers)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 # API Endpoints
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Serve the main web interface"""
-    return FileResponse('static/index.html')
+    return static_assets.response("index.html", request.headers)
+
+# ===== INVESTIGATION REPOSITORY =====
+
+class SQLiteConnectionPool:
+    """Fixed-size pool of SQLite connections shared by worker threads"""
+    
+    def __init__(self, path: str, size: int, init_schema=None):
+        self.path = path
+        self.size = size
+        self._init_schema = init_schema
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _open(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=DATABASE_CONFIG["STATEMENT_CACHE"]
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={DATABASE_CONFIG['BUSY_TIMEOUT_MS']}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        if self._created == 0 and self._init_schema is not None:
+            self._init_schema(conn)
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._created < self.size
+                if can_open:
+                    conn = self._open()
+                    self._created += 1
+            if not can_open:
+                conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+INVESTIGATION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS investigations (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    target TEXT DEFAULT '',
+    description TEXT DEFAULT '',
+    priority TEXT NOT NULL DEFAULT 'medium',
+    status TEXT NOT NULL DEFAULT 'active',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    deadline TEXT,
+    tags TEXT NOT NULL DEFAULT '[]',
+    progress INTEGER NOT NULL DEFAULT 0,
+    assigned_to TEXT,
+    estimated_hours REAL NOT NULL DEFAULT 0,
+    actual_hours REAL NOT NULL DEFAULT 0,
+    findings_count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    closed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_investigations_user_created ON investigations(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_investigations_user_status ON investigations(user_id, status);
+CREATE INDEX IF NOT EXISTS idx_investigations_user_type ON investigations(user_id, type);
+CREATE INDEX IF NOT EXISTS idx_investigations_user_priority ON investigations(user_id, priority);
+CREATE INDEX IF NOT EXISTS idx_investigations_created ON investigations(created_at);
+
+CREATE TABLE IF NOT EXISTS findings (
+    id TEXT PRIMARY KEY,
+    investigation_id TEXT NOT NULL REFERENCES investigations(id) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    type TEXT NOT NULL DEFAULT 'general',
+    severity TEXT NOT NULL DEFAULT 'medium',
+    created_at TEXT NOT NULL,
+    created_by TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_findings_investigation ON findings(investigation_id, created_at);
+
+CREATE TABLE IF NOT EXISTS entities (
+    id TEXT PRIMARY KEY,
+    investigation_id TEXT NOT NULL REFERENCES investigations(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entities_investigation ON entities(investigation_id);
+CREATE INDEX IF NOT EXISTS idx_entities_kind_value ON entities(kind, value);
+
+-- Investigaciones borradas, para que los clientes en modo delta las eliminen
+CREATE TABLE IF NOT EXISTS investigation_tombstones (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tombstones_user_version ON investigation_tombstones(user_id, version);
+
+-- Usuarios: el id se guarda para que las investigaciones sigan siendo suyas tras reiniciar
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    hashed_password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL,
+    permissions TEXT NOT NULL DEFAULT '[]'
+);
+
+-- Tokens revocados (logout) hasta que caducan, compartidos por todos los workers
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    exp REAL NOT NULL
+);
+
+-- Versiones por usuario compartidas por todos los workers (ETags, cachés, exportaciones):
+-- "data" = último cambio en sus investigaciones, "activity" = otros eventos del registro
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (user_id, kind)
+);
+
+-- Contador monotónico de cambios compartido por todos los workers
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO sequences VALUES ('investigation_version', 0);
+"""
+
+def init_investigation_schema(conn: sqlite3.Connection):
+    conn.executescript(INVESTIGATION_SCHEMA)
+    # Bases creadas antes de existir estas columnas
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(investigations)")}
+    if "version" not in columns:
+        conn.execute("ALTER TABLE investigations ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    if "findings_count" not in columns:
+        conn.execute("ALTER TABLE investigations ADD COLUMN findings_count INTEGER NOT NULL DEFAULT 0")
+        conn.execute(
+            "UPDATE investigations SET findings_count = "
+            "(SELECT COUNT(*) FROM findings WHERE findings.investigation_id = investigations.id)"
+        )
+    if "closed_at" not in columns:
+        conn.execute("ALTER TABLE investigations ADD COLUMN closed_at TEXT")
+        # La fecha real del cierre no se guardaba; updated_at es la mejor aproximación disponible
+        conn.execute(
+            "UPDATE investigations SET closed_at = updated_at WHERE status IN ('completed', 'archived')"
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_investigations_user_version ON investigations(user_id, version)")
+    if conn.execute("INSERT OR IGNORE INTO sequences VALUES ('user_versions_backfilled', 1)").rowcount:
+        conn.execute(
+            "INSERT OR REPLACE INTO user_versions (user_id, kind, version) "
+            "SELECT user_id, 'data', MAX(version) FROM (SELECT user_id, version FROM investigations "
+            "UNION ALL SELECT user_id, version FROM investigation_tombstones) GROUP BY user_id"
+        )
+    # El objetivo de cada investigación es su primera entidad; las bases anteriores no las tenían
+    if conn.execute("INSERT OR IGNORE INTO sequences VALUES ('entities_backfilled', 1)").rowcount:
+        conn.execute(
+            "INSERT INTO entities (id, investigation_id, kind, value, created_at) "
+            "SELECT 'ent_' || lower(hex(randomblob(8))), id, type, target, created_at FROM investigations "
+            "WHERE target != '' AND NOT EXISTS (SELECT 1 FROM entities e WHERE e.investigation_id = investigations.id)"
+        )
+
+INVESTIGATION_PRIORITIES = ("low", "medium", "high", "critical")
+INVESTIGATION_STATUSES = ("active", "completed", "paused", "archived")
+CLOSED_STATUSES = ("completed", "archived")
+
+class InvestigationValidationError(ValueError):
+    """An investigation field with a missing or invalid value"""
+
+def validate_investigation_fields(fields: Dict) -> Dict:
+    """Check and normalize the investigation fields present in `fields`"""
+    def fail(field: str, problem: str):
+        raise InvestigationValidationError(f"{field}: {problem}")
+    
+    def is_number(value: Any) -> bool:
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value and abs(value) != float("inf")
+    
+    clean = dict(fields)
+    for field, value in fields.items():
+        if field in ("name", "type"):
+            if not isinstance(value, str) or not value.strip():
+                fail(field, "must be a non-empty string")
+            clean[field] = value.strip()
+        elif field in ("target", "description"):
+            if value is None:
+                clean[field] = ""
+            elif not isinstance(value, str):
+                fail(field, "must be a string")
+        elif field == "priority" and value not in INVESTIGATION_PRIORITIES:
+            fail(field, f"must be one of {', '.join(INVESTIGATION_PRIORITIES)}")
+        elif field == "status" and value not in INVESTIGATION_STATUSES:
+            fail(field, f"must be one of {', '.join(INVESTIGATION_STATUSES)}")
+        elif field == "deadline" and value == "":
+            clean[field] = None  # Campo de fecha vacío del formulario
+        elif field == "deadline" and value is not None:
+            try:
+                datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                fail(field, "must be an ISO 8601 date or null")
+        elif field == "tags":
+            if value is None:
+                clean[field] = []
+            elif not isinstance(value, list) or not all(isinstance(tag, str) for tag in value):
+                fail(field, "must be a list of strings")
+        elif field == "assigned_to" and value is not None and not isinstance(value, str):
+            fail(field, "must be a string or null")
+        elif field == "progress":
+            if not is_number(value) or not 0 <= value <= 100:
+                fail(field, "must be a number between 0 and 100")
+            clean[field] = round(value)
+        elif field in ("estimated_hours", "actual_hours"):
+            if not is_number(value) or value < 0:
+                fail(field, "must be a non-negative number")
+    return clean
+
+class InvestigationRepository:
+    """Investigations, findings and entities stored in normalized SQLite tables.
+
+    Every write bumps a shared version counter, so clients can ask for what
+    changed since the version they last saw. After each committed write the
+    registered listeners are called with `(event, before, after, finding)`,
+    where `before`/`after` are investigation rows without children. Methods
+    are blocking; handlers call them through `asyncio.to_thread`.
+    """
+    
+    UPDATABLE_FIELDS = (
+        "name", "type", "target", "description", "priority", "status", "deadline",
+        "tags", "progress", "assigned_to", "estimated_hours", "actual_hours"
+    )
+    COLUMNS = ("id", "user_id", "created_at", "updated_at", "version", "findings_count", "closed_at") + UPDATABLE_FIELDS
+    CHILD_FIELDS = ("findings", "entities")
+    
+    def __init__(self, path: str, pool_size: int):
+        self.pool = SQLiteConnectionPool(path, pool_size, init_schema=init_investigation_schema)
+        self._listeners = []
+    
+    def add_listener(self, listener):
+        """Register `listener(event, before, after, finding)` for created/updated/deleted/finding_added"""
+        self._listeners.append(listener)
+    
+    def _notify(self, event: str, before: Optional[Dict], after: Optional[Dict], finding: Optional[Dict] = None):
+        for listener in self._listeners:
+            try:
+                listener(event, before, after, finding)
+            except Exception as e:
+                # Un índice derivado roto no debe hacer fallar la escritura ya confirmada
+                print(f"⚠️  Investigation listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+    
+    def iter_rows(self, batch_size: int = 1000):
+        """Stream every investigation row (without children), for rebuilding derived indexes"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute("SELECT * FROM investigations")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_investigation(row)
+    
+    def scan(self, user_id: str, columns: List[str], clauses: List[str] = (), params: List = (),
+             batch_size: int = 1000):
+        """Stream the given columns of a user's investigations matching extra SQL `clauses`.
+
+        `columns` and `clauses` are interpolated into the query, so callers
+        must only build them from known column names; values go in `params`.
+        """
+        where = " AND ".join(["user_id = ?", *clauses])
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"SELECT {', '.join(columns)} FROM investigations WHERE {where}", [user_id, *params])
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+    
+    def findings_by_month(self) -> List[tuple]:
+        """(user_id, 'YYYY-MM', count) for every finding, for rebuilding aggregates"""
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT i.user_id, substr(f.created_at, 1, 7), COUNT(*) FROM findings f "
+                "JOIN investigations i ON i.id = f.investigation_id GROUP BY 1, 2"
+            ).fetchall()
+    
+    @contextmanager
+    def _transaction(self):
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+    
+    @staticmethod
+    def _next_version(conn: sqlite3.Connection, user_id: str) -> int:
+        conn.execute("UPDATE sequences SET value = value + 1 WHERE name = 'investigation_version'")
+        version = conn.execute("SELECT value FROM sequences WHERE name = 'investigation_version'").fetchone()[0]
+        conn.execute(
+            "INSERT INTO user_versions (user_id, kind, version) VALUES (?, 'data', ?) "
+            "ON CONFLICT (user_id, kind) DO UPDATE SET version = excluded.version",
+            (user_id, version)
+        )
+        return version
+    
+    @staticmethod
+    def _row_to_investigation(row: sqlite3.Row) -> Dict:
+        investigation = dict(row)
+        if "tags" in investigation:
+            investigation["tags"] = json.loads(investigation["tags"])
+        return investigation
+    
+    def _attach_children(self, conn: sqlite3.Connection, investigations: List[Dict],
+                         children: tuple = CHILD_FIELDS) -> List[Dict]:
+        """Load findings and/or entities for many investigations with one query each"""
+        by_id = {inv["id"]: inv for inv in investigations}
+        for inv in investigations:
+            for child in children:
+                inv[child] = []
+        if not by_id or not children:
+            return investigations
+        ids = list(by_id)
+        # Lotes por debajo del límite de parámetros de SQLite
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for child in children:
+                for row in conn.execute(
+                    f"SELECT * FROM {child} WHERE investigation_id IN ({placeholders}) ORDER BY created_at", chunk
+                ):
+                    by_id[row["investigation_id"]][child].append(dict(row))
+        return investigations
+    
+    @staticmethod
+    def _add_target_entity(conn: sqlite3.Connection, investigation: Dict, created_at: str) -> Optional[Dict]:
+        if not investigation["target"]:
+            return None
+        entity = {
+            "id": f"ent_{secrets.token_hex(8)}",
+            "investigation_id": investigation["id"],
+            "kind": investigation["type"],
+            "value": investigation["target"],
+            "created_at": created_at
+        }
+        conn.execute(
+            "INSERT INTO entities (id, investigation_id, kind, value, created_at) VALUES (?, ?, ?, ?, ?)",
+            list(entity.values())
+        )
+        return entity
+    
+    def create(self, investigation: Dict) -> Dict:
+        """Insert an investigation; raises InvestigationValidationError on invalid fields"""
+        investigation = {
+            **investigation,
+            **validate_investigation_fields({field: investigation.get(field) for field in self.UPDATABLE_FIELDS})
+        }
+        investigation["closed_at"] = investigation["created_at"] if investigation["status"] in CLOSED_STATUSES else None
+        row = {field: investigation.get(field) for field in self.COLUMNS}
+        row["tags"] = json.dumps(row["tags"])
+        row["findings_count"] = 0
+        with self._transaction() as conn:
+            row["version"] = self._next_version(conn, row["user_id"])
+            conn.execute(
+                f"INSERT INTO investigations ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                list(row.values())
+            )
+            entity = self._add_target_entity(conn, investigation, investigation["created_at"])
+        created = {**investigation, "version": row["version"], "findings_count": 0}
+        self._notify("created", None, created)
+        return {**created, "findings": [], "entities": [entity] if entity else []}
+    
+    def get(self, investigation_id: str, user_id: str) -> Optional[Dict]:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT * FROM investigations WHERE id = ? AND user_id = ?", (investigation_id, user_id)
+            ).fetchone()
+            if row is None:
+                return None
+            return self._attach_children(conn, [self._row_to_investigation(row)])[0]
+    
+    def list_page(self, user_id: str, limit: int, after: Optional[tuple] = None,
+                  fields: Optional[List[str]] = None, since: Optional[int] = None) -> Dict:
+        """One page of a user's investigations.
+
+        Normal mode walks (created_at, id) descending and `after` is the last
+        (created_at, id) seen. Delta mode (`since` set) walks version ascending
+        from `since` and also returns ids deleted after it; `after` is then the
+        last version seen.
+        """
+        fields = list(fields or self.COLUMNS + self.CHILD_FIELDS)
+        columns = [field for field in self.COLUMNS if field in fields]
+        for required in ("id", "created_at", "version"):
+            if required not in columns:
+                columns.append(required)
+        children = tuple(child for child in self.CHILD_FIELDS if child in fields)
+        select = f"SELECT {', '.join(columns)} FROM investigations"
+        
+        with self.pool.connection() as conn:
+            current_version = conn.execute(
+                "SELECT value FROM sequences WHERE name = 'investigation_version'"
+            ).fetchone()[0]
+            deleted: List[str] = []
+            if since is None:
+                if after is None:
+                    rows = conn.execute(
+                        f"{select} WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+                        (user_id, limit + 1)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        f"{select} WHERE user_id = ? AND (created_at < ? OR (created_at = ? AND id < ?)) "
+                        "ORDER BY created_at DESC, id DESC LIMIT ?",
+                        (user_id, after[0], after[0], after[1], limit + 1)
+                    ).fetchall()
+            else:
+                low = after[0] if after is not None else since
+                rows = conn.execute(
+                    f"{select} WHERE user_id = ? AND version > ? AND version <= ? ORDER BY version LIMIT ?",
+                    (user_id, low, current_version, limit + 1)
+                ).fetchall()
+                # Se repiten en cada página: un borrado entre páginas no se pierde
+                deleted = [row[0] for row in conn.execute(
+                    "SELECT id FROM investigation_tombstones WHERE user_id = ? AND version > ? AND version <= ?",
+                    (user_id, since, current_version)
+                )]
+            
+            has_more = len(rows) > limit
+            items = [self._row_to_investigation(row) for row in rows[:limit]]
+            self._attach_children(conn, items, children)
+        
+        next_after = None
+        if has_more:
+            last = items[-1]
+            next_after = (last["version"],) if since is not None else (last["created_at"], last["id"])
+        for item in items:
+            for field in ("created_at", "version"):
+                if field not in fields:
+                    item.pop(field, None)
+        return {"items": items, "next_after": next_after, "deleted": deleted, "version": current_version}
+    
+    def statistics(self, user_id: str) -> Dict:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                """SELECT COUNT(*) AS total,
+                          COALESCE(SUM(status = 'active'), 0) AS active,
+                          COALESCE(SUM(status = 'completed'), 0) AS completed,
+                          COALESCE(SUM(priority = 'high'), 0) AS high_priority
+                   FROM investigations WHERE user_id = ?""",
+                (user_id,)
+            ).fetchone()
+        return dict(row)
+    
+    def count(self) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM investigations").fetchone()[0]
+    
+    def update(self, investigation_id: str, user_id: str, changes: Dict) -> Optional[Dict]:
+        """Apply changes to an investigation; None if not found, InvestigationValidationError on invalid fields"""
+        changes = validate_investigation_fields(
+            {field: value for field, value in changes.items() if field in self.UPDATABLE_FIELDS}
+        )
+        if "tags" in changes:
+            changes["tags"] = json.dumps(changes["tags"])
+        changes["updated_at"] = datetime.now().isoformat()
+        with self._transaction() as conn:
+            before = conn.execute(
+                "SELECT * FROM investigations WHERE id = ? AND user_id = ?", (investigation_id, user_id)
+            ).fetchone()
+            if before is None:
+                return None
+            # closed_at fecha el último paso a completada/archivada; updated_at cambia con cualquier edición
+            if changes.get("status", before["status"]) != before["status"]:
+                changes["closed_at"] = changes["updated_at"] if changes["status"] in CLOSED_STATUSES else None
+            changes["version"] = self._next_version(conn, user_id)
+            assignments = ", ".join(f"{field} = ?" for field in changes)
+            conn.execute(
+                f"UPDATE investigations SET {assignments} WHERE id = ?",
+                [*changes.values(), investigation_id]
+            )
+            after = conn.execute("SELECT * FROM investigations WHERE id = ?", (investigation_id,)).fetchone()
+            if (before["type"], before["target"]) != (after["type"], after["target"]):
+                conn.execute(
+                    "DELETE FROM entities WHERE investigation_id = ? AND kind = ? AND value = ?",
+                    (investigation_id, before["type"], before["target"])
+                )
+                self._add_target_entity(conn, after, changes["updated_at"])
+        after = self._row_to_investigation(after)
+        self._notify("updated", self._row_to_investigation(before), after)
+        return self.get(investigation_id, user_id)
+    
+    def delete(self, investigation_id: str, user_id: str) -> bool:
+        with self._transaction() as conn:
+            before = conn.execute(
+                "SELECT * FROM investigations WHERE id = ? AND user_id = ?", (investigation_id, user_id)
+            ).fetchone()
+            if before is None:
+                return False
+            before = self._row_to_investigation(before)
+            before["findings_by_month"] = dict(conn.execute(
+                "SELECT substr(created_at, 1, 7), COUNT(*) FROM findings WHERE investigation_id = ? GROUP BY 1",
+                (investigation_id,)
+            ).fetchall())
+            conn.execute("DELETE FROM investigations WHERE id = ?", (investigation_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO investigation_tombstones VALUES (?, ?, ?)",
+                (investigation_id, user_id, self._next_version(conn, user_id))
+            )
+        self._notify("deleted", before, None)
+        return True
+    
+    def add_finding(self, investigation_id: str, user_id: str, finding: Dict) -> Optional[Dict]:
+        with self._transaction() as conn:
+            before = conn.execute(
+                "SELECT * FROM investigations WHERE id = ? AND user_id = ?", (investigation_id, user_id)
+            ).fetchone()
+            if before is None:
+                return None
+            conn.execute(
+                "INSERT INTO findings (id, investigation_id, content, type, severity, created_at, created_by) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (finding["id"], investigation_id, finding["content"], finding["type"],
+                 finding["severity"], finding["created_at"], finding["created_by"])
+            )
+            conn.execute(
+                "UPDATE investigations SET updated_at = ?, version = ?, findings_count = findings_count + 1 "
+                "WHERE id = ?",
+                (finding["created_at"], self._next_version(conn, user_id), investigation_id)
+            )
+            after = conn.execute("SELECT * FROM investigations WHERE id = ?", (investigation_id,)).fetchone()
+        finding = {**finding, "investigation_id": investigation_id}
+        self._notify("finding_added", self._row_to_investigation(before), self._row_to_investigation(after), finding)
+        return finding
+
+investigation_repo = InvestigationRepository(DATABASE_CONFIG["PATH"], DATABASE_CONFIG["POOL_SIZE"])
+
+class UserRepository:
+    """Registered users, in the same SQLite database as their investigations.
+
+    `users_db` is the in-memory cache of this table: it is filled at
+    startup and on cache misses, and written through on every change.
+    """
+    
+    def __init__(self, pool: SQLiteConnectionPool):
+        self.pool = pool
+    
+    @staticmethod
+    def _row_to_user(row: sqlite3.Row) -> Dict:
+        user = dict(row)
+        user["is_active"] = bool(user["is_active"])
+        user["permissions"] = json.loads(user["permissions"])
+        return user
+    
+    def all(self) -> Dict[str, Dict]:
+        with self.pool.connection() as conn:
+            return {row["email"]: self._row_to_user(row) for row in conn.execute("SELECT * FROM users")}
+    
+    def get(self, email: str) -> Optional[Dict]:
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        return self._row_to_user(row) if row is not None else None
+    
+    def create(self, user: Dict) -> bool:
+        """Insert a user; False if the email is already registered"""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute(
+                    "INSERT INTO users (email, id, hashed_password, role, is_active, created_at, permissions) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user["email"], user["id"], user["hashed_password"], user["role"], int(user["is_active"]),
+                     user["created_at"], json.dumps(user["permissions"]))
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+    
+    def update_password(self, email: str, hashed_password: str):
+        with self.pool.connection() as conn:
+            conn.execute("UPDATE users SET hashed_password = ? WHERE email = ?", (hashed_password, email))
+    
+    def count(self) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    
+    def orphaned_investigations(self) -> int:
+        """Investigations whose owner is not a stored user (written before users were persisted)"""
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM investigations WHERE user_id NOT IN (SELECT id FROM users)"
+            ).fetchone()[0]
+
+user_repo = UserRepository(investigation_repo.pool)
+
+def cached_user(email: str) -> Optional[Dict]:
+    """User from the cache, else from the database (blocking)"""
+    user = users_db.get(email)
+    if user is None:
+        user = user_repo.get(email)
+        if user is not None:
+            users_db[email] = user
+    return user
+
+@app.on_event("startup")
+async def load_users():
+    users_db.update(await asyncio.to_thread(user_repo.all))
+    orphaned = await asyncio.to_thread(user_repo.orphaned_investigations)
+    if orphaned:
+        print(f"⚠️  {orphaned} investigations belong to users that no longer exist (see README, \"Migración de usuarios\")")
+
+class UserDataVersions:
+    """Per-user versions in the shared `user_versions` table.
+
+    "data" is set by the repository in the same transaction as every write
+    to the user's investigations; "activity" is bumped for activity-log
+    events that change no investigation (exports). Every worker reads the
+    same values, so caches and ETags keyed on them never go stale on one
+    worker after a write handled by another. Methods are blocking.
+    """
+    
+    def __init__(self, pool: SQLiteConnectionPool):
+        self.pool = pool
+    
+    def get(self, user_id: str, kind: str = "data") -> int:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT version FROM user_versions WHERE user_id = ? AND kind = ?", (user_id, kind)
+            ).fetchone()
+        return row[0] if row else 0
+    
+    def all(self, user_id: str) -> Dict[str, int]:
+        with self.pool.connection() as conn:
+            return dict(conn.execute("SELECT kind, version FROM user_versions WHERE user_id = ?", (user_id,)).fetchall())
+    
+    def bump(self, user_id: str, kind: str = "activity"):
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO user_versions (user_id, kind, version) VALUES (?, ?, 1) "
+                "ON CONFLICT (user_id, kind) DO UPDATE SET version = version + 1",
+                (user_id, kind)
+            )
+
+user_data_versions = UserDataVersions(investigation_repo.pool)
+
+class RevokedTokenStore:
+    """Revoked token ids in the shared `revoked_tokens` table.
+
+    A logout on one worker is seen by all of them: `is_revoked` asks SQLite
+    unless this worker already knows the jti is revoked (`revoked_tokens`
+    caches positive answers only). Rows and cache entries are dropped once
+    the token has expired. Methods are blocking.
+    """
+    
+    def __init__(self, pool: SQLiteConnectionPool, cache: Dict[str, float]):
+        self.pool = pool
+        self.cache = cache
+    
+    def _prune_cache(self, now: float):
+        for jti in [jti for jti, exp in self.cache.items() if exp <= now]:
+            del self.cache[jti]
+    
+    def revoke(self, jti: str, exp: float):
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO revoked_tokens (jti, exp) VALUES (?, ?)", (jti, exp))
+            conn.execute("DELETE FROM revoked_tokens WHERE exp <= ?", (now,))
+        self._prune_cache(now)
+        self.cache[jti] = exp
+    
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None:
+            return False
+        if jti in self.cache:
+            return True
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT exp FROM revoked_tokens WHERE jti = ?", (jti,)).fetchone()
+        if row is None:
+            return False
+        self.cache[jti] = row[0]
+        return True
+
+revoked_token_store = RevokedTokenStore(investigation_repo.pool, revoked_tokens)
 
 # ===== INVESTIGATIONS MANAGEMENT ENDPOINTS =====
 
+INVESTIGATION_PAGE_SIZE = 50
+INVESTIGATION_MAX_PAGE_SIZE = 500
+
+def encode_cursor(position: tuple) -> str:
+    return b64url_encode(json.dumps(list(position), separators=(",", ":")).encode())
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        position = json.loads(b64url_decode(cursor))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, list) or not position:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(position)
+
 @app.get("/api/v1/investigations")
-async def get_investigations(current_user: dict = Depends(get_current_user)):
-    """Get all investigations for the current user"""
-    # In a real implementation, this would query a database
-    # For now, return simulated data
+async def get_investigations(
+    limit: int = INVESTIGATION_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    since: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the current user's investigations, newest first.
+
+    `cursor` continues from a previous page's `next_cursor`, `fields` is a
+    comma-separated projection, and `since=<version>` returns only
+    investigations changed (and ids deleted) after that version.
+    """
+    limit = max(1, min(limit, INVESTIGATION_MAX_PAGE_SIZE))
+    field_list = None
+    if fields:
+        field_list = [field.strip() for field in fields.split(",") if field.strip()]
+        allowed = InvestigationRepository.COLUMNS + InvestigationRepository.CHILD_FIELDS
+        unknown = [field for field in field_list if field not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None and len(after) != (1 if since is not None else 2):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested mode")
     
-    sample_investigations = [
-        {
-            "id": "inv_001",
-            "name": "Email Compromise Investigation",
-            "type": "email",
-            "target": "john.doe@company.com",
-            "description": "Investigating potential email account compromise and data breach indicators.",
-            "priority": "high",
-            "status": "active",
-            "created_at": "2024-01-15T10:30:00Z",
-            "updated_at": "2024-01-20T14:45:00Z",
-            "deadline": "2024-02-01",
-            "tags": ["cybercrime", "data-breach", "email-security"],
-            "progress": 65,
-            "findings": [
-                "Email found in 3 data breaches",
-                "Suspicious login activity detected",
-                "Password reuse across multiple platforms"
-            ],
-            "assigned_to": current_user["email"],
-            "estimated_hours": 20,
-            "actual_hours": 13
-        },
-        {
-            "id": "inv_002",
-            "name": "Social Media Profile Analysis",
-            "type": "social",
-            "target": "@suspicious_user",
-            "description": "Comprehensive analysis of social media presence for background verification.",
-            "priority": "medium",
-            "status": "completed",
-            "created_at": "2024-01-10T09:15:00Z",
-            "updated_at": "2024-01-18T16:20:00Z",
-            "deadline": "2024-01-25",
-            "tags": ["background-check", "social-media", "verification"],
-            "progress": 100,
-            "findings": [
-                "Multiple fake profiles identified",
-                "Inconsistent personal information",
-                "Suspicious network connections"
-            ],
-            "assigned_to": current_user["email"],
-            "estimated_hours": 15,
-            "actual_hours": 18
-        },
-        {
-            "id": "inv_003",
-            "name": "Domain Infrastructure Mapping",
-            "type": "domain",
-            "target": "suspicious-site.com",
-            "description": "Mapping domain infrastructure and identifying potential malicious activities.",
-            "priority": "high",
-            "status": "active",
-            "created_at": "2024-01-20T11:00:00Z",
-            "updated_at": "2024-01-22T13:30:00Z",
-            "deadline": "2024-02-05",
-            "tags": ["malware", "infrastructure", "threat-intel"],
-            "progress": 30,
-            "findings": [
-                "Domain registered with privacy protection",
-                "Multiple subdomains identified",
-                "Hosting provider traced to offshore location"
-            ],
-            "assigned_to": current_user["email"],
-            "estimated_hours": 25,
-            "actual_hours": 8
-        }
-    ]
+    page = await asyncio.to_thread(
+        investigation_repo.list_page, current_user["id"], limit, after, field_list, since
+    )
+    statistics = await asyncio.to_thread(investigation_repo.statistics, current_user["id"])
+    
+    data = {
+        "investigations": page["items"],
+        "total": statistics["total"],
+        "statistics": statistics,
+        "next_cursor": encode_cursor(page["next_after"]) if page["next_after"] else None,
+        "version": page["version"]
+    }
+    if since is not None:
+        data["deleted"] = page["deleted"]
     
     return {
         "status": "success",
-        "data": {
-            "investigations": sample_investigations,
-            "total": len(sample_investigations),
-            "statistics": {
-                "total": len(sample_investigations),
-                "active": len([inv for inv in sample_investigations if inv["status"] == "active"]),
-                "completed": len([inv for inv in sample_investigations if inv["status"] == "completed"]),
-                "high_priority": len([inv for inv in sample_investigations if inv["priority"] == "high"])
-            }
-        }
+        "data": data
     }
 
 @app.post("/api/v1/investigations")
@@ -264,88 +1755,73 @@ async def create_investigation(investigation_data: dict, current_user: dict = De
             raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
     
     # Create new investigation
+    now = datetime.now().isoformat()
     new_investigation = {
-        "id": f"inv_{int(time.time())}",
+        "id": f"inv_{secrets.token_hex(8)}",
+        "user_id": current_user["id"],
         "name": investigation_data["name"],
         "type": investigation_data["type"],
         "target": investigation_data.get("target", ""),
         "description": investigation_data.get("description", ""),
         "priority": investigation_data.get("priority", "medium"),
         "status": "active",
-        "created_at": datetime.now().isoformat(),
-        "updated_at": datetime.now().isoformat(),
+        "created_at": now,
+        "updated_at": now,
         "deadline": investigation_data.get("deadline"),
         "tags": investigation_data.get("tags", []),
         "progress": 0,
-        "findings": [],
         "assigned_to": current_user["email"],
         "estimated_hours": investigation_data.get("estimated_hours", 0),
         "actual_hours": 0
     }
     
-    # In a real implementation, save to database
-    # For demo, just return the created investigation
+    try:
+        created = await asyncio.to_thread(investigation_repo.create, new_investigation)
+    except InvestigationValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
     return {
         "status": "success",
         "message": "Investigation created successfully",
-        "data": new_investigation
+        "data": created
     }
 
 @app.get("/api/v1/investigations/{investigation_id}")
 async def get_investigation(investigation_id: str, current_user: dict = Depends(get_current_user)):
     """Get a specific investigation by ID"""
-    # In a real implementation, query database by ID
-    # For demo, return sample data
-    
-    sample_investigation = {
-        "id": investigation_id,
-        "name": "Sample Investigation",
-        "type": "email",
-        "target": "sample@example.com",
-        "description": "This is a sample investigation for demonstration purposes.",
-        "priority": "medium",
-        "status": "active",
-        "created_at": "2024-01-15T10:30:00Z",
-        "updated_at": "2024-01-20T14:45:00Z",
-        "deadline": "2024-02-01",
-        "tags": ["sample", "demo"],
-        "progress": 45,
-        "findings": [
-            "Sample finding 1",
-            "Sample finding 2"
-        ],
-        "assigned_to": current_user["email"],
-        "estimated_hours": 10,
-        "actual_hours": 4
-    }
+    investigation = await asyncio.to_thread(investigation_repo.get, investigation_id, current_user["id"])
+    if investigation is None:
+        raise HTTPException(status_code=404, detail="Investigation not found")
     
     return {
         "status": "success",
-        "data": sample_investigation
+        "data": investigation
     }
 
 @app.put("/api/v1/investigations/{investigation_id}")
 async def update_investigation(investigation_id: str, update_data: dict, current_user: dict = Depends(get_current_user)):
     """Update an existing investigation"""
-    # In a real implementation, update database record
-    # For demo, return success message
+    try:
+        investigation = await asyncio.to_thread(
+            investigation_repo.update, investigation_id, current_user["id"], update_data
+        )
+    except InvestigationValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if investigation is None:
+        raise HTTPException(status_code=404, detail="Investigation not found")
     
     return {
         "status": "success",
         "message": "Investigation updated successfully",
-        "data": {
-            "id": investigation_id,
-            "updated_at": datetime.now().isoformat(),
-            **update_data
-        }
+        "data": investigation
     }
 
 @app.delete("/api/v1/investigations/{investigation_id}")
 async def delete_investigation(investigation_id: str, current_user: dict = Depends(get_current_user)):
     """Delete an investigation"""
-    # In a real implementation, delete from database
-    # For demo, return success message
+    deleted = await asyncio.to_thread(investigation_repo.delete, investigation_id, current_user["id"])
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Investigation not found")
     
     return {
         "status": "success",
@@ -359,7 +1835,7 @@ async def add_finding(investigation_id: str, finding_data: dict, current_user: d
         raise HTTPException(status_code=400, detail="Finding content is required")
     
     new_finding = {
-        "id": f"finding_{int(time.time())}",
+        "id": f"finding_{secrets.token_hex(8)}",
         "content": finding_data["content"],
         "type": finding_data.get("type", "general"),
         "severity": finding_data.get("severity", "medium"),
@@ -367,125 +1843,2078 @@ async def add_finding(investigation_id: str, finding_data: dict, current_user: d
         "created_by": current_user["email"]
     }
     
+    finding = await asyncio.to_thread(investigation_repo.add_finding, investigation_id, current_user["id"], new_finding)
+    if finding is None:
+        raise HTTPException(status_code=404, detail="Investigation not found")
+    
     return {
         "status": "success",
         "message": "Finding added successfully",
-        "data": new_finding
+        "data": finding
     }
 
-# === DOMAIN INTELLIGENCE ENDPOINTS ===
+# === PROVIDER RESPONSE CACHE ===
 
-@app.get("/api/v1/domain/basic-info/{domain}")
-async def get_domain_basic_info(domain: str, current_user: dict = Depends(get_current_user)):
-    """Get basic domain information"""
+class ProviderResponseCache:
+    """On-disk cache of provider responses, shared across restarts.
+
+    Payloads are stored as zlib-compressed compact JSON in SQLite (WAL mode).
+    When the stored bytes exceed `max_bytes`, expired rows go first and then
+    the least recently used ones.
+    """
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+    
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS provider_responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_provider_responses_expires ON provider_responses(expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_provider_responses_access ON provider_responses(last_access)")
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM provider_responses").fetchone()[0]
+            self._conn = conn
+        return self._conn
+    
+    @staticmethod
+    def make_key(provider: str, endpoint: str, query: str) -> str:
+        return hashlib.sha256(f"{provider}|{endpoint}|{query}".encode()).hexdigest()
+    
+    def ttl_for(self, provider: str, endpoint: str) -> float:
+        ttls = PROVIDER_CACHE_CONFIG["TTL_SECONDS"].get(provider, {})
+        return ttls.get(endpoint, ttls.get("default", PROVIDER_CACHE_CONFIG["DEFAULT_TTL"]))
+    
+    def get(self, provider: str, endpoint: str, query: str) -> Optional[Any]:
+        key = self.make_key(provider, endpoint, query)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload FROM provider_responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            conn.execute("UPDATE provider_responses SET last_access = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+        return json.loads(zlib.decompress(row[0]))
+    
+    def set(self, provider: str, endpoint: str, query: str, value: Any):
+        key = self.make_key(provider, endpoint, query)
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            previous = conn.execute("SELECT size FROM provider_responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO provider_responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, endpoint, payload, len(payload), now + self.ttl_for(provider, endpoint), now)
+            )
+            self._total_bytes += len(payload) - (previous[0] if previous else 0)
+            self.stats["stores"] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn, now)
+    
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows, then least recently used rows, until under max_bytes"""
+        deleted = conn.execute("DELETE FROM provider_responses WHERE expires_at <= ?", (now,)).rowcount
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM provider_responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)  # margen para no expulsar en cada escritura
+        if self._total_bytes > target:
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM provider_responses ORDER BY last_access"):
+                victims.append((key,))
+                freed += size
+                if self._total_bytes - freed <= target:
+                    break
+            conn.executemany("DELETE FROM provider_responses WHERE key = ?", victims)
+            deleted += len(victims)
+            self._total_bytes -= freed
+        self.stats["evictions"] += deleted
+    
+    def snapshot(self) -> Dict:
+        return {**self.stats, "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+provider_cache = ProviderResponseCache(PROVIDER_CACHE_CONFIG["PATH"], PROVIDER_CACHE_CONFIG["MAX_BYTES"])
+
+async def cached_provider_call(provider: str, endpoint: str, query: str, fetch) -> Any:
+    """Return a cached provider response, calling `fetch()` only on a miss"""
+    cached = await asyncio.to_thread(provider_cache.get, provider, endpoint, query)
+    if cached is not None:
+        return cached
+    value = await fetch()
+    await asyncio.to_thread(provider_cache.set, provider, endpoint, query, value)
+    return value
+
+# === PROVIDER QUOTA SCHEDULER ===
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Prioridad de las llamadas salientes de la tarea actual (los trabajos bulk la bajan)
+outbound_priority: contextvars.ContextVar = contextvars.ContextVar("outbound_priority", default=PRIORITY_INTERACTIVE)
+
+class ProviderQuotaExceeded(Exception):
+    """Raised when a provider call would wait longer than the caller allows"""
+    
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} quota exhausted, retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class ProviderQuotaScheduler:
+    """Token bucket that queues outbound calls for one provider.
+
+    Tokens refill at `per_hour / 3600` per second up to `burst`. When the
+    bucket is empty callers wait in a priority queue, so interactive
+    requests are served before queued bulk work.
+    """
+    
+    def __init__(self, provider: str, per_hour: int, burst: int):
+        self.provider = provider
+        self.rate = max(per_hour, 1) / 3600.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._drainer: Optional[asyncio.Task] = None
+        self.stats = {"granted": 0, "queued": 0, "rejected": 0, "throttled": 0}
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def expected_wait(self, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Seconds a new call at `priority` would wait before being sent"""
+        self._refill()
+        ahead = sum(1 for p, _, future in self._waiters if p <= priority and not future.done())
+        pause = max(0.0, self._paused_until - time.monotonic())
+        return pause + max(0.0, (ahead + 1 - self.tokens) / self.rate)
+    
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, max_wait: Optional[float] = None) -> float:
+        """Wait for a token and return the seconds spent queued"""
+        self._refill()
+        if not self._waiters and self._paused_until <= time.monotonic() and self.tokens >= 1:
+            self.tokens -= 1
+            self.stats["granted"] += 1
+            return 0.0
+        
+        wait = self.expected_wait(priority)
+        if max_wait is not None and wait > max_wait:
+            self.stats["rejected"] += 1
+            raise ProviderQuotaExceeded(self.provider, wait)
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.stats["queued"] += 1
+        if self._drainer is None:
+            self._drainer = asyncio.create_task(self._drain())
+        
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.tokens += 1  # token concedido a un solicitante que ya se fue
+            raise
+        self.stats["granted"] += 1
+        return time.monotonic() - started
+    
+    async def _drain(self):
+        try:
+            while self._waiters:
+                if self._waiters[0][2].done():
+                    heapq.heappop(self._waiters)
+                    continue
+                self._refill()
+                now = time.monotonic()
+                if self._paused_until > now:
+                    await asyncio.sleep(self._paused_until - now)
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    heapq.heappop(self._waiters)[2].set_result(None)
+                else:
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self._drainer = None
+    
+    def throttle(self, seconds: float):
+        """Stop sending for `seconds` after the provider answered 429"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.stats["throttled"] += 1
+    
+    def snapshot(self) -> Dict:
+        self._refill()
+        return {
+            **self.stats,
+            "tokens": round(self.tokens, 2),
+            "capacity": self.capacity,
+            "per_hour": round(self.rate * 3600),
+            "queue_depth": sum(1 for _, _, future in self._waiters if not future.done()),
+            "expected_wait_interactive": round(self.expected_wait(PRIORITY_INTERACTIVE), 2),
+            "expected_wait_bulk": round(self.expected_wait(PRIORITY_BULK), 2)
+        }
+
+provider_schedulers: Dict[str, ProviderQuotaScheduler] = {
+    provider: ProviderQuotaScheduler(
+        provider,
+        PROVIDER_QUOTA_CONFIG["PER_HOUR"].get(provider, API_CONFIG["MAX_REQUESTS_PER_HOUR"]),
+        PROVIDER_QUOTA_CONFIG["BURST"]
+    )
+    for provider in PROVIDER_HTTP_CONFIG["PROVIDERS"]
+}
+
+async def acquire_provider_quota(provider: str):
+    """Block until `provider` has quota; interactive callers give up past INTERACTIVE_MAX_WAIT"""
+    if not API_CONFIG.get("RATE_LIMIT_ENABLED", True):
+        return
+    priority = outbound_priority.get()
+    max_wait = PROVIDER_QUOTA_CONFIG["INTERACTIVE_MAX_WAIT"] if priority == PRIORITY_INTERACTIVE else None
+    await provider_schedulers[provider].acquire(priority, max_wait)
+
+@app.exception_handler(ProviderQuotaExceeded)
+async def provider_quota_exceeded_handler(request: Request, exc: ProviderQuotaExceeded):
+    retry_after = max(1, int(exc.retry_after + 0.999))
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(retry_after)},
+        content={"detail": str(exc), "provider": exc.provider, "retry_after": retry_after}
+    )
+
+@app.get("/api/v1/providers/quota")
+async def get_provider_quota(current_user: dict = Depends(get_current_user)):
+    """Get token bucket state and expected wait per provider"""
+    return {
+        "success": True,
+        "data": {
+            "enabled": API_CONFIG.get("RATE_LIMIT_ENABLED", True),
+            "providers": {name: scheduler.snapshot() for name, scheduler in provider_schedulers.items()}
+        }
+    }
+
+# === PROVIDER HTTP CLIENTS ===
+
+provider_clients: Dict[str, httpx.AsyncClient] = {}
+
+def provider_auth(provider: str) -> tuple:
+    """Default (headers, params) carrying each provider's API key"""
+    if provider == "hibp":
+        return {"hibp-api-key": API_CONFIG["HIBP_API_KEY"], "user-agent": "osint-platform"}, {}
+    if provider == "hunter":
+        return {}, {"api_key": API_CONFIG["HUNTER_API_KEY"]}
+    if provider == "shodan":
+        return {}, {"key": API_CONFIG["SHODAN_API_KEY"]}
+    if provider == "virustotal":
+        return {"x-apikey": API_CONFIG["VIRUSTOTAL_API_KEY"]}, {}
+    return {}, {}
+
+def create_provider_client(provider: str) -> httpx.AsyncClient:
+    settings = PROVIDER_HTTP_CONFIG["PROVIDERS"][provider]
+    headers, params = provider_auth(provider)
+    return httpx.AsyncClient(
+        base_url=settings["base_url"],
+        headers=headers,
+        params=params,
+        http2=settings["http2"] and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_connections"],
+            keepalive_expiry=PROVIDER_HTTP_CONFIG["KEEPALIVE_EXPIRY"]
+        ),
+        timeout=httpx.Timeout(
+            PROVIDER_HTTP_CONFIG["READ_TIMEOUT"],
+            connect=PROVIDER_HTTP_CONFIG["CONNECT_TIMEOUT"]
+        )
+    )
+
+def get_provider_client(provider: str) -> httpx.AsyncClient:
+    """Shared client for a provider (created on startup, or on first use)"""
+    client = provider_clients.get(provider)
+    if client is None or client.is_closed:
+        client = provider_clients[provider] = create_provider_client(provider)
+    return client
+
+@app.on_event("startup")
+async def open_provider_clients():
+    for provider in PROVIDER_HTTP_CONFIG["PROVIDERS"]:
+        get_provider_client(provider)
+
+@app.on_event("shutdown")
+async def close_provider_clients():
+    clients = list(provider_clients.values())
+    provider_clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+async def provider_get(provider: str, path: str, headers: Optional[Dict] = None,
+                       params: Optional[Dict] = None, not_found: Any = None) -> Any:
+    """GET a provider endpoint on its shared client; a 404 returns `not_found`"""
+    await acquire_provider_quota(provider)
+    response = await get_provider_client(provider).get(path, headers=headers, params=params)
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = PROVIDER_QUOTA_CONFIG["DEFAULT_RETRY_AFTER"]
+        provider_schedulers[provider].throttle(retry_after)
+        raise ProviderQuotaExceeded(provider, retry_after)
+    if response.status_code == 404:
+        return not_found
+    response.raise_for_status()
+    return response.json()
+
+# === PROVIDER INTEGRATIONS ===
+
+PROVIDER_KEYS = {
+    "hibp": "HIBP_API_KEY",
+    "hunter": "HUNTER_API_KEY",
+    "shodan": "SHODAN_API_KEY",
+    "virustotal": "VIRUSTOTAL_API_KEY"
+}
+
+def provider_enabled(provider: str) -> bool:
+    """True when DEMO_MODE is off and the provider's API key is configured"""
+    key_name = PROVIDER_KEYS[provider]
+    value = API_CONFIG.get(key_name)
+    return not API_CONFIG.get('DEMO_MODE', True) and bool(value) and value != f"YOUR_{key_name}_HERE"
+
+async def fetch_hibp_breaches(email: str) -> List[Dict]:
+    """Breaches for an email from HaveIBeenPwned"""
+    async def fetch():
+        return await provider_get(
+            "hibp",
+            f"/breachedaccount/{email}",
+            params={"truncateResponse": "false"},
+            not_found=[]
+        )
+    return await cached_provider_call("hibp", "breachedaccount", email, fetch)
+
+async def fetch_hunter_person(email: str) -> Dict:
+    """Person enrichment (social handles) for an email from Hunter.io"""
+    async def fetch():
+        return await provider_get(
+            "hunter",
+            "/people/find",
+            params={"email": email},
+            not_found={"data": {}}
+        )
+    return await cached_provider_call("hunter", "people/find", email, fetch)
+
+async def fetch_shodan_domain(domain: str) -> Dict:
+    """DNS and subdomain data for a domain from Shodan"""
+    async def fetch():
+        return await provider_get(
+            "shodan",
+            f"/dns/domain/{domain}",
+            not_found={}
+        )
+    return await cached_provider_call("shodan", "dns/domain", domain, fetch)
+
+async def fetch_virustotal_domain(domain: str) -> Dict:
+    """Domain report from VirusTotal"""
+    async def fetch():
+        return await provider_get(
+            "virustotal",
+            f"/domains/{domain}",
+            not_found={}
+        )
+    return await cached_provider_call("virustotal", "domains", domain, fetch)
+
+# === DOMAIN RESULT CACHE ===
+
+def normalize_domain(domain: str) -> str:
+    """Normalize a domain name for use as a lookup key"""
+    return domain.strip().lower().rstrip('.')
+
+class AsyncTTLCache:
+    """In-process LRU cache with per-entry TTL and single-flight loading.
+
+    Concurrent `get_or_compute` calls for the same key share one in-flight
+    computation; only successful results are stored.
+    """
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+    
+    def get(self, key: tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: tuple, value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    def invalidate(self, key: tuple):
+        self._entries.pop(key, None)
+    
+    async def get_or_compute(self, key: tuple, ttl: float, compute) -> Any:
+        value = self.get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            
+            def on_done(done: asyncio.Future):
+                self._inflight.pop(key, None)
+                if not done.cancelled() and done.exception() is None:
+                    self.set(key, done.result(), ttl)
+            
+            task.add_done_callback(on_done)
+        
+        # shield: si un solicitante se desconecta, los demás siguen esperando el mismo cálculo
+        return await asyncio.shield(task)
+    
+    def snapshot(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+domain_cache = AsyncTTLCache(DOMAIN_CACHE_CONFIG["MAX_ENTRIES"])
+
+def facet_ttl(facet: str) -> float:
+    return DOMAIN_CACHE_CONFIG["TTL_SECONDS"].get(facet, DOMAIN_CACHE_CONFIG["DEFAULT_TTL"])
+
+def cached_domain_facet(facet: str):
+    """Cache a domain handler's result by (facet, normalized domain)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if args:
+                domain, args = args[0], args[1:]
+            else:
+                domain = kwargs.pop("domain")
+            domain = normalize_domain(domain)
+            return await domain_cache.get_or_compute(
+                (facet, domain),
+                facet_ttl(facet),
+                lambda: func(domain, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+@app.get("/api/v1/domain/cache/stats")
+async def get_domain_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Get hit/miss/coalesce counters for the domain result cache"""
+    return {
+        "success": True,
+        "data": {
+            **domain_cache.snapshot(),
+            "ttl_seconds": DOMAIN_CACHE_CONFIG["TTL_SECONDS"],
+            "provider_cache": provider_cache.snapshot()
+        }
+    }
+
+# === DNS RESOLVER ===
+
+DNS_RECORD_TYPES = {"A": 1, "NS": 2, "CNAME": 5, "SOA": 6, "MX": 15, "TXT": 16, "AAAA": 28}
+DNS_TYPE_NAMES = {code: name for name, code in DNS_RECORD_TYPES.items()}
+DNS_RCODES = {0: "NOERROR", 1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+DNS_HEADER = struct.Struct("!HHHHHH")
+DNS_EDNS_PAYLOAD = 1232  # Tamaño UDP anunciado (EDNS0); evita la mayoría de respuestas truncadas
+
+class DNSError(Exception):
+    """A lookup that produced no usable answer (timeout, SERVFAIL, REFUSED, malformed reply)"""
+
+def encode_dns_name(name: str) -> bytes:
     try:
-        # Simulate domain analysis
-        await asyncio.sleep(1)
+        labels = name.encode("idna").split(b".") if name else []
+    except UnicodeError:
+        raise DNSError(f"Invalid domain name: {name}")
+    if any(not label or len(label) > 63 for label in labels):
+        raise DNSError(f"Invalid domain name: {name}")
+    encoded = b"".join(bytes([len(label)]) + label for label in labels) + b"\x00"
+    if len(encoded) > 255:
+        raise DNSError(f"Domain name too long: {name}")
+    return encoded
+
+def build_dns_query(txid: int, name: str, qtype: int) -> bytes:
+    """Recursive query for one name/type, with an EDNS0 OPT record"""
+    return (
+        DNS_HEADER.pack(txid, 0x0100, 1, 0, 0, 1)
+        + encode_dns_name(name) + struct.pack("!HH", qtype, 1)
+        + b"\x00" + struct.pack("!HHIH", 41, DNS_EDNS_PAYLOAD, 0, 0)
+    )
+
+def read_dns_name(message: bytes, offset: int) -> tuple:
+    """Decode a possibly compressed name; returns (name, offset after it)"""
+    labels, end, jumps = [], None, 0
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if jumps > 32:
+                raise DNSError("Compression loop in DNS reply")
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | message[offset + 1]
+            jumps += 1
+        elif length == 0:
+            return ".".join(labels).lower(), (end if end is not None else offset + 1)
+        else:
+            labels.append(message[offset + 1:offset + 1 + length].decode("ascii", "replace"))
+            offset += 1 + length
+
+def parse_dns_rdata(message: bytes, rtype: int, offset: int, length: int) -> Any:
+    rdata = message[offset:offset + length]
+    if rtype == 1 and length == 4:
+        return socket.inet_ntop(socket.AF_INET, rdata)
+    if rtype == 28 and length == 16:
+        return socket.inet_ntop(socket.AF_INET6, rdata)
+    if rtype in (2, 5):
+        return read_dns_name(message, offset)[0]
+    if rtype == 15:
+        return struct.unpack_from("!H", message, offset)[0], read_dns_name(message, offset + 2)[0]
+    if rtype == 16:
+        strings, position = [], 0
+        while position < length:
+            size = rdata[position]
+            strings.append(rdata[position + 1:position + 1 + size])
+            position += 1 + size
+        return b"".join(strings).decode("utf-8", "replace")
+    if rtype == 6:
+        mname, position = read_dns_name(message, offset)
+        rname, position = read_dns_name(message, position)
+        return (mname, rname) + struct.unpack_from("!IIIII", message, position)
+    return rdata.hex()
+
+def parse_dns_response(message: bytes) -> Dict:
+    try:
+        txid, flags, qdcount, ancount, nscount, _ = DNS_HEADER.unpack_from(message)
+        offset = DNS_HEADER.size
+        question = None
+        for _ in range(qdcount):
+            qname, offset = read_dns_name(message, offset)
+            question = (qname, struct.unpack_from("!H", message, offset)[0])
+            offset += 4
+        sections = {"answers": [], "authority": []}
+        for section, count in (("answers", ancount), ("authority", nscount)):
+            for _ in range(count):
+                owner, offset = read_dns_name(message, offset)
+                rtype, _, ttl, length = struct.unpack_from("!HHIH", message, offset)
+                offset += 10
+                sections[section].append((owner, rtype, ttl, parse_dns_rdata(message, rtype, offset, length)))
+                offset += length
+    except (IndexError, struct.error, UnicodeError) as e:
+        raise DNSError(f"Malformed DNS reply: {e}")
+    return {
+        "id": txid,
+        "rcode": DNS_RCODES.get(flags & 0x000F, str(flags & 0x000F)),
+        "truncated": bool(flags & 0x0200),
+        "question": question,
+        **sections
+    }
+
+def format_dns_record(rtype: int, ttl: int, value: Any) -> Dict:
+    if rtype == 15:
+        return {"value": value[1], "priority": value[0], "ttl": ttl}
+    return {"value": value, "ttl": ttl}
+
+def system_nameservers() -> List[str]:
+    try:
+        with open("/etc/resolv.conf") as f:
+            return [line.split()[1] for line in f if line.startswith("nameserver") and len(line.split()) > 1]
+    except OSError:
+        return []
+
+class DNSDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, resolver: "AsyncDNSResolver"):
+        self.resolver = resolver
+        self.transport = None
+    
+    def connection_made(self, transport):
+        self.transport = transport
+    
+    def datagram_received(self, data: bytes, addr):
+        self.resolver._on_datagram(self.transport, data)
+    
+    def error_received(self, exc):
+        # ICMP "puerto inalcanzable" y similares: la consulta acabará por timeout y se reintenta
+        pass
+
+class AsyncDNSResolver:
+    """Stub resolver speaking DNS to recursive upstreams over UDP, with TCP for truncated replies.
+
+    A few connected UDP sockets per upstream are shared by every lookup and
+    replies are matched to the waiting query by transaction id and question.
+    Answers are cached for their TTL and NXDOMAIN/NODATA for the SOA minimum
+    (RFC 2308); concurrent lookups of the same name and type share one
+    query, and at most `max_in_flight` queries are on the wire at once.
+    """
+    
+    def __init__(self, upstreams: List[str], port: int, timeout: float, attempts: int, sockets: int,
+                 max_in_flight: int, cache_entries: int, max_ttl: int, negative_ttl: int):
+        self.upstreams = [(host, port) for host in (upstreams or system_nameservers() or ["1.1.1.1", "8.8.8.8"])]
+        self.timeout = timeout
+        self.attempts = attempts
+        self.sockets_per_upstream = sockets
+        self.max_in_flight = max_in_flight
+        self.cache_entries = cache_entries
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self._sockets: Dict[tuple, List] = {}
+        self._socket_lock: Optional[asyncio.Lock] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[tuple, tuple] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.stats = {"queries": 0, "cache_hits": 0, "negative_hits": 0, "timeouts": 0, "tcp_fallbacks": 0, "errors": 0}
+    
+    async def _upstream_sockets(self, upstream: tuple) -> List:
+        sockets = self._sockets.get(upstream)
+        if sockets:
+            return sockets
+        if self._socket_lock is None:
+            self._socket_lock = asyncio.Lock()
+        async with self._socket_lock:
+            if not self._sockets.get(upstream):
+                loop = asyncio.get_running_loop()
+                created = []
+                for _ in range(self.sockets_per_upstream):
+                    transport, _ = await loop.create_datagram_endpoint(
+                        lambda: DNSDatagramProtocol(self), remote_addr=upstream
+                    )
+                    created.append(transport)
+                self._sockets[upstream] = created
+        return self._sockets[upstream]
+    
+    def _on_datagram(self, transport, data: bytes):
+        if len(data) < DNS_HEADER.size:
+            return
+        entry = self._pending.get((id(transport), int.from_bytes(data[:2], "big")))
+        if entry is not None and not entry[0].done():
+            entry[0].set_result(data)
+    
+    async def _udp_exchange(self, upstream: tuple, name: str, qtype: int) -> Dict:
+        transport = random.choice(await self._upstream_sockets(upstream))
+        while True:
+            txid = secrets.randbelow(65536)
+            key = (id(transport), txid)
+            if key not in self._pending:
+                break
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = (future, name, qtype)
+        try:
+            transport.sendto(build_dns_query(txid, name, qtype))
+            while True:
+                data = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                # Un id que coincide con otra pregunta es una respuesta ajena o falsificada
+                try:
+                    reply = parse_dns_response(data)
+                except DNSError:
+                    reply = None
+                if reply is not None and reply["question"] == (name, qtype):
+                    return reply
+                future = asyncio.get_running_loop().create_future()
+                self._pending[key] = (future, name, qtype)
+        finally:
+            self._pending.pop(key, None)
+    
+    async def _tcp_exchange(self, upstream: tuple, name: str, qtype: int) -> bytes:
+        query = build_dns_query(secrets.randbelow(65536), name, qtype)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*upstream), self.timeout)
+        try:
+            writer.write(struct.pack("!H", len(query)) + query)
+            await writer.drain()
+            length = struct.unpack("!H", await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+            return await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        finally:
+            writer.close()
+    
+    async def _query(self, name: str, qtype: int) -> Dict:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        last_error = "no upstream answered"
+        async with self._slots:
+            for attempt in range(self.attempts):
+                upstream = self.upstreams[attempt % len(self.upstreams)]
+                self.stats["queries"] += 1
+                try:
+                    reply = await self._udp_exchange(upstream, name, qtype)
+                    if reply["truncated"]:
+                        self.stats["tcp_fallbacks"] += 1
+                        reply = parse_dns_response(await self._tcp_exchange(upstream, name, qtype))
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    last_error = f"timed out after {self.timeout:g}s"
+                    continue
+                except (OSError, asyncio.IncompleteReadError, DNSError) as e:
+                    last_error = str(e) or type(e).__name__
+                    continue
+                if reply["rcode"] in ("NOERROR", "NXDOMAIN"):
+                    return reply
+                last_error = reply["rcode"]
+        self.stats["errors"] += 1
+        raise DNSError(f"DNS lookup for {name} {DNS_TYPE_NAMES.get(qtype, qtype)} failed: {last_error}")
+    
+    def _answer(self, name: str, qtype: int, reply: Dict) -> tuple:
+        """(answer, cache ttl) for a NOERROR/NXDOMAIN reply"""
+        records = [
+            format_dns_record(rtype, ttl, value)
+            for _, rtype, ttl, value in reply["answers"] if rtype == qtype
+        ]
+        if records:
+            ttl = min(self.max_ttl, min(ttl for _, _, ttl, _ in reply["answers"]))
+        else:
+            soa = [(ttl, value) for _, rtype, ttl, value in reply["authority"] if rtype == 6]
+            ttl = min(self.negative_ttl, min(soa[0][0], soa[0][1][-1])) if soa else self.negative_ttl
+        answer = {
+            "name": name,
+            "type": DNS_TYPE_NAMES[qtype],
+            "rcode": reply["rcode"],
+            "records": records
+        }
+        return answer, ttl
+    
+    def _cached(self, key: tuple) -> Optional[Dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, answer = entry
+        remaining = int(expires - time.monotonic())
+        if remaining <= 0:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        self.stats["negative_hits" if not answer["records"] else "cache_hits"] += 1
+        # TTL restante, como lo daría un resolvedor con caché
+        return {**answer, "records": [{**record, "ttl": min(record["ttl"], remaining)} for record in answer["records"]]}
+    
+    async def resolve(self, name: str, rtype: str) -> Dict:
+        """Records of one type for a name; NXDOMAIN/NODATA give an empty list, failures raise DNSError"""
+        name = normalize_domain(name)
+        qtype = DNS_RECORD_TYPES.get(rtype.upper())
+        if qtype is None:
+            raise DNSError(f"Unsupported record type: {rtype}")
+        key = (name, qtype)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            answer, ttl = self._answer(name, qtype, await self._query(name, qtype))
+            if ttl > 0:
+                self._cache[key] = (time.monotonic() + ttl, answer)
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+            future.set_result(answer)
+            return answer
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else DNSError("Lookup cancelled"))
+            future.exception()  # Evita el aviso "exception was never retrieved" si nadie más esperaba
+            raise
+        finally:
+            del self._inflight[key]
+    
+    async def resolve_many(self, name: str, rtypes: List[str]) -> Dict[str, Any]:
+        """Query every type at once; each value is an answer or the DNSError for that type"""
+        answers = await asyncio.gather(*(self.resolve(name, rtype) for rtype in rtypes), return_exceptions=True)
+        for answer in answers:
+            if isinstance(answer, BaseException) and not isinstance(answer, DNSError):
+                raise answer
+        return dict(zip(rtypes, answers))
+    
+    @property
+    def cache_size(self) -> int:
+        return len(self._cache)
+    
+    def close(self):
+        for sockets in self._sockets.values():
+            for transport in sockets:
+                transport.close()
+        self._sockets.clear()
+
+dns_resolver = AsyncDNSResolver(
+    DNS_CONFIG["UPSTREAMS"],
+    DNS_CONFIG["PORT"],
+    DNS_CONFIG["TIMEOUT"],
+    DNS_CONFIG["ATTEMPTS"],
+    DNS_CONFIG["SOCKETS_PER_UPSTREAM"],
+    DNS_CONFIG["MAX_IN_FLIGHT"],
+    DNS_CONFIG["CACHE_ENTRIES"],
+    DNS_CONFIG["MAX_TTL"],
+    DNS_CONFIG["NEGATIVE_TTL"]
+)
+
+@app.on_event("shutdown")
+async def close_dns_resolver():
+    dns_resolver.close()
+
+DNS_LOOKUP_TYPES = ["A", "AAAA", "MX", "NS", "TXT", "CNAME"]
+
+async def lookup_dns_records(domain: str, rtypes: List[str] = DNS_LOOKUP_TYPES) -> tuple:
+    """({type: [record, ...]}, {type: error}) for a domain; raises 502 if every type failed"""
+    answers = await dns_resolver.resolve_many(domain, rtypes)
+    records, errors = {}, {}
+    for rtype, answer in answers.items():
+        if isinstance(answer, DNSError):
+            records[rtype] = []
+            errors[rtype] = str(answer)
+        else:
+            records[rtype] = answer["records"]
+    if len(errors) == len(rtypes):
+        raise HTTPException(status_code=502, detail=f"DNS lookup failed: {next(iter(errors.values()))}")
+    return records, errors
+
+# === WHOIS CLIENT ===
+
+class WhoisError(Exception):
+    """A WHOIS query that could not be completed (connection, timeout, no server for the TLD)"""
+
+WHOIS_CONTACT_ROLES = {"registrant": "registrant", "admin": "admin", "administrative": "admin", "tech": "technical", "technical": "technical"}
+WHOIS_CONTACT_FIELDS = {
+    "name": "name", "organization": "organization", "organisation": "organization", "org": "organization",
+    "email": "email", "phone": "phone", "street": "street", "address": "street", "city": "city",
+    "state/province": "state", "state": "state", "postal code": "postal_code", "country": "country"
+}
+WHOIS_FIELDS = {
+    "registrar": "registrar", "registrar name": "registrar", "sponsoring registrar": "registrar",
+    "creation date": "creation_date", "created": "creation_date", "created on": "creation_date",
+    "registered on": "creation_date", "registration time": "creation_date",
+    "registry expiry date": "expiration_date", "registrar registration expiration date": "expiration_date",
+    "expiration date": "expiration_date", "expiry date": "expiration_date", "expires": "expiration_date",
+    "expires on": "expiration_date", "paid-till": "expiration_date",
+    "updated date": "updated_date", "last updated": "updated_date", "last-modified": "updated_date",
+    "changed": "updated_date", "last modified": "updated_date"
+}
+WHOIS_LIST_FIELDS = {"name server": "name_servers", "nserver": "name_servers", "nameserver": "name_servers",
+                     "name servers": "name_servers", "domain status": "status", "status": "status"}
+WHOIS_REFERRAL_FIELDS = ("registrar whois server", "whois server", "refer", "whois")
+WHOIS_NOT_FOUND = ("no match for", "not found", "domain not found", "no data found", "no entries found", "status: free", "status: available")
+WHOIS_DATE_FORMATS = ("%d-%b-%Y", "%Y.%m.%d", "%Y/%m/%d", "%d.%m.%Y", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y")
+
+def normalize_whois_date(value: str) -> str:
+    text = value.strip()
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        for fmt in WHOIS_DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(text.split(" (")[0], fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return text
+    if parsed.utcoffset():
+        parsed = parsed - parsed.utcoffset()
+    return parsed.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def parse_whois_server(value: str) -> Optional[str]:
+    server = value.strip().lower()
+    for scheme in ("whois://", "rwhois://", "http://", "https://"):
+        if server.startswith(scheme):
+            server = server[len(scheme):]
+    server = server.strip("/")
+    return server or None
+
+def parse_whois_response(text: str) -> Dict:
+    """Parse a "Key: value" WHOIS reply into the platform's record shape"""
+    record: Dict[str, Any] = {
+        "registered": not any(line.strip().lower().startswith(WHOIS_NOT_FOUND) for line in text.splitlines()),
+        "registrar": None,
+        "registrant": {}, "admin": {}, "technical": {},
+        "name_servers": [], "status": [],
+        "creation_date": None, "expiration_date": None, "updated_date": None,
+        "referral": None
+    }
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] in "%#>" or ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        key, value = key.strip().lower(), value.strip()
+        if not value:
+            continue
+        
+        if key in WHOIS_FIELDS:
+            field = WHOIS_FIELDS[key]
+            if record[field] is None:
+                record[field] = normalize_whois_date(value) if field.endswith("_date") else value
+        elif key in WHOIS_LIST_FIELDS:
+            field = WHOIS_LIST_FIELDS[key]
+            # "clientTransferProhibited https://icann.org/epp#..." -> solo el código
+            item = value.split()[0].lower().rstrip(".") if field == "name_servers" else value.split(" http")[0]
+            if item not in record[field]:
+                record[field].append(item)
+        elif key in WHOIS_REFERRAL_FIELDS:
+            record["referral"] = record["referral"] or parse_whois_server(value)
+        else:
+            role, _, field = key.partition(" ")
+            field = field.removeprefix("contact ").strip()
+            if role in WHOIS_CONTACT_ROLES and field in WHOIS_CONTACT_FIELDS:
+                contact = record[WHOIS_CONTACT_ROLES[role]]
+                field = WHOIS_CONTACT_FIELDS[field]
+                contact[field] = f"{contact[field]}, {value}" if field == "street" and field in contact else contact.get(field, value)
+    
+    for role in ("registrant", "admin", "technical"):
+        contact = record[role]
+        parts = [contact.pop("street", None), contact.pop("city", None),
+                 " ".join(filter(None, [contact.pop("state", None), contact.pop("postal_code", None)])),
+                 contact.pop("country", None)]
+        if any(parts):
+            contact["address"] = ", ".join(part for part in parts if part)
+    return record
+
+def merge_whois_records(registry: Dict, registrar: Dict) -> Dict:
+    """Registrar replies carry the contacts; registry values fill anything they lack"""
+    merged = dict(registry)
+    for field, value in registrar.items():
+        if field in ("registrant", "admin", "technical"):
+            merged[field] = {**registry[field], **value}
+        elif field == "registered":
+            continue
+        elif value:
+            merged[field] = value
+    return merged
+
+class AsyncWhoisClient:
+    """Port-43 WHOIS client following IANA -> registry -> registrar referrals.
+
+    Each WHOIS server gets its own semaphore and a minimum spacing between
+    queries, since most of them throttle or ban clients that burst. Parsed
+    records are cached per domain for `cache_ttl` seconds and concurrent
+    lookups of the same domain share one set of queries.
+    """
+    
+    def __init__(self, bootstrap: str, servers: Dict[str, str], port: int, timeout: float,
+                 max_per_server: int, min_interval: float, max_referrals: int, max_response_bytes: int,
+                 cache_ttl: int, cache_entries: int):
+        self.bootstrap = bootstrap
+        self.tld_servers = dict(servers)
+        self.port = port
+        self.timeout = timeout
+        self.max_per_server = max_per_server
+        self.min_interval = min_interval
+        self.max_referrals = max_referrals
+        self.max_response_bytes = max_response_bytes
+        self.cache_ttl = cache_ttl
+        self.cache_entries = cache_entries
+        self._server_slots: Dict[str, asyncio.Semaphore] = {}
+        self._server_last: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"queries": 0, "cache_hits": 0, "referrals": 0, "errors": 0}
+    
+    def _address(self, server: str) -> tuple:
+        host, _, port = server.rpartition(":") if server.count(":") == 1 else (server, "", "")
+        return host, int(port) if port.isdigit() else self.port
+    
+    async def query(self, server: str, text: str) -> str:
+        slots = self._server_slots.setdefault(server, asyncio.Semaphore(self.max_per_server))
+        async with slots:
+            wait = self._server_last.get(server, 0) + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._server_last[server] = time.monotonic()
+            self.stats["queries"] += 1
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(*self._address(server)), self.timeout)
+                try:
+                    writer.write(text.encode("idna") + b"\r\n")
+                    await writer.drain()
+                    # El servidor cierra la conexión al terminar la respuesta
+                    data = await asyncio.wait_for(reader.read(self.max_response_bytes), self.timeout)
+                    while data and len(data) < self.max_response_bytes:
+                        chunk = await asyncio.wait_for(reader.read(self.max_response_bytes - len(data)), self.timeout)
+                        if not chunk:
+                            break
+                        data += chunk
+                finally:
+                    writer.close()
+            except (OSError, asyncio.TimeoutError, UnicodeError) as e:
+                self.stats["errors"] += 1
+                raise WhoisError(f"WHOIS query to {server} failed: {str(e) or type(e).__name__}")
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return data.decode("latin-1")
+    
+    async def tld_server(self, tld: str) -> str:
+        server = self.tld_servers.get(tld)
+        if server is None:
+            server = parse_whois_response(await self.query(self.bootstrap, tld))["referral"]
+            if not server:
+                raise WhoisError(f"No WHOIS server known for .{tld}")
+            self.tld_servers[tld] = server
+        return server
+    
+    async def _lookup(self, domain: str) -> Dict:
+        server = await self.tld_server(domain.rsplit(".", 1)[-1])
+        record = parse_whois_response(await self.query(server, domain))
+        record["whois_server"] = server
+        
+        seen = {server}
+        for _ in range(self.max_referrals):
+            referral = record.pop("referral", None)
+            if not referral or referral in seen or not record["registered"]:
+                break
+            seen.add(referral)
+            self.stats["referrals"] += 1
+            try:
+                reply = await self.query(referral, domain)
+            except WhoisError:
+                # El registro del TLD ya da fechas y servidores; los contactos son opcionales
+                break
+            record = merge_whois_records(record, parse_whois_response(reply))
+            record["whois_server"] = referral
+        record.pop("referral", None)
+        return record
+    
+    async def lookup(self, domain: str) -> Dict:
+        """Parsed WHOIS record for a domain; raises WhoisError when no server answered"""
+        domain = normalize_domain(domain)
+        entry = self._cache.get(domain)
+        if entry is not None and entry[0] > time.monotonic():
+            self._cache.move_to_end(domain)
+            self.stats["cache_hits"] += 1
+            return entry[1]
+        
+        future = self._inflight.get(domain)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._inflight[domain] = asyncio.get_running_loop().create_future()
+        try:
+            record = await self._lookup(domain)
+            self._cache[domain] = (time.monotonic() + self.cache_ttl, record)
+            self._cache.move_to_end(domain)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+            future.set_result(record)
+            return record
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else WhoisError("Lookup cancelled"))
+            future.exception()
+            raise
+        finally:
+            del self._inflight[domain]
+
+whois_client = AsyncWhoisClient(
+    WHOIS_CONFIG["BOOTSTRAP_SERVER"],
+    WHOIS_CONFIG["SERVERS"],
+    WHOIS_CONFIG["PORT"],
+    WHOIS_CONFIG["TIMEOUT"],
+    WHOIS_CONFIG["MAX_PER_SERVER"],
+    WHOIS_CONFIG["MIN_INTERVAL"],
+    WHOIS_CONFIG["MAX_REFERRALS"],
+    WHOIS_CONFIG["MAX_RESPONSE_BYTES"],
+    WHOIS_CONFIG["CACHE_TTL"],
+    WHOIS_CONFIG["CACHE_ENTRIES"]
+)
+
+async def lookup_whois(domain: str) -> Dict:
+    try:
+        return await whois_client.lookup(domain)
+    except WhoisError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+async def whois_overview(domain: str) -> Dict:
+    """WHOIS summary for analysis pages, or {"error": ...} when no server answered"""
+    try:
+        whois = await whois_client.lookup(domain)
+    except WhoisError as e:
+        return {"error": str(e)}
+    registrant = whois["registrant"]
+    return {
+        "registrar": whois["registrar"],
+        "creation_date": whois["creation_date"],
+        "expiration_date": whois["expiration_date"],
+        "registrant": registrant.get("organization") or registrant.get("name") or "Privacy Protected",
+        "nameservers": whois["name_servers"],
+        "status": ", ".join(whois["status"]) or ("Active" if whois["registered"] else "Not registered")
+    }
+
+# === SUBDOMAIN ENUMERATION ===
+
+# Lista mínima para cuando no hay SUBDOMAIN_CONFIG["WORDLIST"] en disco
+SUBDOMAIN_WORDLIST = """
+www mail ftp admin api blog shop dev staging test beta demo app apps portal remote vpn
+webmail smtp pop imap mx mx1 mx2 ns ns1 ns2 ns3 dns dns1 dns2 cdn static assets img images
+media files download downloads upload docs help support status monitor grafana kibana
+jenkins ci git gitlab github jira confluence wiki intranet internal corp office owa
+autodiscover exchange login auth sso id accounts account secure m mobile dashboard panel
+cpanel whm plesk webdisk db mysql sql postgres redis elastic search backup old new legacy
+dev1 dev2 test1 test2 stage uat qa preprod prod production sandbox lab labs cloud s3
+store payments pay billing crm erp hr careers jobs news forum community events video
+live chat partners partner extranet gateway proxy firewall router server host web1 web2
+www1 www2 api1 api2 v1 v2 origin edge lb
+""".split()
+
+INTERESTING_SUBDOMAIN_LABELS = {
+    "admin", "dev", "staging", "stage", "test", "uat", "qa", "preprod", "sandbox", "vpn", "remote",
+    "internal", "intranet", "corp", "jenkins", "ci", "git", "gitlab", "jira", "confluence", "db",
+    "mysql", "sql", "postgres", "redis", "elastic", "kibana", "grafana", "backup", "old", "legacy",
+    "cpanel", "whm", "plesk", "panel", "dashboard", "sso", "auth", "login", "owa", "exchange", "proxy",
+    "firewall", "router", "lab", "labs", "beta", "extranet"
+}
+
+SUBDOMAIN_LABEL = re.compile(r"^[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?(?:\.[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?)*$")
+
+@functools.lru_cache(maxsize=1)
+def load_subdomain_wordlist() -> tuple:
+    """Deduplicated, validated labels from the configured wordlist (or the built-in list)"""
+    path = Path(SUBDOMAIN_CONFIG["WORDLIST"])
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            words = [line.strip().lower() for line in f]
+        print(f"📚 Subdomain wordlist: {len(words)} lines from {path}")
+    except OSError:
+        words = SUBDOMAIN_WORDLIST
+    return tuple(dict.fromkeys(word for word in words if word and SUBDOMAIN_LABEL.match(word)))
+
+subdomain_resolver = AsyncDNSResolver(
+    DNS_CONFIG["UPSTREAMS"],
+    DNS_CONFIG["PORT"],
+    SUBDOMAIN_CONFIG["TIMEOUT"],
+    SUBDOMAIN_CONFIG["ATTEMPTS"],
+    SUBDOMAIN_CONFIG["SOCKETS"],
+    SUBDOMAIN_CONFIG["MAX_CONCURRENCY"],
+    SUBDOMAIN_CONFIG["CACHE_ENTRIES"],
+    DNS_CONFIG["MAX_TTL"],
+    DNS_CONFIG["NEGATIVE_TTL"]
+)
+
+@app.on_event("shutdown")
+async def close_subdomain_resolver():
+    subdomain_resolver.close()
+
+async def detect_wildcard_dns(domain: str, resolver: AsyncDNSResolver) -> set:
+    """Addresses that random, surely unregistered labels resolve to (empty set: no wildcard)"""
+    probes = [f"{secrets.token_hex(10)}.{domain}" for _ in range(SUBDOMAIN_CONFIG["WILDCARD_PROBES"])]
+    answers = await asyncio.gather(*(resolver.resolve(probe, "A") for probe in probes), return_exceptions=True)
+    addresses = set()
+    for answer in answers:
+        if isinstance(answer, DNSError):
+            continue
+        if isinstance(answer, BaseException):
+            raise answer
+        addresses.update(record["value"] for record in answer["records"])
+    return addresses
+
+async def enumerate_subdomains(domain: str, labels, concurrency: int, resolver: AsyncDNSResolver = None):
+    """Resolve `label.domain` for every label and yield events as they happen.
+
+    Events are a "wildcard" event first, then "subdomain" events as names
+    resolve, "progress" events every PROGRESS_INTERVAL seconds and a final
+    "summary". A fixed pool of `concurrency` workers shares one label
+    iterator; answers that only contain the wildcard addresses are dropped.
+    """
+    resolver = resolver or subdomain_resolver
+    domain = normalize_domain(domain)
+    labels = list(labels)
+    started = time.monotonic()
+    
+    wildcard = await detect_wildcard_dns(domain, resolver)
+    yield {"type": "wildcard", "detected": bool(wildcard), "addresses": sorted(wildcard)}
+    
+    pending = iter(labels)
+    discoveries: asyncio.Queue = asyncio.Queue()
+    counters = {"resolved": 0, "found": 0, "wildcard_filtered": 0, "errors": 0}
+    
+    def progress() -> Dict:
+        elapsed = time.monotonic() - started
+        return {
+            "total": len(labels),
+            **counters,
+            "rate": round(counters["resolved"] / elapsed, 1) if elapsed else 0.0,
+            "elapsed_ms": round(elapsed * 1000)
+        }
+    
+    async def worker():
+        for label in pending:
+            name = f"{label}.{domain}"
+            try:
+                answer = await resolver.resolve(name, "A")
+            except DNSError:
+                counters["errors"] += 1
+            else:
+                addresses = [record["value"] for record in answer["records"]]
+                if addresses and wildcard and wildcard.issuperset(addresses):
+                    counters["wildcard_filtered"] += 1
+                elif addresses:
+                    counters["found"] += 1
+                    await discoveries.put({"type": "subdomain", "name": name, "label": label, "addresses": addresses})
+            counters["resolved"] += 1
+        await discoveries.put(None)
+    
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(labels))))]
+    interval = SUBDOMAIN_CONFIG["PROGRESS_INTERVAL"]
+    next_progress = time.monotonic() + interval
+    try:
+        finished_workers = 0
+        while finished_workers < len(workers):
+            try:
+                event = await asyncio.wait_for(discoveries.get(), max(0.0, next_progress - time.monotonic()))
+            except asyncio.TimeoutError:
+                next_progress = time.monotonic() + interval
+                yield {"type": "progress", **progress()}
+                continue
+            if event is None:
+                finished_workers += 1
+                continue
+            yield event
+    finally:
+        # El cliente puede desconectarse a mitad del stream
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    
+    yield {"type": "summary", "domain": domain, "wildcard": bool(wildcard), "concurrency": len(workers), **progress()}
+
+def subdomain_entry(event: Dict) -> Dict:
+    return {
+        "name": event["name"],
+        "ip": event["addresses"][0],
+        "addresses": event["addresses"],
+        "active": True,
+        "interesting": event["label"].split(".")[0] in INTERESTING_SUBDOMAIN_LABELS,
+        "ports": [],
+        "technology": None,
+        "source": "dns"
+    }
+
+def subdomain_concurrency(value: Optional[int]) -> int:
+    if value is None:
+        return SUBDOMAIN_CONFIG["DEFAULT_CONCURRENCY"]
+    return max(1, min(value, SUBDOMAIN_CONFIG["MAX_CONCURRENCY"]))
+
+# === CERTIFICATE TRANSPARENCY INDEX ===
+
+# Sufijos públicos de varias etiquetas más comunes, para cuando no hay lista PSL en disco
+PUBLIC_SUFFIXES_BUILTIN = """
+co.uk org.uk ac.uk gov.uk me.uk ltd.uk plc.uk net.uk sch.uk nhs.uk com.au net.au org.au edu.au gov.au
+co.nz org.nz net.nz govt.nz co.jp ne.jp or.jp ac.jp go.jp co.kr or.kr com.br net.br org.br gov.br
+com.mx org.mx gob.mx com.ar com.co com.pe com.tr com.cn net.cn org.cn gov.cn com.hk com.tw com.sg
+com.my co.in net.in org.in gov.in co.za org.za gov.za co.il com.ua com.es com.pl co.id or.id com.vn
+com.ph com.pk com.sa com.eg co.th in.th github.io herokuapp.com appspot.com blogspot.com cloudfront.net
+azurewebsites.net vercel.app netlify.app pages.dev workers.dev web.app firebaseapp.com
+""".split()
+
+class PublicSuffixList:
+    """Registered-domain lookup following the Public Suffix List rules (plain, "*." and "!" rules)"""
+    
+    def __init__(self, rules):
+        self.rules, self.wildcards, self.exceptions = set(), set(), set()
+        for rule in rules:
+            rule = rule.strip().lower()
+            if not rule or rule.startswith("//"):
+                continue
+            rule = rule.split()[0]
+            if rule.startswith("!"):
+                self.exceptions.add(rule[1:])
+            elif rule.startswith("*."):
+                self.wildcards.add(rule[2:])
+            else:
+                self.rules.add(rule)
+    
+    @classmethod
+    def load(cls, path: str) -> "PublicSuffixList":
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls(f)
+        except OSError:
+            return cls(PUBLIC_SUFFIXES_BUILTIN)
+    
+    def registered_domain(self, name: str) -> Optional[str]:
+        """`a.b.example.co.uk` -> `example.co.uk`; None for a bare public suffix"""
+        labels = name.split(".")
+        suffix_length = 1  # Regla por defecto "*": la última etiqueta
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            if candidate in self.exceptions:
+                suffix_length = len(labels) - i - 1
+                break
+            if candidate in self.rules:
+                suffix_length = len(labels) - i
+                break
+            if i + 1 < len(labels) and ".".join(labels[i + 1:]) in self.wildcards:
+                suffix_length = len(labels) - i
+                break
+        if len(labels) <= suffix_length:
+            return None
+        return ".".join(labels[-suffix_length - 1:])
+
+public_suffixes = PublicSuffixList.load(CT_INDEX_CONFIG["PUBLIC_SUFFIX_LIST"])
+
+# Rutas a los nombres del certificado final en cada formato de exportación; los
+# CN del emisor y de la cadena (leaf_cert.issuer, chain[], parsed.issuer) no son del dominio
+CT_NAME_PATHS = (
+    ("data", "leaf_cert", "all_domains"),                          # certstream
+    ("leaf_cert", "all_domains"),                                  # certstream, solo "data"
+    ("name_value",), ("common_name",),                             # crt.sh
+    ("names",), ("parsed", "names"),                               # Censys
+    ("parsed", "extensions", "subject_alt_name", "dns_names"),
+    ("parsed", "subject", "common_name"),
+    ("all_domains",), ("dns_names",)                               # volcados planos
+)
+
+def extract_ct_names(record: Any):
+    """Yield each leaf certificate SAN/CN name once from a certstream, crt.sh or Censys record.
+
+    A line holding a list (the crt.sh JSON output) is treated as one record per entry.
+    """
+    seen = set()
+    for entry in record if isinstance(record, list) else [record]:
+        if not isinstance(entry, dict):
+            continue
+        for path in CT_NAME_PATHS:
+            value = entry
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            for item in value if isinstance(value, list) else [value]:
+                if not isinstance(item, str):
+                    continue
+                # crt.sh separa los nombres de name_value con saltos de línea
+                for name in item.replace(",", " ").split():
+                    if name not in seen:
+                        seen.add(name)
+                        yield name
+
+def normalize_ct_name(name: str) -> Optional[str]:
+    name = name.strip().lower().rstrip(".")
+    while name.startswith("*."):
+        name = name[2:]
+    if not name.isascii():
+        try:
+            name = name.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    if "." not in name or name.rsplit(".", 1)[1].isdigit() or not SUBDOMAIN_LABEL.match(name):
+        return None
+    return name
+
+def key_hash64(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+def reserve_open_files(count: int):
+    """Make room for `count` more open files, raising the soft limit if needed.
+
+    Raises ValueError when the hard limit does not allow it, instead of
+    failing halfway through a bulk load with EMFILE.
+    """
+    if not RESOURCE_AVAILABLE:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = count + 64  # Margen para stdin/stdout, los ficheros de origen y el resultado
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        if hard != resource.RLIM_INFINITY and hard < needed:
+            raise ValueError(
+                f"{count} temporary files are needed but the open file limit is {hard}; "
+                f"use fewer buckets or raise the limit (ulimit -n)"
+            )
+        resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+
+class CTSubdomainIndex:
+    """Read side of the on-disk CT index: registered domain -> subdomain names seen in certificates.
+
+    Layout: a header, one blob per registered domain (`domain\\nname\\nname...`)
+    and a directory of (hash64, offset, length) entries sorted by hash, so a
+    lookup is a binary search over the memory-mapped directory plus one
+    slice. The file is replaced atomically by `build_ct_index`; the next
+    lookup notices the new inode and remaps it.
+    """
+    
+    MAGIC = b"CTIDX001"
+    HEADER = struct.Struct("<8sQQQd")  # magic, dominios, nombres, offset del directorio, fecha de build
+    ENTRY = struct.Struct("<QQI")      # hash de la clave, offset del blob, longitud
+    
+    def __init__(self, path: str, limit: int):
+        self.path = Path(path)
+        self.limit = limit
+        self._map = None
+        self._identity = None
+        self._lock = threading.Lock()
+        self.domains = self.names = self.directory_offset = 0
+        self.built_at = None
+    
+    def _refresh(self):
+        try:
+            stat = self.path.stat()
+        except OSError:
+            stat = None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size) if stat else None
+        if identity == self._identity:
+            return
+        with self._lock:
+            if identity == self._identity:
+                return
+            old, self._map = self._map, None
+            self.domains = self.names = 0
+            self.built_at = None
+            if stat and stat.st_size >= self.HEADER.size:
+                with open(self.path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, domains, names, directory_offset, built_at = self.HEADER.unpack_from(mm)
+                if magic == self.MAGIC:
+                    self._map = mm
+                    self.domains, self.names, self.directory_offset = domains, names, directory_offset
+                    self.built_at = datetime.fromtimestamp(built_at).isoformat()
+                else:
+                    mm.close()
+            self._identity = identity
+            # Las búsquedas en curso pueden seguir usando el mapa anterior; lo libera el GC
+            del old
+    
+    def _blob(self, key: str) -> Optional[bytes]:
+        self._refresh()
+        mm, count, directory = self._map, self.domains, self.directory_offset
+        if mm is None or not count:
+            return None
+        encoded = key.encode("ascii")
+        target = key_hash64(encoded)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.ENTRY.unpack_from(mm, directory + middle * self.ENTRY.size)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        prefix = encoded + b"\n"
+        while low < count:
+            key_hash, offset, length = self.ENTRY.unpack_from(mm, directory + low * self.ENTRY.size)
+            if key_hash != target:
+                break
+            if mm[offset:offset + len(prefix)] == prefix:
+                return mm[offset + len(prefix):offset + length]
+            low += 1
+        return None
+    
+    def subdomains(self, domain: str) -> List[str]:
+        """Known names under `domain` (itself a registered domain or any name below one)"""
+        domain = normalize_ct_name(domain) or ""
+        registered = public_suffixes.registered_domain(domain) if domain else None
+        blob = self._blob(registered) if registered else None
+        if not blob:
+            return []
+        names = blob.decode("ascii").split("\n")
+        if domain != registered:
+            suffix = "." + domain
+            names = [name for name in names if name.endswith(suffix)]
+        return names[:self.limit]
+    
+    def stats(self) -> Dict:
+        self._refresh()
+        return {"available": self._map is not None, "domains": self.domains, "names": self.names, "built_at": self.built_at}
+    
+    def entries(self):
+        """(registered domain, [names]) for every domain in the index, in directory order"""
+        self._refresh()
+        mm = self._map
+        if mm is None:
+            return
+        for i in range(self.domains):
+            _, offset, length = self.ENTRY.unpack_from(mm, self.directory_offset + i * self.ENTRY.size)
+            registered, *names = mm[offset:offset + length].decode("ascii").split("\n")
+            yield registered, names
+
+def read_ct_records(path: str):
+    """Decoded JSON records from a JSON-lines export, gzip or plain; malformed lines yield None"""
+    with open(path, "rb") as raw:
+        compressed = raw.read(2) == b"\x1f\x8b"
+    with (gzip.open(path, "rb") if compressed else open(path, "rb")) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield orjson.loads(line) if ORJSON_AVAILABLE else json.loads(line)
+            except ValueError:
+                yield None
+
+def build_ct_index(sources: List[str], path: str, buckets: int, merge: bool = True, progress=None) -> Dict:
+    """Stream CT exports into a new index at `path`, merging the existing index unless `merge` is False.
+
+    Pairs are spilled to `buckets` temporary files by the top bits of the
+    key hash, so each bucket can be deduplicated and sorted in memory on its
+    own and the buckets, written in order, give a hash-sorted directory.
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    stats = {"files": len(sources), "records": 0, "malformed": 0, "names": 0, "skipped_names": 0}
+    shift = 64 - max(1, (buckets - 1).bit_length())
+    reserve_open_files(1 << (64 - shift))
+    
+    with tempfile.TemporaryDirectory(dir=target.parent, prefix=".ct-build-") as work:
+        spills = [open(Path(work) / f"{i:04d}", "w", encoding="ascii", buffering=1 << 20)
+                  for i in range(1 << (64 - shift))]
+        hashes: Dict[str, int] = {}
+        
+        def spill(registered: str, name: str):
+            key_hash = hashes.get(registered)
+            if key_hash is None:
+                if len(hashes) > 100000:
+                    hashes.clear()
+                key_hash = hashes[registered] = key_hash64(registered.encode("ascii"))
+            spills[key_hash >> shift].write(f"{registered} {name}\n")
+        
+        try:
+            if merge:
+                for registered, names in CTSubdomainIndex(path, 0).entries():
+                    for name in names:
+                        spill(registered, name)
+            for source in sources:
+                for record in read_ct_records(source):
+                    if record is None:
+                        stats["malformed"] += 1
+                        continue
+                    stats["records"] += 1
+                    for raw_name in extract_ct_names(record):
+                        name = normalize_ct_name(raw_name)
+                        registered = public_suffixes.registered_domain(name) if name else None
+                        if not registered or registered == name:
+                            stats["skipped_names"] += 1
+                            continue
+                        stats["names"] += 1
+                        spill(registered, name)
+                    if progress and stats["records"] % 100000 == 0:
+                        progress(stats)
+        finally:
+            for f in spills:
+                f.close()
+        
+        partial = target.with_name(target.name + ".part")
+        domains = names = 0
+        with open(partial, "wb") as out, open(Path(work) / "directory", "w+b") as directory:
+            out.write(b"\0" * CTSubdomainIndex.HEADER.size)
+            for i in range(len(spills)):
+                bucket = Path(work) / f"{i:04d}"
+                grouped: Dict[str, set] = {}
+                with open(bucket, encoding="ascii") as f:
+                    for line in f:
+                        registered, name = line.split()
+                        grouped.setdefault(registered, set()).add(name)
+                bucket.unlink()
+                keyed = sorted((key_hash64(registered.encode("ascii")), registered) for registered in grouped)
+                for key_hash, registered in keyed:
+                    blob = "\n".join([registered, *sorted(grouped[registered])]).encode("ascii")
+                    directory.write(CTSubdomainIndex.ENTRY.pack(key_hash, out.tell(), len(blob)))
+                    out.write(blob)
+                    domains += 1
+                    names += len(grouped[registered])
+            directory_offset = out.tell()
+            directory.seek(0)
+            shutil.copyfileobj(directory, out)
+            out.seek(0)
+            out.write(CTSubdomainIndex.HEADER.pack(CTSubdomainIndex.MAGIC, domains, names, directory_offset, time.time()))
+        os.replace(partial, target)
+    
+    stats.update({"domains": domains, "indexed_names": names})
+    return stats
+
+ct_index = CTSubdomainIndex(CT_INDEX_CONFIG["PATH"], CT_INDEX_CONFIG["LOOKUP_LIMIT"])
+
+# === PASSIVE DNS STORE ===
+
+def normalize_pdns_value(rrtype: str, value: str) -> Optional[str]:
+    value = str(value).strip()
+    if rrtype in ("A", "AAAA"):
+        family = socket.AF_INET if rrtype == "A" else socket.AF_INET6
+        try:
+            return socket.inet_ntop(family, socket.inet_pton(family, value))
+        except (OSError, ValueError):
+            return None
+    if rrtype in ("CNAME", "NS", "MX", "PTR"):
+        # "10 mx.example.com." -> "mx.example.com"
+        value = value.split()[-1] if value else value
+        return value.lower().rstrip(".") or None
+    # TXT y demás: valor literal en una línea (los saltos romperían el volcado intermedio)
+    return " ".join(value.split())[:PASSIVE_DNS_CONFIG["MAX_VALUE_LENGTH"]] or None
+
+PDNS_MAX_TIME = 2 ** 32 - 1  # Las columnas de fechas son uint32
+
+def parse_pdns_time(value: Any) -> Optional[int]:
+    """Epoch seconds (or milliseconds) or ISO 8601 -> epoch seconds; None if unusable or out of range"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        try:
+            seconds = int(float(value))
+        except (OverflowError, ValueError):
+            return None
+        # Muchas exportaciones usan milisegundos; en segundos serían fechas posteriores al año 5000
+        if seconds >= 10 ** 11:
+            seconds //= 1000
+    else:
+        try:
+            seconds = int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp())
+        except (OverflowError, OSError, ValueError):
+            return None
+    return seconds if 0 <= seconds <= PDNS_MAX_TIME else None
+
+def pdns_record_rows(record: Dict):
+    domain = normalize_domain(str(record.get("domain") or record.get("rrname") or ""))
+    rrtype = str(record.get("rrtype") or record.get("type") or "").upper()
+    values = record.get("value", record.get("rdata"))
+    first_seen = parse_pdns_time(record.get("first_seen", record.get("time_first")))
+    last_seen = parse_pdns_time(record.get("last_seen", record.get("time_last"))) or first_seen
+    # Un nombre válido no tiene tabuladores ni saltos de línea que rompan el volcado intermedio
+    if not SUBDOMAIN_LABEL.match(domain) or len(domain) > 253 or not rrtype or values is None or first_seen is None:
+        yield None
+        return
+    for value in values if isinstance(values, list) else [values]:
+        value = normalize_pdns_value(rrtype, value)
+        yield None if value is None else (domain, rrtype, value, first_seen, max(first_seen, last_seen))
+
+def read_pdns_rows(path: str):
+    """(domain, rrtype, value, first_seen, last_seen) rows from a CSV or JSON-lines file, plain or gzip.
+
+    CSV needs a `domain,rrtype,value,first_seen,last_seen` header; JSON lines
+    accept the same keys or the common passive-DNS export shape
+    (`rrname`, `rrtype`, `rdata` string or list, `time_first`, `time_last`).
+    Unusable lines yield None.
+    """
+    with open(path, "rb") as raw:
+        compressed = raw.read(2) == b"\x1f\x8b"
+    with (gzip.open(path, "rt", encoding="utf-8", errors="replace") if compressed
+          else open(path, encoding="utf-8", errors="replace")) as f:
+        first = f.readline()
+        lines = itertools.chain([first], f)
+        if not first.lstrip().startswith("{"):
+            for record in csv.DictReader(lines):
+                yield from pdns_record_rows(record)
+            return
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line) if ORJSON_AVAILABLE else json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield from pdns_record_rows(record) if isinstance(record, dict) else [None]
+
+class PassiveDNSStore:
+    """Columnar on-disk passive-DNS store with a forward (domain) and a reverse (value) table.
+
+    Each table keeps its rows grouped by key and, within a key, newest
+    `last_seen` first, as separate columns (rrtype, first_seen, last_seen,
+    reference to the other side's string). A directory of (hash64, key
+    string, first row, row count) entries sorted by hash makes a lookup a
+    binary search plus one bulk unpack of each column slice, however many
+    rows the store holds. The file is rebuilt by `build_passive_dns_store`
+    and remapped when it changes on disk.
+    """
+    
+    MAGIC = b"PDNS0001"
+    HEADER = struct.Struct("<8sQd")        # magic, filas, fecha de build
+    TABLE = struct.Struct("<QQQQQQQQ")     # claves, filas, heap, directorio, rrtype, first, last, referencias
+    ENTRY = struct.Struct("<QQQI")         # hash de la clave, referencia a la clave, primera fila, nº de filas
+    STRING = struct.Struct("<H")           # longitud de cada cadena del heap
+    TABLES = ("forward", "reverse")
+    
+    def __init__(self, path: str, limit: int):
+        self.path = Path(path)
+        self.limit = limit
+        self._map = None
+        self._identity = None
+        self._tables: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.built_at = None
+    
+    def _refresh(self):
+        try:
+            stat = self.path.stat()
+        except OSError:
+            stat = None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size) if stat else None
+        if identity == self._identity:
+            return
+        with self._lock:
+            if identity == self._identity:
+                return
+            self._map, self._tables, self.rows, self.built_at = None, {}, 0, None
+            if stat and stat.st_size >= self.HEADER.size + 2 * self.TABLE.size:
+                with open(self.path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, rows, built_at = self.HEADER.unpack_from(mm)
+                if magic == self.MAGIC:
+                    self._tables = {
+                        name: self.TABLE.unpack_from(mm, self.HEADER.size + i * self.TABLE.size)
+                        for i, name in enumerate(self.TABLES)
+                    }
+                    self._map, self.rows = mm, rows
+                    self.built_at = datetime.fromtimestamp(built_at).isoformat()
+                else:
+                    mm.close()
+            self._identity = identity
+    
+    def _string(self, mm, heap: int, ref: int) -> str:
+        offset = heap + ref
+        (length,) = self.STRING.unpack_from(mm, offset)
+        return mm[offset + self.STRING.size:offset + self.STRING.size + length].decode("utf-8")
+    
+    def _rows(self, table: str, key: str, limit: int) -> List[tuple]:
+        """(rrtype, first_seen, last_seen, other) rows for a key, newest first"""
+        self._refresh()
+        mm = self._map
+        if mm is None:
+            return []
+        keys, _, heap, directory, rrtypes, firsts, lasts, refs = self._tables[table]
+        target = key_hash64(key.encode("utf-8"))
+        low, high = 0, keys
+        while low < high:
+            middle = (low + high) // 2
+            if self.ENTRY.unpack_from(mm, directory + middle * self.ENTRY.size)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        while low < keys:
+            key_hash, key_ref, start, count = self.ENTRY.unpack_from(mm, directory + low * self.ENTRY.size)
+            if key_hash != target:
+                return []
+            if self._string(mm, heap, key_ref) == key:
+                break
+            low += 1
+        else:
+            return []
         
-        mock_data = {
-            "domain": domain,
-            "ip": "192.168.1.1",
-            "ssl_status": "Valid (TLS 1.3)",
-            "registration_date": "2020-01-15",
-            "expiration_date": "2025-01-15",
-            "registrar": "GoDaddy",
-            "status": "active",
-            "country": "US",
-            "organization": "Example Corp"
+        count = min(count, limit)
+        columns = (
+            struct.unpack_from(f"<{count}H", mm, rrtypes + start * 2),
+            struct.unpack_from(f"<{count}I", mm, firsts + start * 4),
+            struct.unpack_from(f"<{count}I", mm, lasts + start * 4),
+            [self._string(mm, heap, ref) for ref in struct.unpack_from(f"<{count}Q", mm, refs + start * 8)]
+        )
+        return list(zip(*columns))
+    
+    def resolutions(self, domain: str, rrtypes: Optional[List[str]] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Every value seen for a domain ("all IPs for this domain"), newest last_seen first"""
+        rows = self._rows("forward", normalize_domain(domain), limit or self.limit)
+        wanted = {DNS_RECORD_TYPES.get(rrtype, -1) for rrtype in rrtypes} if rrtypes else None
+        return [
+            {"rrtype": DNS_TYPE_NAMES.get(rrtype, str(rrtype)), "value": value, "first_seen": first, "last_seen": last}
+            for rrtype, first, last, value in rows if wanted is None or rrtype in wanted
+        ]
+    
+    def domains_for(self, value: str, limit: Optional[int] = None) -> List[Dict]:
+        """Every domain seen resolving to a value ("all domains ever seen on this IP"), newest first"""
+        rrtype = "AAAA" if ":" in value else "A" if value.replace(".", "").isdigit() else "CNAME"
+        key = normalize_pdns_value(rrtype, value)
+        if key is None:
+            return []
+        return [
+            {"domain": domain, "rrtype": DNS_TYPE_NAMES.get(rrtype, str(rrtype)), "first_seen": first, "last_seen": last}
+            for rrtype, first, last, domain in self._rows("reverse", key, limit or self.limit)
+        ]
+    
+    def stats(self) -> Dict:
+        self._refresh()
+        return {
+            "available": self._map is not None,
+            "rows": self.rows,
+            "domains": self._tables["forward"][0] if self._tables else 0,
+            "values": self._tables["reverse"][0] if self._tables else 0,
+            "built_at": self.built_at
         }
+    
+    def dump(self):
+        """Every stored row as (domain, rrtype, value, first_seen, last_seen), for merging into a rebuild"""
+        self._refresh()
+        mm = self._map
+        if mm is None:
+            return
+        keys, _, heap, directory, rrtypes, firsts, lasts, refs = self._tables["forward"]
+        for i in range(keys):
+            _, key_ref, start, count = self.ENTRY.unpack_from(mm, directory + i * self.ENTRY.size)
+            domain = self._string(mm, heap, key_ref)
+            for j in range(start, start + count):
+                rrtype = DNS_TYPE_NAMES.get(struct.unpack_from("<H", mm, rrtypes + j * 2)[0])
+                if rrtype is None:
+                    continue
+                yield (domain, rrtype, self._string(mm, heap, struct.unpack_from("<Q", mm, refs + j * 8)[0]),
+                       struct.unpack_from("<I", mm, firsts + j * 4)[0], struct.unpack_from("<I", mm, lasts + j * 4)[0])
+
+def build_passive_dns_store(sources: List[str], path: str, buckets: int, merge: bool = True, progress=None) -> Dict:
+    """Bulk-load resolution rows into a new store at `path`, merging the existing store unless `merge` is False.
+
+    Rows are spilled twice to hash-partitioned temporary buckets, once by
+    domain and once by value, so each table is built one bucket at a time:
+    duplicates of (domain, rrtype, value) are merged (earliest first_seen,
+    latest last_seen), keys sorted by hash and every column appended to its
+    own file. The column files are then concatenated behind the header.
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    stats = {"files": len(sources), "rows": 0, "skipped": 0}
+    shift = 64 - max(1, (buckets - 1).bit_length())
+    bucket_count = 1 << (64 - shift)
+    reserve_open_files(bucket_count * len(PassiveDNSStore.TABLES))
+    
+    with tempfile.TemporaryDirectory(dir=target.parent, prefix=".pdns-build-") as work:
+        work = Path(work)
+        spills = {table: [] for table in PassiveDNSStore.TABLES}
         
-        return {"success": True, "data": mock_data}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        def spill(row: tuple):
+            domain, rrtype, value, first_seen, last_seen = row
+            line = f"{domain}\t{DNS_RECORD_TYPES[rrtype]}\t{value}\t{first_seen}\t{last_seen}\n"
+            spills["forward"][key_hash64(domain.encode("utf-8")) >> shift].write(line)
+            spills["reverse"][key_hash64(value.encode("utf-8")) >> shift].write(line)
+        
+        try:
+            for table, files in spills.items():
+                for i in range(bucket_count):
+                    files.append(open(work / f"{table}-{i:04d}", "w", encoding="utf-8", buffering=1 << 18))
+            if merge:
+                for row in PassiveDNSStore(path, 0).dump():
+                    spill(row)
+            for source in sources:
+                for row in read_pdns_rows(source):
+                    if row is None or row[1] not in DNS_RECORD_TYPES:
+                        stats["skipped"] += 1
+                        continue
+                    spill(row)
+                    stats["rows"] += 1
+                    if progress and stats["rows"] % 1000000 == 0:
+                        progress(stats)
+        finally:
+            for files in spills.values():
+                for f in files:
+                    f.close()
+        
+        tables, stored = {}, 0
+        for table in PassiveDNSStore.TABLES:
+            key_column = 0 if table == "forward" else 2
+            other_column = 2 if table == "forward" else 0
+            sections = {name: open(work / f"{table}.{name}", "w+b") for name in ("directory", "rrtype", "first", "last", "ref", "heap")}
+            keys = rows = 0
+            for i in range(bucket_count):
+                bucket = work / f"{table}-{i:04d}"
+                merged: Dict[tuple, list] = {}
+                with open(bucket, encoding="utf-8") as f:
+                    for line in f:
+                        fields = line.rstrip("\n").split("\t")
+                        first_seen, last_seen = int(fields[3]), int(fields[4])
+                        entry = merged.get((fields[key_column], int(fields[1]), fields[other_column]))
+                        if entry is None:
+                            merged[(fields[key_column], int(fields[1]), fields[other_column])] = [first_seen, last_seen]
+                        else:
+                            entry[0] = min(entry[0], first_seen)
+                            entry[1] = max(entry[1], last_seen)
+                bucket.unlink()
+                
+                grouped: Dict[str, list] = {}
+                for (key, rrtype, other), (first_seen, last_seen) in merged.items():
+                    grouped.setdefault(key, []).append((last_seen, first_seen, rrtype, other))
+                del merged
+                strings: Dict[str, int] = {}
+                
+                def heap_ref(text: str) -> int:
+                    ref = strings.get(text)
+                    if ref is None:
+                        encoded = text.encode("utf-8")
+                        ref = strings[text] = sections["heap"].tell()
+                        sections["heap"].write(PassiveDNSStore.STRING.pack(len(encoded)) + encoded)
+                    return ref
+                
+                for key_hash, key in sorted((key_hash64(key.encode("utf-8")), key) for key in grouped):
+                    entries = sorted(grouped[key], reverse=True)
+                    sections["directory"].write(PassiveDNSStore.ENTRY.pack(key_hash, heap_ref(key), rows, len(entries)))
+                    array("H", [entry[2] for entry in entries]).tofile(sections["rrtype"])
+                    array("I", [entry[1] for entry in entries]).tofile(sections["first"])
+                    array("I", [entry[0] for entry in entries]).tofile(sections["last"])
+                    array("Q", [heap_ref(entry[3]) for entry in entries]).tofile(sections["ref"])
+                    keys += 1
+                    rows += len(entries)
+            tables[table] = (keys, rows, sections)
+            stored = rows
+        
+        partial = target.with_name(target.name + ".part")
+        with open(partial, "wb") as out:
+            out.write(PassiveDNSStore.HEADER.pack(PassiveDNSStore.MAGIC, stored, time.time()))
+            out.write(b"\0" * (PassiveDNSStore.TABLE.size * len(tables)))
+            layout = []
+            for table in PassiveDNSStore.TABLES:
+                keys, rows, sections = tables[table]
+                offsets = {}
+                for name in ("heap", "directory", "rrtype", "first", "last", "ref"):
+                    offsets[name] = out.tell()
+                    sections[name].seek(0)
+                    shutil.copyfileobj(sections[name], out)
+                    sections[name].close()
+                layout.append((keys, rows, offsets))
+            out.seek(PassiveDNSStore.HEADER.size)
+            for keys, rows, offsets in layout:
+                out.write(PassiveDNSStore.TABLE.pack(keys, rows, offsets["heap"], offsets["directory"], offsets["rrtype"],
+                                                     offsets["first"], offsets["last"], offsets["ref"]))
+        os.replace(partial, target)
+    
+    stats.update({"stored_rows": stored, "domains": tables["forward"][0], "values": tables["reverse"][0]})
+    return stats
+
+passive_dns = PassiveDNSStore(PASSIVE_DNS_CONFIG["PATH"], PASSIVE_DNS_CONFIG["LOOKUP_LIMIT"])
+
+# === DOMAIN INTELLIGENCE ENDPOINTS ===
+
+@app.get("/api/v1/domain/basic-info/{domain}")
+@cached_domain_facet("basic_info")
+async def get_domain_basic_info(domain: str, current_user: dict = Depends(get_current_user)):
+    """Get basic domain information: address from DNS, registrar and dates from WHOIS"""
+    answer, whois = await asyncio.gather(
+        dns_resolver.resolve(domain, "A"), whois_client.lookup(domain), return_exceptions=True
+    )
+    data = {
+        "domain": domain,
+        "ip": None,
+        "status": "inactive",
+        "registration_date": None,
+        "expiration_date": None,
+        "registrar": None,
+        "organization": None
+    }
+    errors = {}
+    if isinstance(answer, DNSError):
+        errors["dns"] = str(answer)
+    elif isinstance(answer, BaseException):
+        raise answer
+    elif answer["records"]:
+        data.update(ip=answer["records"][0]["value"], status="active")
+    if isinstance(whois, WhoisError):
+        errors["whois"] = str(whois)
+    elif isinstance(whois, BaseException):
+        raise whois
+    else:
+        data.update(
+            registration_date=whois["creation_date"],
+            expiration_date=whois["expiration_date"],
+            registrar=whois["registrar"],
+            organization=whois["registrant"].get("organization")
+        )
+    if errors:
+        data["errors"] = errors
+    return {"success": True, "data": data}
 
 @app.get("/api/v1/domain/whois/{domain}")
+@cached_domain_facet("whois")
 async def get_domain_whois(domain: str, current_user: dict = Depends(get_current_user)):
     """Get WHOIS information for domain"""
-    try:
-        await asyncio.sleep(2)
-        
-        mock_whois = {
-            "registrant": {
-                "name": "John Doe",
-                "organization": "Example Corp",
-                "email": f"admin@{domain}",
-                "phone": "+1.5551234567",
-                "address": "123 Main St, Anytown, ST 12345, US"
-            },
-            "admin": {
-                "name": "Admin Contact",
-                "email": f"admin@{domain}",
-                "phone": "+1.5551234567"
-            },
-            "technical": {
-                "name": "Tech Contact",
-                "email": f"tech@{domain}",
-                "phone": "+1.5551234567"
-            },
-            "name_servers": [
-                f"ns1.{domain}",
-                f"ns2.{domain}",
-                f"ns3.{domain}"
-            ],
-            "creation_date": "2020-01-15T00:00:00Z",
-            "expiration_date": "2025-01-15T00:00:00Z",
-            "updated_date": "2023-01-15T00:00:00Z"
-        }
-        
-        return {"success": True, "data": mock_whois}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"success": True, "data": await lookup_whois(domain)}
 
 @app.get("/api/v1/domain/dns/{domain}")
+@cached_domain_facet("dns")
 async def get_domain_dns(domain: str, current_user: dict = Depends(get_current_user)):
     """Get DNS records for domain"""
-    try:
-        await asyncio.sleep(1.5)
-        
-        mock_dns = {
-            "a": [{"value": "192.168.1.1", "ttl": 300}, {"value": "192.168.1.2", "ttl": 300}],
-            "aaaa": [{"value": "2001:db8::1", "ttl": 300}],
-            "mx": [{"value": f"mail.{domain}", "priority": 10, "ttl": 3600}],
-            "ns": [{"value": f"ns1.{domain}", "ttl": 86400}, {"value": f"ns2.{domain}", "ttl": 86400}],
-            "txt": [{"value": "v=spf1 include:_spf.google.com ~all", "ttl": 300}],
-            "cname": [{"value": f"www.{domain} -> {domain}", "ttl": 300}]
-        }
-        
-        return {"success": True, "data": mock_dns}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    records, errors = await lookup_dns_records(domain)
+    data = {rtype.lower(): values for rtype, values in records.items()}
+    if errors:
+        data["errors"] = {rtype.lower(): error for rtype, error in errors.items()}
+    return {"success": True, "data": data}
 
 @app.get("/api/v1/domain/subdomains/{domain}")
+@cached_domain_facet("subdomains")
 async def get_domain_subdomains(domain: str, current_user: dict = Depends(get_current_user)):
     """Get subdomains for domain"""
-    try:
-        await asyncio.sleep(3)
-        
-        common_subdomains = ['www', 'mail', 'ftp', 'admin', 'api', 'blog', 'shop', 'dev']
-        subdomains = []
-        
-        for i, sub in enumerate(common_subdomains[:6]):
-            subdomains.append({
-                "name": f"{sub}.{domain}",
-                "ip": f"192.168.1.{i+10}",
-                "active": random.choice([True, False]),
-                "interesting": random.choice([True, False]),
-                "ports": random.sample([80, 443, 22, 21, 25], k=random.randint(1, 3)),
-                "technology": random.choice(['Apache', 'Nginx', 'IIS', 'Node.js'])
-            })
-        
-        stats = {
-            "total": len(subdomains),
-            "active": len([s for s in subdomains if s['active']]),
-            "inactive": len([s for s in subdomains if not s['active']]),
-            "interesting": len([s for s in subdomains if s['interesting']])
-        }
-        
-        return {"success": True, "data": {"subdomains": subdomains, "stats": stats}}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    subdomains, summary = [], {}
+    async for event in enumerate_subdomains(domain, load_subdomain_wordlist(), subdomain_concurrency(None)):
+        if event["type"] == "subdomain":
+            subdomains.append(subdomain_entry(event))
+        elif event["type"] == "summary":
+            summary = event
+    subdomains.sort(key=lambda sub: sub["name"])
+    known = {sub["name"] for sub in subdomains}
+    
+    # Nombres vistos en certificados (índice CT local) que la fuerza bruta no resolvió
+    ct_names = ct_index.subdomains(domain)
+    for name in ct_names:
+        if name not in known:
+            known.add(name)
+            subdomains.append({"name": name, "ip": None, "active": False,
+                               "interesting": name.split(".")[0] in INTERESTING_SUBDOMAIN_LABELS,
+                               "ports": [], "technology": None, "source": "ct"})
+    
+    if provider_enabled("shodan"):
+        shodan_data = await fetch_shodan_domain(domain)
+        for label in shodan_data.get("subdomains", []):
+            name = f"{label}.{domain}"
+            if name not in known:
+                known.add(name)
+                subdomains.append({"name": name, "ip": None, "active": True, "interesting": False,
+                                   "ports": [], "technology": None, "source": "shodan"})
+    
+    stats = {
+        "total": len(subdomains),
+        "active": len([s for s in subdomains if s['active']]),
+        "inactive": len([s for s in subdomains if not s['active']]),
+        "interesting": len([s for s in subdomains if s['interesting']]),
+        "wordlist": summary.get("total", 0),
+        "certificate_transparency": len(ct_names),
+        "wildcard": summary.get("wildcard", False),
+        "rate": summary.get("rate", 0.0),
+        "elapsed_ms": summary.get("elapsed_ms", 0)
+    }
+    
+    return {"success": True, "data": {"subdomains": subdomains, "stats": stats}}
+
+@app.get("/api/v1/domain/subdomains/{domain}/enumerate")
+async def enumerate_domain_subdomains(
+    domain: str,
+    concurrency: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Brute-force subdomains, streaming discoveries and progress as NDJSON"""
+    domain = normalize_domain(domain)
+    if not domain or not SUBDOMAIN_LABEL.match(domain):
+        raise HTTPException(status_code=400, detail="Invalid domain")
+    
+    async def stream():
+        async for event in enumerate_subdomains(domain, load_subdomain_wordlist(), subdomain_concurrency(concurrency)):
+            if event["type"] == "subdomain":
+                event = {"type": "subdomain", **subdomain_entry(event)}
+            yield event
+    
+    return NDJSONResponse(stream())
 
 @app.get("/api/v1/domain/technology/{domain}")
+@cached_domain_facet("technology")
 async def get_domain_technology(domain: str, current_user: dict = Depends(get_current_user)):
     """Get technology stack for domain"""
     try:
@@ -505,6 +3934,7 @@ async def get_domain_technology(domain: str, current_user: dict = Depends(get_cu
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/domain/security/{domain}")
+@cached_domain_facet("security")
 async def get_domain_security(domain: str, current_user: dict = Depends(get_current_user)):
     """Get security assessment for domain"""
     try:
@@ -548,11 +3978,22 @@ async def get_domain_security(domain: str, current_user: dict = Depends(get_curr
             "checks": checks
         }
         
+        if provider_enabled("virustotal"):
+            attributes = (await fetch_virustotal_domain(domain)).get("data", {}).get("attributes", {})
+            security_data["virustotal"] = {
+                "reputation": attributes.get("reputation"),
+                "last_analysis_stats": attributes.get("last_analysis_stats", {}),
+                "categories": attributes.get("categories", {})
+            }
+        
         return {"success": True, "data": security_data}
+    except ProviderQuotaExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/domain/geolocation/{domain}")
+@cached_domain_facet("geolocation")
 async def get_domain_geolocation(domain: str, current_user: dict = Depends(get_current_user)):
     """Get geolocation data for domain"""
     try:
@@ -581,63 +4022,218 @@ async def get_domain_geolocation(domain: str, current_user: dict = Depends(get_c
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/domain/related/{domain}")
+@cached_domain_facet("related")
 async def get_related_domains(domain: str, current_user: dict = Depends(get_current_user)):
     """Get related domains"""
-    try:
-        await asyncio.sleep(2)
-        
-        base_domain = domain.split('.')[0]
-        tld = '.'.join(domain.split('.')[1:])
-        
-        related_types = {
-            "similar": [f"{base_domain}{i}.{tld}" for i in range(1, 4)],
-            "same_ip": [f"example{i}.com" for i in range(1, 3)],
-            "same_owner": [f"{base_domain}-{suffix}.{tld}" for suffix in ['shop', 'blog', 'api']],
-            "historical": [f"old-{base_domain}.{tld}", f"archive-{base_domain}.{tld}"]
-        }
-        
-        related_domains = {}
-        for rel_type, domains in related_types.items():
-            related_domains[rel_type] = [
-                {
-                    "domain": d,
+    domain = normalize_domain(domain)
+    base_domain = domain.split('.')[0]
+    tld = '.'.join(domain.split('.')[1:])
+    
+    related_types = {
+        "similar": [f"{base_domain}{i}.{tld}" for i in range(1, 4)],
+        "same_owner": [f"{base_domain}-{suffix}.{tld}" for suffix in ['shop', 'blog', 'api']]
+    }
+    
+    related_domains = {}
+    for rel_type, domains in related_types.items():
+        related_domains[rel_type] = [
+            {
+                "domain": d,
+                "relationship": rel_type,
+                "last_seen": (datetime.now() - timedelta(days=random.randint(1, 365))).strftime('%Y-%m-%d'),
+                "status": random.choice(['active', 'inactive'])
+            } for d in domains
+        ]
+    
+    # Direcciones actuales (DNS en vivo) e históricas (DNS pasivo), y quién más se vio en ellas
+    current = set()
+    for answer in (await dns_resolver.resolve_many(domain, ["A", "AAAA"])).values():
+        if not isinstance(answer, DNSError):
+            current.update(record["value"] for record in answer["records"])
+    historical = [row["value"] for row in passive_dns.resolutions(domain, ["A", "AAAA"]) if row["value"] not in current]
+    
+    active_since = time.time() - PASSIVE_DNS_CONFIG["ACTIVE_DAYS"] * 86400
+    seen = {domain}
+    for rel_type, addresses in (("same_ip", sorted(current)), ("historical", list(dict.fromkeys(historical)))):
+        related_domains[rel_type] = []
+        for address in addresses[:PASSIVE_DNS_CONFIG["MAX_RELATED_ADDRESSES"]]:
+            for row in passive_dns.domains_for(address):
+                if row["domain"] in seen:
+                    continue
+                seen.add(row["domain"])
+                related_domains[rel_type].append({
+                    "domain": row["domain"],
                     "relationship": rel_type,
-                    "last_seen": (datetime.now() - timedelta(days=random.randint(1, 365))).strftime('%Y-%m-%d'),
-                    "status": random.choice(['active', 'inactive'])
-                } for d in domains
-            ]
-        
-        return {"success": True, "data": related_domains}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+                    "ip": address,
+                    "first_seen": datetime.fromtimestamp(row["first_seen"]).strftime('%Y-%m-%d'),
+                    "last_seen": datetime.fromtimestamp(row["last_seen"]).strftime('%Y-%m-%d'),
+                    "status": "active" if row["last_seen"] >= active_since else "inactive"
+                })
+    
+    order = ("similar", "same_ip", "same_owner", "historical")
+    return {"success": True, "data": {rel_type: related_domains[rel_type] for rel_type in order}}
+
+# Facets shown on the domain page, in display order
+DOMAIN_FACETS = {
+    "basic_info": get_domain_basic_info,
+    "whois": get_domain_whois,
+    "dns": get_domain_dns,
+    "subdomains": get_domain_subdomains,
+    "technology": get_domain_technology,
+    "security": get_domain_security,
+    "geolocation": get_domain_geolocation,
+    "related": get_related_domains
+}
+
+def format_sse(event: str, data: Dict) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {render_json(data).decode()}\n\n"
+
+@app.get("/api/v1/domain/profile/{domain}")
+async def get_domain_profile(domain: str, current_user: dict = Depends(get_current_user)):
+    """Run every domain facet in parallel and push each one over SSE as it completes"""
+    domain = domain.strip().lower()
+    
+    async def run_facet(name: str, handler) -> tuple:
+        started = time.monotonic()
+        try:
+            result = await handler(domain, current_user=current_user)
+            payload = {"facet": name, "success": True, "data": result["data"]}
+        except HTTPException as e:
+            payload = {"facet": name, "success": False, "error": e.detail}
+        except Exception as e:
+            payload = {"facet": name, "success": False, "error": str(e)}
+        payload["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+        return payload
+    
+    async def stream():
+        started = time.monotonic()
+        tasks = [asyncio.create_task(run_facet(name, handler)) for name, handler in DOMAIN_FACETS.items()]
+        gathered = asyncio.gather(*tasks, return_exceptions=True)
+        failed = []
+        try:
+            yield format_sse("start", {"domain": domain, "facets": list(DOMAIN_FACETS)})
+            for next_done in asyncio.as_completed(tasks):
+                payload = await next_done
+                if not payload["success"]:
+                    failed.append(payload["facet"])
+                yield format_sse("facet", payload)
+            
+            yield format_sse("complete", {
+                "domain": domain,
+                "failed": failed,
+                "elapsed_ms": round((time.monotonic() - started) * 1000)
+            })
+        finally:
+            # Cancela las facetas pendientes si el cliente cierra la conexión
+            gathered.cancel()
+            await asyncio.gather(gathered, return_exceptions=True)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@cached_domain_facet("bulk_summary")
+async def analyze_domain_summary(domain: str) -> Dict:
+    """Run the per-domain analysis used by the bulk engine"""
+    try:
+        addresses = (await dns_resolver.resolve(domain, "A"))["records"]
+    except DNSError:
+        addresses = []
+    
+    return {
+        "domain": domain,
+        "ip": addresses[0]["value"] if addresses else None,
+        "status": "online" if addresses else "offline",
+        "ssl": random.choice(['valid', 'invalid']),
+        "registrar": random.choice(['GoDaddy', 'Namecheap', 'CloudFlare']),
+        "country": random.choice(['US', 'DE', 'UK', 'SG']),
+        "security_score": random.randint(60, 95),
+        "subdomains": random.randint(5, 25)
+    }
+
+async def run_bulk_domain_analysis(domains: List[str], concurrency: int, timeout: float):
+    """Analyze domains concurrently and yield each result as soon as it finishes.
+
+    A fixed pool of `concurrency` workers pulls domains from a shared iterator,
+    so at most `concurrency` analyses are in flight and only finished results
+    wait in the queue. A failure or timeout is reported for that domain only.
+    """
+    pending = iter(domains)
+    results: asyncio.Queue = asyncio.Queue()
+    
+    async def worker():
+        outbound_priority.set(PRIORITY_BULK)
+        for domain in pending:
+            started = time.monotonic()
+            try:
+                data = await asyncio.wait_for(analyze_domain_summary(domain), timeout)
+                result = {"domain": domain, "success": True, "data": data}
+            except asyncio.TimeoutError:
+                result = {"domain": domain, "success": False, "error": f"Timed out after {timeout:g}s"}
+            except Exception as e:
+                result = {"domain": domain, "success": False, "error": str(e)}
+            result["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+            await results.put(result)
+        await results.put(None)
+    
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(domains)))]
+    try:
+        finished_workers = 0
+        while finished_workers < len(workers):
+            result = await results.get()
+            if result is None:
+                finished_workers += 1
+                continue
+            yield result
+    finally:
+        # El cliente puede desconectarse a mitad del stream
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
 
 @app.post("/api/v1/domain/bulk-analyze")
 async def bulk_analyze_domains(request: dict, current_user: dict = Depends(get_current_user)):
-    """Bulk analyze multiple domains"""
+    """Bulk analyze multiple domains, streaming one NDJSON line per domain"""
+    domains = [str(d).strip().lower() for d in request.get('domains', []) if str(d).strip()]
+    if not domains:
+        raise HTTPException(status_code=400, detail="No domains provided")
+    if len(domains) > BULK_ANALYSIS_CONFIG["MAX_DOMAINS"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many domains (max {BULK_ANALYSIS_CONFIG['MAX_DOMAINS']})"
+        )
+    
     try:
-        domains = request.get('domains', [])
-        if not domains:
-            raise HTTPException(status_code=400, detail="No domains provided")
-        
-        results = []
-        for domain in domains:
-            await asyncio.sleep(1)  # Simulate analysis time
-            
-            analysis = {
-                "domain": domain,
-                "ip": f"192.168.{random.randint(1, 255)}.{random.randint(1, 255)}",
-                "status": random.choice(['online', 'offline']),
-                "ssl": random.choice(['valid', 'invalid']),
-                "registrar": random.choice(['GoDaddy', 'Namecheap', 'CloudFlare']),
-                "country": random.choice(['US', 'DE', 'UK', 'SG']),
-                "security_score": random.randint(60, 95),
-                "subdomains": random.randint(5, 25)
-            }
-            results.append(analysis)
+        concurrency = int(request.get('concurrency', BULK_ANALYSIS_CONFIG["DEFAULT_CONCURRENCY"]))
+        timeout = float(request.get('timeout', BULK_ANALYSIS_CONFIG["DOMAIN_TIMEOUT"]))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid concurrency or timeout")
+    concurrency = max(1, min(concurrency, BULK_ANALYSIS_CONFIG["MAX_CONCURRENCY"]))
+    timeout = max(0.1, min(timeout, BULK_ANALYSIS_CONFIG["MAX_DOMAIN_TIMEOUT"]))
+    
+    async def stream():
+        started = time.monotonic()
+        succeeded = failed = 0
+        async for result in run_bulk_domain_analysis(domains, concurrency, timeout):
+            if result["success"]:
+                succeeded += 1
+            else:
+                failed += 1
+            yield {"type": "result", **result}
         
-        return {"success": True, "data": results}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        yield {
+            "type": "summary",
+            "total": len(domains),
+            "succeeded": succeeded,
+            "failed": failed,
+            "concurrency": concurrency,
+            "elapsed_ms": round((time.monotonic() - started) * 1000)
+        }
+    
+    return NDJSONResponse(stream())
 
 # === IMAGE ANALYSIS ENDPOINTS ===
 
@@ -772,421 +4368,1692 @@ async def analyze_image(request: dict, current_user: dict = Depends(get_current_
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/v1/image/reverse-search")
-async def reverse_image_search(request: dict, current_user: dict = Depends(get_current_user)):
-    """Perform reverse image search"""
-    try:
-        image_url = request.get('image_url')
-        if not image_url:
-            raise HTTPException(status_code=400, detail="No image URL provided")
+@app.post("/api/v1/image/reverse-search")
+async def reverse_image_search(request: dict, current_user: dict = Depends(get_current_user)):
+    """Perform reverse image search"""
+    try:
+        image_url = request.get('image_url')
+        if not image_url:
+            raise HTTPException(status_code=400, detail="No image URL provided")
+        
+        await asyncio.sleep(2)
+        
+        engines_results = [
+            {"engine": "Google Images", "matches": random.randint(20, 80), "url": f"https://images.google.com/search?tbs=sbi:url={image_url}"},
+            {"engine": "TinEye", "matches": random.randint(5, 30), "url": f"https://tineye.com/search?url={image_url}"},
+            {"engine": "Yandex Images", "matches": random.randint(10, 50), "url": f"https://yandex.com/images/search?rpt=imageview&url={image_url}"}
+        ]
+        
+        return {"success": True, "data": {"engines": engines_results, "totalMatches": sum(r["matches"] for r in engines_results)}}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/image/extract-metadata")
+async def extract_image_metadata(request: dict, current_user: dict = Depends(get_current_user)):
+    """Extract metadata from image"""
+    try:
+        await asyncio.sleep(1)
+        
+        metadata = {
+            "basic": {
+                "filename": request.get('filename', 'unknown.jpg'),
+                "filesize": "2.4 MB",
+                "format": "JPEG",
+                "dimensions": "1920x1080",
+                "created": "2024-01-15 14:30:22"
+            },
+            "camera": {
+                "make": "Canon",
+                "model": "EOS 5D Mark IV",
+                "software": "Adobe Photoshop 2024"
+            },
+            "location": {
+                "gps": "40.7128° N, 74.0060° W" if random.random() > 0.5 else None,
+                "location": "New York, NY" if random.random() > 0.5 else None
+            }
+        }
+        
+        return {"success": True, "data": metadata}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/image/bulk-analyze")
+async def bulk_analyze_images(request: dict, current_user: dict = Depends(get_current_user)):
+    """Bulk analyze multiple images, streaming one NDJSON line per image"""
+    images = request.get('images', [])
+    if not images:
+        raise HTTPException(status_code=400, detail="No images provided")
+    
+    async def stream():
+        started = time.monotonic()
+        for i, image in enumerate(images):
+            await asyncio.sleep(1)  # Simulate processing time
+            
+            yield {
+                "type": "result",
+                "filename": image.get('filename', f'image_{i+1}.jpg'),
+                "size": image.get('size', '1.2 MB'),
+                "reverseSearchMatches": random.randint(10, 50),
+                "facesDetected": random.randint(0, 3),
+                "objectsDetected": random.randint(2, 8),
+                "hasMetadata": random.random() > 0.3,
+                "processingTime": f"{random.randint(1000, 3000)}ms",
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        yield {
+            "type": "summary",
+            "total": len(images),
+            "elapsed_ms": round((time.monotonic() - started) * 1000)
+        }
+    
+    return NDJSONResponse(stream())
+
+# === REPORT AGGREGATES ===
+
+INVESTIGATION_TYPE_LABELS = {
+    "email": "Email",
+    "domain": "Domain",
+    "social": "Social Media",
+    "phone": "Phone",
+    "image": "Image"
+}
+PRIORITY_LABELS = {"high": "High", "medium": "Medium", "low": "Low"}
+
+class ReportAggregates:
+    """Per-user report counters kept up to date from repository events.
+
+    Rebuilt with one scan at startup, then adjusted by each
+    create/update/delete/finding event, so every dashboard read is O(1).
+    """
+    
+    def __init__(self):
+        self._users: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _empty() -> Dict:
+        return {
+            "total": 0,
+            "findings": 0,
+            "completed": 0,
+            "completed_hours": 0.0,
+            "by_type": {},
+            "by_priority": {},
+            "by_status": {},
+            "created_by_month": {},
+            "findings_by_month": {}
+        }
+    
+    @staticmethod
+    def _bump(counter: Dict, key: str, delta: float):
+        value = counter.get(key, 0) + delta
+        if value:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+    
+    def _apply_row(self, row: Dict, sign: int):
+        agg = self._users.setdefault(row["user_id"], self._empty())
+        agg["total"] += sign
+        agg["findings"] += sign * (row.get("findings_count") or 0)
+        self._bump(agg["by_type"], row["type"], sign)
+        self._bump(agg["by_priority"], row["priority"], sign)
+        self._bump(agg["by_status"], row["status"], sign)
+        self._bump(agg["created_by_month"], row["created_at"][:7], sign)
+        if row["status"] == "completed":
+            agg["completed"] += sign
+            agg["completed_hours"] += sign * (row.get("actual_hours") or 0)
+    
+    def apply(self, event: str, before: Optional[Dict], after: Optional[Dict], finding: Optional[Dict] = None):
+        """Repository listener"""
+        with self._lock:
+            if before is not None:
+                self._apply_row(before, -1)
+            if after is not None:
+                self._apply_row(after, +1)
+            if event == "finding_added":
+                agg = self._users[after["user_id"]]
+                self._bump(agg["findings_by_month"], finding["created_at"][:7], 1)
+            elif event == "deleted":
+                agg = self._users[before["user_id"]]
+                for month, count in before.get("findings_by_month", {}).items():
+                    self._bump(agg["findings_by_month"], month, -count)
+    
+    def rebuild(self, repo: "InvestigationRepository"):
+        users: Dict[str, Dict] = {}
+        with self._lock:
+            self._users = users
+            for row in repo.iter_rows():
+                self._apply_row(row, +1)
+            for user_id, month, count in repo.findings_by_month():
+                self._bump(users.setdefault(user_id, self._empty())["findings_by_month"], month, count)
+    
+    def get(self, user_id: str) -> Dict:
+        with self._lock:
+            agg = self._users.get(user_id) or self._empty()
+            return {
+                key: dict(value) if isinstance(value, dict) else value
+                for key, value in agg.items()
+            }
+
+report_aggregates = ReportAggregates()
+investigation_repo.add_listener(report_aggregates.apply)
+
+@app.on_event("startup")
+async def load_report_aggregates():
+    await asyncio.to_thread(report_aggregates.rebuild, investigation_repo)
+
+def percent_change(current: float, previous: float) -> int:
+    if not previous:
+        return 100 if current else 0
+    return round((current - previous) / previous * 100)
+
+def previous_month_key(now: datetime) -> str:
+    return (now.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+# === ACTIVITY ROLLUPS ===
+
+def parse_day(timestamp: str) -> date:
+    return date.fromisoformat(timestamp[:10])
+
+# granularidad -> (fecha a número de bucket, número de bucket a su primer día)
+ROLLUP_GRANULARITIES = {
+    "day": (lambda d: d.toordinal(), lambda b: date.fromordinal(b)),
+    "week": (lambda d: (d.toordinal() - 1) // 7, lambda b: date.fromordinal(b * 7 + 1)),
+    "month": (lambda d: d.year * 12 + d.month - 1, lambda b: date(b // 12, b % 12 + 1, 1)),
+    "quarter": (lambda d: d.year * 4 + (d.month - 1) // 3, lambda b: date(b // 4, (b % 4) * 3 + 1, 1))
+}
+
+class RollupStore:
+    """Per-user event counts in fixed-size ring buffers per granularity.
+
+    Each granularity keeps `retention` slots; a slot remembers which bucket it
+    holds, so stale slots read as zero and are reset on the next write. Events
+    older than the retention window are dropped.
+    """
+    
+    SERIES = ("created", "completed", "archived")
+    
+    def __init__(self, retention: Dict[str, int]):
+        self.retention = retention
+        self._users: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def _rings(self, user_id: str) -> Dict:
+        rings = self._users.get(user_id)
+        if rings is None:
+            rings = self._users[user_id] = {
+                granularity: {
+                    "ids": array("q", [-1]) * size,
+                    **{series: array("l", [0]) * size for series in self.SERIES}
+                }
+                for granularity, size in self.retention.items()
+            }
+        return rings
+    
+    def _record(self, user_id: str, series: str, day: date, delta: int):
+        today = date.today()
+        rings = self._rings(user_id)
+        for granularity, size in self.retention.items():
+            to_bucket = ROLLUP_GRANULARITIES[granularity][0]
+            bucket = to_bucket(day)
+            if bucket <= to_bucket(today) - size:
+                continue
+            ring = rings[granularity]
+            slot = bucket % size
+            if ring["ids"][slot] != bucket:
+                ring["ids"][slot] = bucket
+                for name in self.SERIES:
+                    ring[name][slot] = 0
+            ring[series][slot] += delta
+    
+    def record(self, user_id: str, series: str, day: date, delta: int = 1):
+        with self._lock:
+            self._record(user_id, series, day, delta)
+    
+    def counts(self, user_id: str, granularity: str, first: int, last: int) -> Dict[int, Dict]:
+        """Counts of the stored buckets in [first, last]; missing buckets are zero.
+
+        Walks the ring slots, not the range, so the cost is bounded by the
+        retention whatever range is asked for.
+        """
+        to_bucket = ROLLUP_GRANULARITIES[granularity][0]
+        size = self.retention[granularity]
+        current = to_bucket(date.today())
+        first, last = max(first, current - size + 1), min(last, current)
+        result = {}
+        with self._lock:
+            ring = self._users.get(user_id, {}).get(granularity)
+            if ring is None or first > last:
+                return result
+            for slot, bucket in enumerate(ring["ids"]):
+                if first <= bucket <= last:
+                    result[bucket] = {name: ring[name][slot] for name in self.SERIES}
+        return result
+    
+    def _record_closure(self, row: Dict, sign: int):
+        if row["status"] in CLOSED_STATUSES and row.get("closed_at"):
+            self._record(row["user_id"], row["status"], parse_day(row["closed_at"]), sign)
+    
+    def _apply_row(self, row: Dict, sign: int):
+        self._record(row["user_id"], "created", parse_day(row["created_at"]), sign)
+        self._record_closure(row, sign)
+    
+    def apply(self, event: str, before: Optional[Dict], after: Optional[Dict], finding: Optional[Dict] = None):
+        """Repository listener"""
+        with self._lock:
+            if event == "created":
+                self._apply_row(after, +1)
+            elif event == "deleted":
+                self._apply_row(before, -1)
+            elif event == "updated" and before["status"] != after["status"]:
+                self._record_closure(before, -1)
+                self._record_closure(after, +1)
+    
+    def rebuild(self, repo: "InvestigationRepository"):
+        with self._lock:
+            self._users = {}
+            for row in repo.iter_rows():
+                self._apply_row(row, +1)
+
+rollup_store = RollupStore(ROLLUP_CONFIG["RETENTION"])
+investigation_repo.add_listener(rollup_store.apply)
+
+@app.on_event("startup")
+async def load_rollups():
+    await asyncio.to_thread(rollup_store.rebuild, investigation_repo)
+
+def rollup_series(user_id: str, granularity: str, start: date, end: date, max_points: int) -> List[tuple]:
+    """(first day, summed counts) per point between start and end.
+
+    When the range has more buckets than `max_points`, consecutive buckets are
+    merged so the result never exceeds `max_points` points. Ranges longer than
+    the retained buckets are rejected with 400.
+    """
+    to_bucket, from_bucket = ROLLUP_GRANULARITIES[granularity]
+    first, last = to_bucket(start), to_bucket(end)
+    retention = rollup_store.retention[granularity]
+    if last - first + 1 > retention:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too wide: at most {retention} {granularity} buckets are kept"
+        )
+    step = max(1, -(-(last - first + 1) // max(1, max_points)))
+    points = [
+        (from_bucket(bucket), dict.fromkeys(RollupStore.SERIES, 0))
+        for bucket in range(first, last + 1, step)
+    ]
+    for bucket, counts in rollup_store.counts(user_id, granularity, first, last).items():
+        totals = points[(bucket - first) // step][1]
+        for name in RollupStore.SERIES:
+            totals[name] += counts[name]
+    return points
+
+def parse_report_range(period_days: int, start: Optional[str], end: Optional[str]) -> tuple:
+    """Resolve an explicit start/end (YYYY-MM-DD) or the last `period_days` days"""
+    try:
+        end_day = date.fromisoformat(end) if end else date.today()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=period_days - 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start_day, end_day
+
+# === TOP INVESTIGATIONS INDEX ===
+
+class TopInvestigationsIndex:
+    """Sorted per-user indexes answering top-K queries without sorting.
+
+    For each sort key there is one sorted list per filter combination (all,
+    by type, by status, by type and status), so a filtered top-K is a slice of
+    an already ordered list. Lists are updated from repository events.
+    """
+    
+    # sort_by -> (clave de orden ascendente, se lee del final)
+    SORT_KEYS = {
+        "findings": (lambda row: (row["findings_count"], row["created_at"], row["id"]), True),
+        "time": (lambda row: (row["actual_hours"] or 0, row["id"]), False),
+        "recent": (lambda row: (row["created_at"], row["id"]), True)
+    }
+    
+    def __init__(self):
+        self._lists: Dict[tuple, list] = {}
+        self._rows: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _filters(row: Dict) -> tuple:
+        return ((None, None), (row["type"], None), (None, row["status"]), (row["type"], row["status"]))
+    
+    def _add(self, row: Dict):
+        summary = {
+            "id": row["id"],
+            "user_id": row["user_id"],
+            "name": row["name"],
+            "type": row["type"],
+            "status": row["status"],
+            "findings_count": row.get("findings_count") or 0,
+            "actual_hours": row.get("actual_hours") or 0,
+            "progress": row.get("progress") or 0,
+            "created_at": row["created_at"]
+        }
+        self._rows[row["id"]] = summary
+        for sort_by, (key, _) in self.SORT_KEYS.items():
+            entry = key(summary)
+            for type_filter, status_filter in self._filters(summary):
+                bisect.insort(self._lists.setdefault((summary["user_id"], sort_by, type_filter, status_filter), []), entry)
+    
+    def _remove(self, investigation_id: str):
+        summary = self._rows.pop(investigation_id, None)
+        if summary is None:
+            return
+        for sort_by, (key, _) in self.SORT_KEYS.items():
+            entry = key(summary)
+            for type_filter, status_filter in self._filters(summary):
+                list_key = (summary["user_id"], sort_by, type_filter, status_filter)
+                entries = self._lists[list_key]
+                position = bisect.bisect_left(entries, entry)
+                if position < len(entries) and entries[position] == entry:
+                    del entries[position]
+                if not entries:
+                    del self._lists[list_key]
+    
+    def apply(self, event: str, before: Optional[Dict], after: Optional[Dict], finding: Optional[Dict] = None):
+        """Repository listener"""
+        with self._lock:
+            if before is not None:
+                self._remove(before["id"])
+            if after is not None:
+                self._add(after)
+    
+    def rebuild(self, repo: "InvestigationRepository"):
+        with self._lock:
+            self._lists = {}
+            self._rows = {}
+            for row in repo.iter_rows():
+                self._add(row)
+    
+    def top(self, user_id: str, sort_by: str, limit: int,
+            type_filter: Optional[str] = None, status_filter: Optional[str] = None) -> List[Dict]:
+        key, descending = self.SORT_KEYS[sort_by]
+        with self._lock:
+            entries = self._lists.get((user_id, sort_by, type_filter, status_filter), [])
+            selected = entries[-limit:][::-1] if descending else entries[:limit]
+            return [dict(self._rows[entry[-1]]) for entry in selected]
+
+top_investigations_index = TopInvestigationsIndex()
+investigation_repo.add_listener(top_investigations_index.apply)
+
+@app.on_event("startup")
+async def load_top_investigations_index():
+    await asyncio.to_thread(top_investigations_index.rebuild, investigation_repo)
+
+# === ACTIVITY LOG ===
+
+class ActivityLog:
+    """Append-only activity events in rotating segment files.
+
+    Each record is a 4-byte little-endian length followed by compact JSON.
+    A record's position (`segment << 32 | offset`) is its id and its cursor.
+    `append` reserves the event's position and indexes it right away; a
+    background task writes queued events in batches at their reserved
+    positions, and until then readers get them from memory. An in-memory
+    index maps (user_id, type) to ascending positions, so filtered,
+    newest-first pages are a bisect plus a few reads from the memory-mapped
+    segments. The index is rebuilt by scanning the segments at startup.
+    """
+    
+    HEADER = struct.Struct("<I")
+    
+    def __init__(self, directory: str, segment_bytes: int, max_segments: int,
+                 batch_size: int, flush_interval: float, fsync: bool = False):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._pending: List[tuple] = []      # (posición, payload) por escribir, en orden
+        self._unwritten: Dict[int, Dict] = {}  # posición -> evento aún no escrito
+        self._early: List[Dict] = []         # Eventos anteriores a load()
+        self._tail: Optional[tuple] = None   # (segmento, offset) del próximo registro
+        self._index: Dict[tuple, array] = {}
+        self._segments: List[int] = []
+        self._file = None
+        self._maps: Dict[int, tuple] = {}  # segmento -> (mmap, tamaño mapeado)
+        self._lock = threading.Lock()        # cola pendiente e índice
+        self._write_lock = threading.Lock()  # un único escritor de segmentos
+        self._map_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"{segment:08d}.log"
+    
+    def _open_segment(self, segment: int):
+        # Sin buffer y sin O_APPEND: cada lote se escribe en las posiciones ya reservadas
+        path = self._segment_path(segment)
+        path.touch()
+        return open(path, "r+b", buffering=0)
+    
+    def _index_record(self, position: int, record: Dict):
+        for key in ((record["user_id"], "all"), (record["user_id"], record["type"])):
+            positions = self._index.get(key)
+            if positions is None:
+                positions = self._index[key] = array("q")
+            positions.append(position)
+    
+    def load(self):
+        """Rebuild the index from the segments on disk and open the newest one for appending"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = sorted(int(path.stem) for path in self.directory.glob("*.log") if path.stem.isdigit())
+        index: Dict[tuple, array] = {}
+        with self._write_lock, self._lock:
+            self._index = index
+            for segment in segments:
+                path = self._segment_path(segment)
+                size = path.stat().st_size
+                end = 0
+                if size:
+                    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        while end + self.HEADER.size <= size:
+                            (length,) = self.HEADER.unpack_from(mm, end)
+                            if end + self.HEADER.size + length > size:
+                                break
+                            record = json.loads(mm[end + self.HEADER.size:end + self.HEADER.size + length])
+                            self._index_record(segment << 32 | end, record)
+                            end += self.HEADER.size + length
+                if end < size:
+                    # Cola de un lote a medio escribir (caída del proceso): se descarta
+                    with open(path, "r+b") as f:
+                        f.truncate(end)
+            self._segments = segments or [1]
+            self._file = self._open_segment(self._segments[-1])
+            self._tail = (self._segments[-1], self._file.seek(0, os.SEEK_END))
+            for record in self._early:
+                self._queue(record, json.dumps(record, separators=(",", ":")).encode())
+            self._early = []
+    
+    def _queue(self, record: Dict, payload: bytes):
+        """Reserve the next position for a record, index it and queue it for writing (under `_lock`)"""
+        segment, offset = self._tail
+        if offset and offset + self.HEADER.size + len(payload) > self.segment_bytes:
+            segment, offset = segment + 1, 0
+        position = segment << 32 | offset
+        self._tail = (segment, offset + self.HEADER.size + len(payload))
+        self._pending.append((position, payload))
+        self._unwritten[position] = record
+        self._index_record(position, record)
+    
+    def append(self, event: Dict):
+        """Queue an event; it is visible to readers at once and written by the next `flush`"""
+        record = {"timestamp": datetime.now().isoformat(), **event}
+        payload = json.dumps(record, separators=(",", ":")).encode()
+        with self._lock:
+            if self._tail is None:
+                self._early.append(record)
+            else:
+                self._queue(record, payload)
+            full = len(self._pending) >= self.batch_size
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+    
+    def _rotate(self):
+        self._file.close()
+        self._segments.append(self._segments[-1] + 1)
+        self._file = self._open_segment(self._segments[-1])
+        while len(self._segments) > self.max_segments:
+            dropped = self._segments.pop(0)
+            with self._map_lock:
+                entry = self._maps.pop(dropped, None)
+                if entry is not None:
+                    entry[0].close()
+            self._segment_path(dropped).unlink(missing_ok=True)
+            first_valid = self._segments[0] << 32
+            with self._lock:
+                for key in list(self._index):
+                    positions = self._index[key]
+                    del positions[:bisect.bisect_left(positions, first_valid)]
+                    if not positions:
+                        del self._index[key]
+    
+    def flush(self):
+        """Write every queued event, one write per segment (blocking).
+
+        On a write error the unwritten events stay queued and the next flush
+        writes them again at the same positions.
+        """
+        with self._write_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch or self._file is None:
+                return
+            written = 0
+            try:
+                for segment, group in itertools.groupby(batch, key=lambda item: item[0] >> 32):
+                    group = list(group)
+                    if segment != self._segments[-1]:
+                        self._rotate()
+                    self._file.seek(group[0][0] & 0xFFFFFFFF)
+                    data = memoryview(b"".join(self.HEADER.pack(len(payload)) + payload for _, payload in group))
+                    while data:
+                        data = data[self._file.write(data):]
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                    written += len(group)
+            finally:
+                with self._lock:
+                    del self._pending[:written]
+                    for position, _ in batch[:written]:
+                        del self._unwritten[position]
+    
+    def _read(self, position: int) -> Dict:
+        with self._lock:
+            record = self._unwritten.get(position)
+        if record is not None:
+            return {**record, "id": f"act_{position:x}"}
+        segment, offset = position >> 32, position & 0xFFFFFFFF
+        with self._map_lock:
+            mm, mapped = self._maps.get(segment, (None, 0))
+            if (offset + self.HEADER.size > mapped
+                    or offset + self.HEADER.size + self.HEADER.unpack_from(mm, offset)[0] > mapped):
+                # El segmento activo crece: se vuelve a mapear con su tamaño actual
+                if mm is not None:
+                    mm.close()
+                with open(self._segment_path(segment), "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                mapped = len(mm)
+                self._maps[segment] = (mm, mapped)
+            (length,) = self.HEADER.unpack_from(mm, offset)
+            record = json.loads(mm[offset + self.HEADER.size:offset + self.HEADER.size + length])
+        record["id"] = f"act_{position:x}"
+        return record
+    
+    def page(self, user_id: str, activity_type: str = "all", limit: int = 50,
+             before: Optional[int] = None) -> tuple:
+        """Newest-first events of one type, strictly older than `before`. Returns (events, next_before)."""
+        with self._lock:
+            positions = self._index.get((user_id, activity_type))
+            if not positions:
+                return [], None
+            end = bisect.bisect_left(positions, before) if before is not None else len(positions)
+            start = max(0, end - limit)
+            selected = positions[start:end]
+        events = []
+        for position in reversed(selected):
+            try:
+                events.append(self._read(position))
+            except FileNotFoundError:
+                # Segmento borrado por retención mientras se leía la página
+                continue
+        return events, (selected[0] if start > 0 else None)
+    
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._pending:
+                try:
+                    await asyncio.to_thread(self.flush)
+                except OSError as e:
+                    print(f"⚠️  Activity log write failed: {e}")
+    
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._flusher())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._loop = None
+        await asyncio.to_thread(self.flush)
+        with self._write_lock, self._map_lock:
+            for mm, _ in self._maps.values():
+                mm.close()
+            self._maps.clear()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+activity_log = ActivityLog(
+    ACTIVITY_LOG_CONFIG["DIRECTORY"],
+    ACTIVITY_LOG_CONFIG["SEGMENT_BYTES"],
+    ACTIVITY_LOG_CONFIG["MAX_SEGMENTS"],
+    ACTIVITY_LOG_CONFIG["BATCH_SIZE"],
+    ACTIVITY_LOG_CONFIG["FLUSH_INTERVAL"],
+    ACTIVITY_LOG_CONFIG["FSYNC"]
+)
+
+def record_investigation_activity(event: str, before: Optional[Dict], after: Optional[Dict],
+                                  finding: Optional[Dict] = None):
+    """Repository listener: one activity entry per investigation change"""
+    row = after or before
+    entry = {"user_id": row["user_id"], "user": row.get("assigned_to") or "", "investigation": row["name"]}
+    if event == "created":
+        entry.update(type="created", action="Investigation Created",
+                     details=f"New investigation created with {row['priority']} priority")
+    elif event == "deleted":
+        entry.update(type="deleted", action="Investigation Deleted", details="Investigation deleted")
+    elif event == "finding_added":
+        entry.update(type="updated", action="New Finding Added", user=finding.get("created_by") or entry["user"],
+                     details=f"Added finding: '{finding['content'][:120]}'")
+    elif after["status"] == "completed" and before["status"] != "completed":
+        entry.update(type="completed", action="Investigation Completed",
+                     details=f"Investigation marked as completed with {after['findings_count']} findings")
+    else:
+        changed = [field for field in InvestigationRepository.UPDATABLE_FIELDS if before.get(field) != after.get(field)]
+        if not changed:
+            return
+        details = f"Progress updated to {after['progress']}%" if changed == ["progress"] else f"Updated {', '.join(changed)}"
+        entry.update(type="updated", action="Investigation Updated", details=details)
+    activity_log.append(entry)
+
+investigation_repo.add_listener(record_investigation_activity)
+
+@app.on_event("startup")
+async def start_activity_log():
+    await asyncio.to_thread(activity_log.load)
+    activity_log.start()
+
+@app.on_event("shutdown")
+async def stop_activity_log():
+    await activity_log.stop()
+
+# === CUSTOM REPORT QUERIES ===
+
+# campo -> ¿hay índice (user_id, campo) que SQLite pueda usar?
+CUSTOM_REPORT_FIELDS = {
+    "type": True, "status": True, "priority": True, "created_at": True,
+    "name": False, "target": False, "assigned_to": False, "tags": False, "deadline": False,
+    "updated_at": False, "closed_at": False, "progress": False, "findings_count": False,
+    "estimated_hours": False, "actual_hours": False
+}
+CUSTOM_REPORT_NUMERIC_FIELDS = ("progress", "findings_count", "estimated_hours", "actual_hours")
+CUSTOM_REPORT_LOWERCASE_FIELDS = ("type", "status", "priority", "assigned_to")
+CUSTOM_REPORT_FIELD_ALIASES = {"user": "assigned_to", "date": "created_at"}
+# Agrupaciones derivadas: nombre -> (columna, transformación)
+CUSTOM_REPORT_GROUPS = {
+    "created_day": ("created_at", lambda value: value[:10]),
+    "created_month": ("created_at", lambda value: value[:7]),
+    "created_year": ("created_at", lambda value: value[:4])
+}
+# operador -> (operador SQL o None si no se puede delegar, predicado en Python)
+CUSTOM_REPORT_OPERATORS = {
+    "eq": ("=", lambda value, target: value == target),
+    "ne": (None, lambda value, target: value != target),
+    "gt": (">", lambda value, target: value is not None and value > target),
+    "gte": (">=", lambda value, target: value is not None and value >= target),
+    "lt": ("<", lambda value, target: value is not None and value < target),
+    "lte": ("<=", lambda value, target: value is not None and value <= target),
+    "in": ("IN", lambda value, target: value in target),
+    "contains": (None, lambda value, target: target in (value or "").lower())
+}
+CUSTOM_REPORT_AGGREGATES = ("count", "sum", "avg", "min", "max")
+INVESTIGATION_TYPE_LOOKUP = {label.lower(): key for key, label in INVESTIGATION_TYPE_LABELS.items()}
+
+# Métricas con nombre (las casillas del formulario) expresadas como agregados simples
+CUSTOM_REPORT_PRESETS = {
+    "investigations": {
+        "total": {"agg": "count"},
+        "by_status": {"agg": "count", "group_by": "status"},
+        "by_type": {"agg": "count", "group_by": "type"},
+        "by_priority": {"agg": "count", "group_by": "priority"}
+    },
+    "findings": {
+        "total": {"agg": "sum", "field": "findings_count"},
+        "average": {"agg": "avg", "field": "findings_count"},
+        "max": {"agg": "max", "field": "findings_count"},
+        "by_type": {"agg": "sum", "field": "findings_count", "group_by": "type"}
+    },
+    "performance": {
+        "total": {"agg": "count"},
+        "completed": {"agg": "count", "where": {"status": "completed"}},
+        "avg_completion_hours": {"agg": "avg", "field": "actual_hours", "where": {"status": "completed"}},
+        "avg_progress": {"agg": "avg", "field": "progress"},
+        "estimated_hours": {"agg": "sum", "field": "estimated_hours"},
+        "actual_hours": {"agg": "sum", "field": "actual_hours"}
+    },
+    "trends": {
+        "created_by_month": {"agg": "count", "group_by": "created_month"},
+        "completed_by_month": {"agg": "count", "group_by": "created_month", "where": {"status": "completed"}},
+        "findings_by_month": {"agg": "sum", "field": "findings_count", "group_by": "created_month"}
+    }
+}
+
+def report_field(name: Any) -> str:
+    field = CUSTOM_REPORT_FIELD_ALIASES.get(name, name)
+    if field not in CUSTOM_REPORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown report field: {name}")
+    return field
+
+def normalize_filter_value(field: str, op: str, value: Any) -> Any:
+    if op == "in":
+        if not isinstance(value, list) or not value:
+            raise HTTPException(status_code=400, detail=f"'in' filter on {field} needs a non-empty list")
+        return sorted({normalize_filter_value(field, "eq", item) for item in value}, key=str)
+    if op == "contains":
+        if field in CUSTOM_REPORT_NUMERIC_FIELDS:
+            raise HTTPException(status_code=400, detail=f"'contains' filter needs a text field, not {field}")
+        return str(value).strip().lower()
+    if field in CUSTOM_REPORT_NUMERIC_FIELDS:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Filter on {field} needs a number")
+    text = str(value).strip()
+    if field in CUSTOM_REPORT_LOWERCASE_FIELDS:
+        text = text.lower()
+    return INVESTIGATION_TYPE_LOOKUP.get(text, text) if field == "type" else text
+
+def parse_report_filters(filters: Any) -> List[tuple]:
+    """Normalize report filters to a sorted list of (field, op, value).
+
+    Accepts the form's `{"type": field, "value": v}`, a mapping of
+    field -> value / list / {op: value} (plus `date_range`), or a list of
+    `{"field", "op", "value"}` conditions. All conditions are ANDed.
+    """
+    if not filters:
+        return []
+    conditions = []
+    if isinstance(filters, dict) and set(filters) == {"type", "value"}:
+        if filters["type"]:
+            conditions.append((filters["type"], "eq", filters["value"]))
+    elif isinstance(filters, dict):
+        for name, value in filters.items():
+            if name == "date_range":
+                value = value or {}
+                try:
+                    if value.get("start"):
+                        conditions.append(("created_at", "gte", parse_day(value["start"]).isoformat()))
+                    if value.get("end"):
+                        conditions.append(("created_at", "lt", (parse_day(value["end"]) + timedelta(days=1)).isoformat()))
+                except (AttributeError, TypeError, ValueError):
+                    raise HTTPException(status_code=400, detail="date_range start/end must be YYYY-MM-DD")
+            elif isinstance(value, dict):
+                conditions.extend((name, op, operand) for op, operand in value.items())
+            elif isinstance(value, list):
+                conditions.append((name, "in", value))
+            else:
+                conditions.append((name, "eq", value))
+    elif isinstance(filters, list):
+        for condition in filters:
+            if not isinstance(condition, dict) or "field" not in condition:
+                raise HTTPException(status_code=400, detail="Each filter needs a field")
+            conditions.append((condition["field"], condition.get("op", "eq"), condition.get("value")))
+    else:
+        raise HTTPException(status_code=400, detail="filters must be an object or a list")
+    
+    if len(conditions) > CUSTOM_REPORT_CONFIG["MAX_FILTERS"]:
+        raise HTTPException(status_code=400, detail=f"At most {CUSTOM_REPORT_CONFIG['MAX_FILTERS']} filters")
+    normalized = []
+    for name, op, value in conditions:
+        if op not in CUSTOM_REPORT_OPERATORS:
+            raise HTTPException(status_code=400, detail=f"Unknown filter operator: {op}")
+        field = report_field(name)
+        normalized.append((field, op, normalize_filter_value(field, op, value)))
+    return sorted(normalized, key=lambda condition: json.dumps(condition))
+
+def compile_report_predicate(field: str, op: str, target: Any):
+    test = CUSTOM_REPORT_OPERATORS[op][1]
+    if field == "tags" and op == "contains":
+        return lambda row: target in (tag.lower() for tag in json.loads(row["tags"]))
+    return lambda row: test(row[field], target)
+
+def parse_report_metrics(metrics: Any) -> List[tuple]:
+    """Expand preset names and metric definitions to (section, name, spec) triples"""
+    if not isinstance(metrics, list):
+        raise HTTPException(status_code=400, detail="metrics must be a list")
+    expanded = []
+    for metric in metrics:
+        if isinstance(metric, str):
+            if metric not in CUSTOM_REPORT_PRESETS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown metric '{metric}'; use one of {', '.join(CUSTOM_REPORT_PRESETS)} or a definition"
+                )
+            expanded.extend((metric, name, spec) for name, spec in CUSTOM_REPORT_PRESETS[metric].items())
+        elif isinstance(metric, dict):
+            agg = metric.get("agg", "count")
+            name = metric.get("name") or "_".join(
+                str(part) for part in (agg, metric.get("field"), metric.get("group_by") and f"by_{metric['group_by']}") if part
+            )
+            spec = {key: metric[key] for key in ("agg", "field", "group_by", "where") if metric.get(key) is not None}
+            expanded.append((None, name, spec))
+        else:
+            raise HTTPException(status_code=400, detail="Each metric must be a name or an object")
+    if len(expanded) > CUSTOM_REPORT_CONFIG["MAX_METRICS"]:
+        raise HTTPException(status_code=400, detail=f"At most {CUSTOM_REPORT_CONFIG['MAX_METRICS']} metrics")
+    return expanded
+
+class MetricAccumulator:
+    """One aggregate (optionally grouped and conditional), fed a row at a time"""
+    
+    __slots__ = ("agg", "field", "group", "predicates", "state")
+    
+    def __init__(self, agg: str, field: Optional[str], group, predicates: List):
+        self.agg = agg
+        self.field = field
+        self.group = group
+        self.predicates = predicates
+        self.state: Dict = {}
+    
+    def add(self, row):
+        for predicate in self.predicates:
+            if not predicate(row):
+                return
+        key = self.group(row) if self.group is not None else None
+        if self.agg == "count":
+            self.state[key] = self.state.get(key, 0) + 1
+            return
+        value = row[self.field]
+        if value is None:
+            return
+        state = self.state.get(key)
+        if state is None:
+            self.state[key] = [1, value, value, value]
+        else:
+            state[0] += 1
+            state[1] += value
+            state[2] = min(state[2], value)
+            state[3] = max(state[3], value)
+    
+    def _value(self, state):
+        if self.agg == "count":
+            return state
+        count, total, low, high = state
+        if self.agg == "sum":
+            return round(total, 2)
+        if self.agg == "avg":
+            return round(total / count, 2)
+        return low if self.agg == "min" else high
+    
+    def result(self):
+        if self.group is None:
+            state = self.state.get(None)
+            if state is None:
+                return 0 if self.agg in ("count", "sum") else None
+            return self._value(state)
+        return {key: self._value(state) for key, state in sorted(self.state.items(), key=lambda item: str(item[0]))}
+
+class CustomReportQuery:
+    """A custom report compiled into one scan of the user's investigations.
+
+    Filters on indexed columns become SQL clauses so SQLite can use the
+    per-user indexes; the rest are compiled to Python predicates applied
+    while scanning. Every metric is an accumulator fed from that same scan,
+    and only the columns that filters and metrics read are selected.
+    """
+    
+    def __init__(self, filters: Any, metrics: Any):
+        self.filters = parse_report_filters(filters)
+        self.metrics = parse_report_metrics(metrics)
+        self.key = json.dumps([self.filters, self.metrics], sort_keys=True, default=str)
+        self.clauses: List[str] = []
+        self.params: List = []
+        self.pushed_down: List[str] = []
+        self.residual: List = []
+        self.residual_labels: List[str] = []
+        columns = {"id"}
         
-        await asyncio.sleep(2)
+        for field, op, value in self.filters:
+            sql_op = CUSTOM_REPORT_OPERATORS[op][0]
+            if CUSTOM_REPORT_FIELDS[field] and sql_op is not None:
+                if op == "in":
+                    self.clauses.append(f"{field} IN ({', '.join('?' * len(value))})")
+                    self.params.extend(value)
+                else:
+                    self.clauses.append(f"{field} {sql_op} ?")
+                    self.params.append(value)
+                self.pushed_down.append(f"{field} {op} {value!r}")
+            else:
+                self.residual.append(compile_report_predicate(field, op, value))
+                self.residual_labels.append(f"{field} {op} {value!r}")
+                columns.add(field)
         
-        engines_results = [
-            {"engine": "Google Images", "matches": random.randint(20, 80), "url": f"https://images.google.com/search?tbs=sbi:url={image_url}"},
-            {"engine": "TinEye", "matches": random.randint(5, 30), "url": f"https://tineye.com/search?url={image_url}"},
-            {"engine": "Yandex Images", "matches": random.randint(10, 50), "url": f"https://yandex.com/images/search?rpt=imageview&url={image_url}"}
+        self._metric_plans = []
+        for section, name, spec in self.metrics:
+            agg = spec.get("agg", "count")
+            if agg not in CUSTOM_REPORT_AGGREGATES:
+                raise HTTPException(status_code=400, detail=f"Unknown aggregate: {agg}")
+            field = None
+            if agg != "count":
+                field = report_field(spec.get("field"))
+                if agg in ("sum", "avg") and field not in CUSTOM_REPORT_NUMERIC_FIELDS:
+                    raise HTTPException(status_code=400, detail=f"{agg} needs a numeric field")
+                columns.add(field)
+            group = None
+            group_by = spec.get("group_by")
+            if group_by in CUSTOM_REPORT_GROUPS:
+                column, transform = CUSTOM_REPORT_GROUPS[group_by]
+                group = lambda row, column=column, transform=transform: transform(row[column] or "")
+                columns.add(column)
+            elif group_by is not None:
+                column = report_field(group_by)
+                group = lambda row, column=column: row[column]
+                columns.add(column)
+            where = parse_report_filters(spec.get("where"))
+            columns.update(field for field, _, _ in where)
+            predicates = [compile_report_predicate(*condition) for condition in where]
+            self._metric_plans.append((section, name, agg, field, group, predicates))
+        self.columns = sorted(columns)
+    
+    def explain(self) -> Dict:
+        return {"pushed_down": self.pushed_down, "residual": self.residual_labels, "columns": self.columns}
+    
+    def run(self, repo: "InvestigationRepository", user_id: str) -> Dict:
+        accumulators = [
+            (section, name, MetricAccumulator(agg, field, group, predicates))
+            for section, name, agg, field, group, predicates in self._metric_plans
         ]
+        add_row = [accumulator.add for _, _, accumulator in accumulators]
+        residual = self.residual
+        scanned = matched = 0
+        for row in repo.scan(user_id, self.columns, self.clauses, self.params):
+            scanned += 1
+            if residual and not all(predicate(row) for predicate in residual):
+                continue
+            matched += 1
+            for add in add_row:
+                add(row)
         
-        return {"success": True, "data": {"engines": engines_results, "totalMatches": sum(r["matches"] for r in engines_results)}}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        results: Dict[str, Any] = {}
+        for section, name, accumulator in accumulators:
+            (results.setdefault(section, {}) if section else results)[name] = accumulator.result()
+        performance = results.get("performance")
+        if performance is not None:
+            performance["success_rate"] = (
+                round(performance["completed"] / performance["total"] * 100, 1) if performance["total"] else 0.0
+            )
+        return {"results": results, "matched": matched, "scanned": scanned}
 
-@app.post("/api/v1/image/extract-metadata")
-async def extract_image_metadata(request: dict, current_user: dict = Depends(get_current_user)):
-    """Extract metadata from image"""
-    try:
-        await asyncio.sleep(1)
-        
-        metadata = {
-            "basic": {
-                "filename": request.get('filename', 'unknown.jpg'),
-                "filesize": "2.4 MB",
-                "format": "JPEG",
-                "dimensions": "1920x1080",
-                "created": "2024-01-15 14:30:22"
-            },
-            "camera": {
-                "make": "Canon",
-                "model": "EOS 5D Mark IV",
-                "software": "Adobe Photoshop 2024"
-            },
-            "location": {
-                "gps": "40.7128° N, 74.0060° W" if random.random() > 0.5 else None,
-                "location": "New York, NY" if random.random() > 0.5 else None
-            }
-        }
-        
-        return {"success": True, "data": metadata}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+class CustomReportCache:
+    """LRU of custom report results, tagged with the user's data version.
 
-@app.post("/api/v1/image/bulk-analyze")
-async def bulk_analyze_images(request: dict, current_user: dict = Depends(get_current_user)):
-    """Bulk analyze multiple images"""
+    An entry is only served for the version it was computed at, i.e. until
+    the user's investigations change.
+    """
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+    
+    def get(self, user_id: str, key: str, version: int) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None or entry[0] != version:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end((user_id, key))
+            self.stats["hits"] += 1
+            return entry[1]
+    
+    def put(self, user_id: str, key: str, version: int, result: Dict):
+        with self._lock:
+            self._entries[(user_id, key)] = (version, result)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+custom_report_cache = CustomReportCache(CUSTOM_REPORT_CONFIG["CACHE_ENTRIES"])
+
+# === REPORT EXPORTS ===
+
+EXPORT_COLUMNS = (
+    "id", "name", "type", "target", "status", "priority", "progress", "findings_count",
+    "estimated_hours", "actual_hours", "tags", "created_at", "updated_at", "deadline"
+)
+
+def pdf_text(value: Any) -> str:
+    text = str(value).encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+class StreamingPdfWriter:
+    """Minimal text-only PDF written page by page; only object offsets stay in memory"""
+    
+    LINES_PER_PAGE = 64
+    
+    def __init__(self, f, title: str):
+        self.f = f
+        self.title = title
+        self.offsets: Dict[int, int] = {}
+        self.pages: List[int] = []
+        self.lines: List[str] = []
+        self.next_object = 4  # 1 = catálogo, 2 = árbol de páginas, 3 = fuente
+        f.write(b"%PDF-1.4\n")
+        self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    
+    def _object(self, number: int, body: bytes):
+        self.offsets[number] = self.f.tell()
+        self.f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    
+    def line(self, text: str):
+        self.lines.append(text[:130])
+        if len(self.lines) == self.LINES_PER_PAGE:
+            self._page()
+    
+    def _page(self):
+        header = f"{self.title} - page {len(self.pages) + 1}"
+        ops = ["BT", "/F1 11 Tf", "36 806 Td", f"({pdf_text(header)}) Tj", "/F1 8 Tf", "11 TL", "T*", "T*"]
+        ops += [f"({pdf_text(line)}) Tj T*" for line in self.lines]
+        ops.append("ET")
+        content = "\n".join(ops).encode("latin-1")
+        contents, page = self.next_object, self.next_object + 1
+        self.next_object += 2
+        self._object(contents, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+        self._object(page, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {contents} 0 R >>"
+        ).encode())
+        self.pages.append(page)
+        self.lines = []
+    
+    def close(self):
+        if self.lines or not self.pages:
+            self._page()
+        kids = " ".join(f"{page} 0 R" for page in self.pages)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode())
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.f.tell()
+        size = self.next_object
+        entries = ["0000000000 65535 f \n"] + [f"{self.offsets[n]:010d} 00000 n \n" for n in range(1, size)]
+        self.f.write(f"xref\n0 {size}\n{''.join(entries)}".encode())
+        self.f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+def write_export_file(db_path: str, user_id: str, start: Optional[str], end: Optional[str],
+                      fmt: str, path: str, chunk_rows: int) -> int:
+    """Runs in an export worker process: stream a user's investigations created in
+    [start, end) from SQLite into `path`, `chunk_rows` at a time. Returns the row count."""
+    clauses, params = ["user_id = ?"], [user_id]
+    if start:
+        clauses.append("created_at >= ?")
+        params.append(start)
+    if end:
+        clauses.append("created_at < ?")
+        params.append(end)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    partial = f"{path}.part"
+    rows = 0
     try:
-        images = request.get('images', [])
-        if not images:
-            raise HTTPException(status_code=400, detail="No images provided")
+        cursor = conn.execute(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM investigations WHERE {' AND '.join(clauses)} "
+            "ORDER BY created_at, id",
+            params
+        )
+        chunks = iter(lambda: cursor.fetchmany(chunk_rows), [])
+        period = f"{start[:10] if start else 'beginning'} to {end[:10] + ' (exclusive)' if end else 'now'}"
         
-        results = []
-        for i, image in enumerate(images):
-            await asyncio.sleep(1)  # Simulate processing time
-            
-            result = {
-                "filename": image.get('filename', f'image_{i+1}.jpg'),
-                "size": image.get('size', '1.2 MB'),
-                "reverseSearchMatches": random.randint(10, 50),
-                "facesDetected": random.randint(0, 3),
-                "objectsDetected": random.randint(2, 8),
-                "hasMetadata": random.random() > 0.3,
-                "processingTime": f"{random.randint(1000, 3000)}ms",
-                "timestamp": datetime.now().isoformat()
-            }
-            results.append(result)
+        if fmt == "csv":
+            with open(partial, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS)
+                for chunk in chunks:
+                    for row in chunk:
+                        row = list(row)
+                        row[EXPORT_COLUMNS.index("tags")] = ";".join(json.loads(row[EXPORT_COLUMNS.index("tags")]))
+                        writer.writerow(row)
+                    rows += len(chunk)
+        elif fmt == "json":
+            with open(partial, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"exported_at": datetime.now().isoformat(), "period": period})[:-1])
+                f.write(', "investigations": [')
+                for chunk in chunks:
+                    for row in chunk:
+                        investigation = dict(zip(EXPORT_COLUMNS, row))
+                        investigation["tags"] = json.loads(investigation["tags"])
+                        f.write((",\n" if rows else "\n") + json.dumps(investigation))
+                        rows += 1
+                f.write("\n]}\n")
+        else:
+            with open(partial, "wb") as f:
+                pdf = StreamingPdfWriter(f, f"OSINT Investigations Report ({period})")
+                pdf.line(f"Generated {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+                pdf.line("")
+                for chunk in chunks:
+                    for row in chunk:
+                        item = dict(zip(EXPORT_COLUMNS, row))
+                        pdf.line(
+                            f"{item['created_at'][:10]}  {item['name']}  [{item['type']}/{item['status']}/"
+                            f"{item['priority']}]  {item['progress']}%  {item['findings_count']} findings  "
+                            f"{item['actual_hours']:.1f}h  {item['target'] or ''}"
+                        )
+                    rows += len(chunk)
+                pdf.line("")
+                pdf.line(f"{rows} investigations")
+                pdf.close()
+        os.replace(partial, path)
+    except BaseException:
+        Path(partial).unlink(missing_ok=True)
+        raise
+    finally:
+        conn.close()
+    return rows
+
+class ExportJobQueue:
+    """Report exports generated in a pool of worker processes.
+
+    Submitted jobs wait in a bounded queue; `workers` tasks each hand one job
+    at a time to the process pool, which writes the file to disk in chunks.
+    Requests with the same user, format, range and data version share a job,
+    and finished jobs are kept for `retention` seconds. Jobs live in memory,
+    so files left over from a previous run are removed at startup.
+    """
+    
+    def __init__(self, directory: str, workers: int, max_queue: int, chunk_rows: int, retention: float):
+        self.directory = Path(directory)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.chunk_rows = chunk_rows
+        self.retention = retention
+        self.jobs: Dict[str, Dict] = {}
+        self._by_key: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "reused": 0, "rejected": 0}
+    
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for leftover in self.directory.iterdir():
+            leftover.unlink(missing_ok=True)
+        self._queue = asyncio.Queue(self.max_queue)
+        # spawn: los hijos no heredan hilos ni locks del servidor
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def _sweep(self):
+        cutoff = time.time() - self.retention
+        for export_id, job in list(self.jobs.items()):
+            if job["finished_at"] is not None and job["finished_at"] < cutoff:
+                del self.jobs[export_id]
+                if self._by_key.get(job["key"]) == export_id:
+                    del self._by_key[job["key"]]
+                Path(job["path"]).unlink(missing_ok=True)
+    
+    def submit(self, user: Dict, fmt: str, start: Optional[str], end: Optional[str], version: int) -> tuple:
+        """Queue an export, or return the live job for an identical request. Returns (job, reused)."""
+        self._sweep()
+        key = hashlib.sha256(json.dumps([user["id"], fmt, start, end, version]).encode()).hexdigest()
+        existing = self.jobs.get(self._by_key.get(key))
+        if existing is not None and existing["status"] != "failed":
+            self.stats["reused"] += 1
+            return existing, True
         
-        return {"success": True, "data": results}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        export_id = f"export_{secrets.token_hex(8)}"
+        job = {
+            "export_id": export_id,
+            "key": key,
+            "user_id": user["id"],
+            "user": user["email"],
+            "format": fmt,
+            "start": start,
+            "end": end,
+            "path": str(self.directory / f"{export_id}.{fmt}"),
+            "status": "queued",
+            "rows": None,
+            "size": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None,
+            "finished_at": None
+        }
+        try:
+            self._queue.put_nowait(export_id)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Export queue is full, retry shortly",
+                headers={"Retry-After": "5"}
+            )
+        self.jobs[export_id] = job
+        self._by_key[key] = export_id
+        self.stats["queued"] += 1
+        return job, False
+    
+    def get(self, export_id: str, user_id: str) -> Optional[Dict]:
+        job = self.jobs.get(export_id)
+        return job if job is not None and job["user_id"] == user_id else None
+    
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = self.jobs.get(await self._queue.get())
+            if job is None:
+                continue
+            self.stats["queued"] -= 1
+            self.stats["running"] += 1
+            job["status"] = "running"
+            try:
+                rows = await loop.run_in_executor(
+                    self._executor, write_export_file, DATABASE_CONFIG["PATH"], job["user_id"],
+                    job["start"], job["end"], job["format"], job["path"], self.chunk_rows
+                )
+            except Exception as e:
+                job.update(status="failed", error=str(e) or type(e).__name__)
+                self.stats["failed"] += 1
+            else:
+                job.update(status="completed", rows=rows, size=os.path.getsize(job["path"]),
+                           completed_at=datetime.now().isoformat())
+                self.stats["completed"] += 1
+                await asyncio.to_thread(user_data_versions.bump, job["user_id"])
+                activity_log.append({
+                    "user_id": job["user_id"],
+                    "user": job["user"],
+                    "type": "exported",
+                    "action": "Report Exported",
+                    "investigation": "Multiple Investigations",
+                    "details": f"{job['format'].upper()} report exported with {rows} investigations"
+                })
+            finally:
+                self.stats["running"] -= 1
+                job["finished_at"] = time.time()
+
+def export_job_view(job: Dict) -> Dict:
+    view = {
+        field: job[field]
+        for field in ("export_id", "status", "format", "rows", "size", "error", "created_at", "completed_at")
+    }
+    view["status_url"] = f"/api/v1/reports/export/{job['export_id']}"
+    view["download_url"] = f"/api/v1/reports/download/{job['export_id']}" if job["status"] == "completed" else None
+    return view
+
+export_jobs = ExportJobQueue(
+    EXPORT_CONFIG["DIRECTORY"],
+    EXPORT_CONFIG["WORKERS"],
+    EXPORT_CONFIG["MAX_QUEUE"],
+    EXPORT_CONFIG["CHUNK_ROWS"],
+    EXPORT_CONFIG["RETENTION_SECONDS"]
+)
+
+@app.on_event("startup")
+async def start_export_jobs():
+    export_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_export_jobs():
+    await export_jobs.stop()
 
 # === REPORTS & ANALYTICS ENDPOINTS =====
 
-@app.get("/api/v1/reports/metrics")
-async def get_reports_metrics(current_user: dict = Depends(get_current_user)):
-    """Get key metrics for reports dashboard"""
-    # In a real implementation, this would query the database
-    # For demo, return simulated metrics
-    
-    metrics = {
-        "total_investigations": 147,
-        "total_findings": 892,
-        "success_rate": 87.3,
-        "avg_investigation_time": 14.2,
+def build_reports_metrics(user_id: str) -> Dict:
+    agg = report_aggregates.get(user_id)
+    now = datetime.now()
+    this_month, last_month = now.strftime("%Y-%m"), previous_month_key(now)
+    
+    return {
+        "total_investigations": agg["total"],
+        "total_findings": agg["findings"],
+        "success_rate": round(agg["completed"] / agg["total"] * 100, 1) if agg["total"] else 0.0,
+        "avg_investigation_time": round(agg["completed_hours"] / agg["completed"], 1) if agg["completed"] else 0.0,
+        "status_counts": agg["by_status"],
         "monthly_growth": {
-            "investigations": 12,
-            "findings": 8,
-            "success_rate": 5,
-            "avg_time": -3
+            "investigations": percent_change(
+                agg["created_by_month"].get(this_month, 0), agg["created_by_month"].get(last_month, 0)
+            ),
+            "findings": percent_change(
+                agg["findings_by_month"].get(this_month, 0), agg["findings_by_month"].get(last_month, 0)
+            )
         }
     }
+
+def build_investigation_types_chart(user_id: str) -> Dict:
+    by_type = report_aggregates.get(user_id)["by_type"]
+    # Tipos conocidos siempre en el mismo orden; los demás al final
+    types = list(INVESTIGATION_TYPE_LABELS) + sorted(t for t in by_type if t not in INVESTIGATION_TYPE_LABELS)
     
     return {
-        "status": "success",
-        "data": metrics
+        "labels": [INVESTIGATION_TYPE_LABELS.get(t, t.capitalize()) for t in types],
+        "datasets": [{
+            "data": [by_type.get(t, 0) for t in types],
+            "backgroundColor": [
+                "#4285f4",
+                "#34a853",
+                "#fbbc04",
+                "#ea4335",
+                "#9aa0a6"
+            ] + ["#c58af9"] * (len(types) - len(INVESTIGATION_TYPE_LABELS))
+        }]
     }
 
-@app.get("/api/v1/reports/activity")
-async def get_activity_data(period: str = "30d", current_user: dict = Depends(get_current_user)):
-    """Get investigation activity data for charts"""
-    import random
-    from datetime import datetime, timedelta
-    
-    # Generate sample activity data based on period
-    days = 30 if period == "30d" else 7 if period == "7d" else 90
-    
-    data = []
-    labels = []
+def build_priority_distribution_chart(user_id: str) -> Dict:
+    by_priority = report_aggregates.get(user_id)["by_priority"]
     
-    for i in range(days):
-        date = datetime.now() - timedelta(days=days-1-i)
-        labels.append(date.strftime("%m/%d"))
-        data.append(random.randint(3, 18))
+    return {
+        "labels": list(PRIORITY_LABELS.values()),
+        "datasets": [{
+            "data": [by_priority.get(priority, 0) for priority in PRIORITY_LABELS],
+            "backgroundColor": [
+                "#ea4335",
+                "#fbbc04",
+                "#34a853"
+            ]
+        }]
+    }
+
+@app.get("/api/v1/reports/metrics")
+async def get_reports_metrics(current_user: dict = Depends(get_current_user)):
+    """Get key metrics for reports dashboard"""
+    return {
+        "status": "success",
+        "data": build_reports_metrics(current_user["id"])
+    }
+
+ACTIVITY_PERIOD_DAYS = {"7d": 7, "30d": 30, "90d": 90, "1y": 365, "2y": 730}
+
+def build_activity_chart(user_id: str, period: str = "30d", start: Optional[str] = None,
+                         end: Optional[str] = None, points: Optional[int] = None) -> Dict:
+    start_day, end_day = parse_report_range(ACTIVITY_PERIOD_DAYS.get(period, 30), start, end)
+    max_points = min(points or ROLLUP_CONFIG["MAX_POINTS"], ROLLUP_CONFIG["MAX_POINTS"])
+    series = rollup_series(user_id, "day", start_day, end_day, max_points)
+    label_format = "%m/%d" if (end_day - start_day).days < 365 else "%m/%d/%y"
     
+    return {
+        "labels": [day.strftime(label_format) for day, _ in series],
+        "datasets": [{
+            "label": "Investigations",
+            "data": [counts["created"] for _, counts in series],
+            "borderColor": "#4285f4",
+            "backgroundColor": "rgba(66, 133, 244, 0.1)"
+        }]
+    }
+
+@app.get("/api/v1/reports/activity")
+async def get_activity_data(
+    period: str = "30d",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    points: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get investigation activity data for charts (period, or start/end as YYYY-MM-DD)"""
     return {
         "status": "success",
-        "data": {
-            "labels": labels,
-            "datasets": [{
-                "label": "Investigations",
-                "data": data,
-                "borderColor": "#4285f4",
-                "backgroundColor": "rgba(66, 133, 244, 0.1)"
-            }]
-        }
+        "data": build_activity_chart(current_user["id"], period, start, end, points)
     }
 
 @app.get("/api/v1/reports/investigation-types")
 async def get_investigation_types_data(current_user: dict = Depends(get_current_user)):
     """Get investigation types distribution"""
-    
-    data = {
-        "email": 45,
-        "domain": 32,
-        "social": 28,
-        "phone": 24,
-        "image": 18
+    return {
+        "status": "success",
+        "data": build_investigation_types_chart(current_user["id"])
     }
+
+# period -> (granularidad, número de buckets por defecto, formato de etiqueta)
+SUCCESS_TREND_PERIODS = {
+    "weekly": ("week", 12, lambda day: f"Week {day.strftime('%W')}"),
+    "monthly": ("month", 12, lambda day: day.strftime("%b %y")),
+    "quarterly": ("quarter", 8, lambda day: f"Q{(day.month - 1) // 3 + 1} {day.year}")
+}
+
+def build_success_trends_chart(user_id: str, period: str = "monthly", start: Optional[str] = None,
+                               end: Optional[str] = None, points: Optional[int] = None) -> Dict:
+    granularity, buckets, label = SUCCESS_TREND_PERIODS.get(period, SUCCESS_TREND_PERIODS["monthly"])
+    to_bucket, from_bucket = ROLLUP_GRANULARITIES[granularity]
+    default_start = from_bucket(to_bucket(date.today()) - buckets + 1)
+    start_day, end_day = parse_report_range(0, start or default_start.isoformat(), end)
+    max_points = min(points or ROLLUP_CONFIG["MAX_POINTS"], ROLLUP_CONFIG["MAX_POINTS"])
+    series = rollup_series(user_id, granularity, start_day, end_day, max_points)
+    
+    # Éxito = completadas sobre cerradas (completadas + archivadas); sin cierres el punto queda vacío
+    data = []
+    for _, counts in series:
+        closed = counts["completed"] + counts["archived"]
+        data.append(round(counts["completed"] / closed * 100, 1) if closed else None)
     
     return {
-        "status": "success",
-        "data": {
-            "labels": ["Email", "Domain", "Social Media", "Phone", "Image"],
-            "datasets": [{
-                "data": list(data.values()),
-                "backgroundColor": [
-                    "#4285f4",
-                    "#34a853",
-                    "#fbbc04",
-                    "#ea4335",
-                    "#9aa0a6"
-                ]
-            }]
-        }
+        "labels": [label(day) for day, _ in series],
+        "datasets": [{
+            "label": "Success Rate (%)",
+            "data": data,
+            "borderColor": "#34a853",
+            "backgroundColor": "rgba(52, 168, 83, 0.1)"
+        }]
     }
 
 @app.get("/api/v1/reports/success-trends")
-async def get_success_trends(period: str = "monthly", current_user: dict = Depends(get_current_user)):
-    """Get success rate trends over time"""
-    import random
-    from datetime import datetime, timedelta
-    
-    # Generate sample success rate data
-    if period == "weekly":
-        periods = 12
-        labels = []
-        for i in range(periods):
-            date = datetime.now() - timedelta(weeks=periods-1-i)
-            labels.append(f"Week {date.strftime('%U')}")
-    elif period == "quarterly":
-        periods = 8
-        labels = [f"Q{((i % 4) + 1)} {datetime.now().year - (i // 4)}" for i in range(periods-1, -1, -1)]
-    else:  # monthly
-        periods = 12
-        labels = []
-        for i in range(periods):
-            date = datetime.now() - timedelta(days=30*(periods-1-i))
-            labels.append(date.strftime("%b %y"))
-    
-    data = [random.randint(75, 95) for _ in range(periods)]
-    
+async def get_success_trends(
+    period: str = "monthly",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    points: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get success rate trends over time (weekly/monthly/quarterly, optionally over start/end)"""
     return {
         "status": "success",
-        "data": {
-            "labels": labels,
-            "datasets": [{
-                "label": "Success Rate (%)",
-                "data": data,
-                "borderColor": "#34a853",
-                "backgroundColor": "rgba(52, 168, 83, 0.1)"
-            }]
-        }
+        "data": build_success_trends_chart(current_user["id"], period, start, end, points)
     }
 
 @app.get("/api/v1/reports/priority-distribution")
 async def get_priority_distribution(current_user: dict = Depends(get_current_user)):
     """Get investigation priority distribution"""
-    
-    data = {
-        "high": 23,
-        "medium": 78,
-        "low": 46
-    }
-    
     return {
         "status": "success",
-        "data": {
-            "labels": ["High", "Medium", "Low"],
-            "datasets": [{
-                "data": list(data.values()),
-                "backgroundColor": [
-                    "#ea4335",
-                    "#fbbc04",
-                    "#34a853"
-                ]
-            }]
-        }
+        "data": build_priority_distribution_chart(current_user["id"])
     }
 
-@app.get("/api/v1/reports/top-investigations")
-async def get_top_investigations(sort_by: str = "findings", current_user: dict = Depends(get_current_user)):
-    """Get top performing investigations"""
+TOP_INVESTIGATIONS_LIMIT = 10
+TOP_INVESTIGATIONS_MAX_LIMIT = 100
+
+def build_top_investigations(user_id: str, sort_by: str = "findings", limit: int = TOP_INVESTIGATIONS_LIMIT,
+                             type_filter: Optional[str] = None, status_filter: Optional[str] = None) -> List[Dict]:
+    if sort_by not in TopInvestigationsIndex.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of: {', '.join(TopInvestigationsIndex.SORT_KEYS)}")
+    limit = max(1, min(limit, TOP_INVESTIGATIONS_MAX_LIMIT))
     
-    investigations = [
-        {
-            "name": "Email Compromise Analysis",
-            "type": "email",
-            "findings": 23,
-            "duration": "12.5h",
-            "success_rate": 95,
-            "status": "completed",
-            "created_at": "2024-01-15T10:30:00Z"
-        },
-        {
-            "name": "Social Media Profile Investigation",
-            "type": "social",
-            "findings": 18,
-            "duration": "8.2h",
-            "success_rate": 89,
-            "status": "completed",
-            "created_at": "2024-01-12T14:20:00Z"
-        },
-        {
-            "name": "Domain Infrastructure Mapping",
-            "type": "domain",
-            "findings": 31,
-            "duration": "16.7h",
-            "success_rate": 92,
-            "status": "active",
-            "created_at": "2024-01-18T09:15:00Z"
-        },
-        {
-            "name": "Phone Number Trace",
-            "type": "phone",
-            "findings": 14,
-            "duration": "6.3h",
-            "success_rate": 78,
-            "status": "completed",
-            "created_at": "2024-01-10T16:45:00Z"
-        },
+    return [
         {
-            "name": "Image Forensics Analysis",
-            "type": "image",
-            "findings": 9,
-            "duration": "4.1h",
-            "success_rate": 83,
-            "status": "completed",
-            "created_at": "2024-01-08T11:30:00Z"
+            "id": row["id"],
+            "name": row["name"],
+            "type": row["type"],
+            "findings": row["findings_count"],
+            "duration": f"{row['actual_hours']:.1f}h",
+            "progress": row["progress"],
+            "status": row["status"],
+            "created_at": row["created_at"]
         }
+        for row in top_investigations_index.top(user_id, sort_by, limit, type_filter, status_filter)
     ]
-    
-    # Sort based on criteria
-    if sort_by == "findings":
-        investigations.sort(key=lambda x: x["findings"], reverse=True)
-    elif sort_by == "time":
-        investigations.sort(key=lambda x: float(x["duration"].replace("h", "")))
-    elif sort_by == "recent":
-        investigations.sort(key=lambda x: x["created_at"], reverse=True)
-    
+
+@app.get("/api/v1/reports/top-investigations")
+async def get_top_investigations(
+    sort_by: str = "findings",
+    limit: int = TOP_INVESTIGATIONS_LIMIT,
+    type_filter: Optional[str] = Query(None, alias="type"),
+    status_filter: Optional[str] = Query(None, alias="status"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get top investigations by findings, time or recency"""
     return {
         "status": "success",
-        "data": investigations
+        "data": build_top_investigations(current_user["id"], sort_by, limit, type_filter, status_filter)
     }
 
-@app.get("/api/v1/reports/activity-log")
-async def get_activity_log(filter_type: str = "all", current_user: dict = Depends(get_current_user)):
-    """Get recent activity log"""
+ACTIVITY_TYPES = ("all", "created", "updated", "completed", "deleted", "exported")
+
+async def build_activity_log(user_id: str, filter_type: str = "all", limit: int = ACTIVITY_LOG_CONFIG["PAGE_SIZE"],
+                             cursor: Optional[str] = None) -> tuple:
+    if filter_type not in ACTIVITY_TYPES:
+        raise HTTPException(status_code=400, detail=f"filter_type must be one of: {', '.join(ACTIVITY_TYPES)}")
+    limit = max(1, min(limit, ACTIVITY_LOG_CONFIG["MAX_PAGE_SIZE"]))
+    before = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if not isinstance(position[0], int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        before = position[0]
     
+    events, next_before = await asyncio.to_thread(activity_log.page, user_id, filter_type, limit, before)
     activities = [
         {
-            "id": "act_001",
-            "timestamp": "2024-01-22T14:30:00Z",
-            "action": "Investigation Completed",
-            "investigation": "Email Compromise Analysis",
-            "user": current_user["email"],
-            "details": "Investigation marked as completed with 23 findings",
-            "type": "completed"
-        },
-        {
-            "id": "act_002",
-            "timestamp": "2024-01-22T14:15:00Z",
-            "action": "New Finding Added",
-            "investigation": "Domain Infrastructure Mapping",
-            "user": current_user["email"],
-            "details": "Added finding: 'Suspicious subdomain identified'",
-            "type": "updated"
-        },
-        {
-            "id": "act_003",
-            "timestamp": "2024-01-22T13:45:00Z",
-            "action": "Investigation Created",
-            "investigation": "Social Media Background Check",
-            "user": current_user["email"],
-            "details": "New investigation created with high priority",
-            "type": "created"
-        },
-        {
-            "id": "act_004",
-            "timestamp": "2024-01-22T12:30:00Z",
-            "action": "Investigation Updated",
-            "investigation": "Phone Number Trace",
-            "user": current_user["email"],
-            "details": "Progress updated to 75%",
-            "type": "updated"
-        },
-        {
-            "id": "act_005",
-            "timestamp": "2024-01-22T11:20:00Z",
-            "action": "Report Exported",
-            "investigation": "Multiple Investigations",
-            "user": current_user["email"],
-            "details": "PDF report exported for date range",
-            "type": "exported"
+            "id": event["id"],
+            "timestamp": event["timestamp"],
+            "action": event["action"],
+            "investigation": event["investigation"],
+            "user": event["user"],
+            "details": event["details"],
+            "type": event["type"]
         }
+        for event in events
     ]
-    
-    # Filter activities if needed
-    if filter_type != "all":
-        activities = [act for act in activities if act["type"] == filter_type]
-    
+    return activities, (encode_cursor((next_before,)) if next_before is not None else None)
+
+@app.get("/api/v1/reports/activity-log")
+async def get_activity_log(
+    filter_type: str = "all",
+    limit: int = ACTIVITY_LOG_CONFIG["PAGE_SIZE"],
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the activity log, newest first; pass `next_cursor` back as `cursor` for older entries"""
+    activities, next_cursor = await build_activity_log(current_user["id"], filter_type, limit, cursor)
+    return {
+        "status": "success",
+        "data": activities,
+        "next_cursor": next_cursor
+    }
+
+@app.get("/api/v1/reports/dashboard")
+async def get_reports_dashboard(
+    period: str = "30d",
+    trend_period: str = "monthly",
+    sort_by: str = "findings",
+    filter_type: str = "all",
+    current_user: dict = Depends(get_current_user)
+):
+    """Everything the reports page shows, in one round-trip"""
+    activity_log_page, _ = await build_activity_log(current_user["id"], filter_type)
     return {
         "status": "success",
-        "data": activities
+        "data": {
+            "metrics": build_reports_metrics(current_user["id"]),
+            "activity": build_activity_chart(current_user["id"], period),
+            "investigation_types": build_investigation_types_chart(current_user["id"]),
+            "success_trends": build_success_trends_chart(current_user["id"], trend_period),
+            "priority_distribution": build_priority_distribution_chart(current_user["id"]),
+            "top_investigations": build_top_investigations(current_user["id"], sort_by),
+            "activity_log": activity_log_page
+        }
     }
 
 @app.post("/api/v1/reports/export")
 async def export_report(export_data: dict, current_user: dict = Depends(get_current_user)):
-    """Export report in specified format"""
+    """Queue a report export (csv, json or pdf); poll `status_url`, then fetch `download_url`"""
     
-    format_type = export_data.get("format", "pdf")
-    date_range = export_data.get("date_range", {})
-    
-    # In a real implementation, this would generate actual files
-    # For demo, simulate the export process
+    format_type = str(export_data.get("format", "pdf")).lower()
+    format_type = EXPORT_CONFIG["ALIASES"].get(format_type, format_type)
+    if format_type not in EXPORT_CONFIG["FORMATS"]:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_CONFIG['FORMATS'])}")
+    date_range = export_data.get("date_range") or {}
+    try:
+        start = parse_day(date_range["start"]).isoformat() if date_range.get("start") else None
+        end = (parse_day(date_range["end"]) + timedelta(days=1)).isoformat() if date_range.get("end") else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="date_range start/end must be YYYY-MM-DD")
     
-    export_id = f"export_{int(time.time())}"
+    # Solo los cambios en las investigaciones de este usuario invalidan sus exportaciones
+    version = await asyncio.to_thread(user_data_versions.get, current_user["id"])
+    job, reused = export_jobs.submit(current_user, format_type, start, end, version)
     
     return {
         "status": "success",
-        "message": f"Report export initiated in {format_type.upper()} format",
-        "data": {
-            "export_id": export_id,
-            "format": format_type,
-            "estimated_completion": "2-3 minutes",
-            "download_url": f"/api/v1/reports/download/{export_id}"
-        }
+        "message": (
+            f"Reusing existing {format_type.upper()} export" if reused
+            else f"Report export queued in {format_type.upper()} format"
+        ),
+        "data": export_job_view(job)
     }
 
-@app.get("/api/v1/reports/download/{export_id}")
-async def download_report(export_id: str, current_user: dict = Depends(get_current_user)):
-    """Download exported report"""
-    
-    # In a real implementation, this would serve the actual file
-    # For demo, return file info
-    
+@app.get("/api/v1/reports/export/{export_id}")
+async def get_export_status(export_id: str, current_user: dict = Depends(get_current_user)):
+    """Poll the status of a report export"""
+    job = export_jobs.get(export_id, current_user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
     return {
         "status": "success",
-        "message": "Report ready for download",
-        "data": {
-            "export_id": export_id,
-            "filename": f"osint_report_{export_id}.pdf",
-            "size": "2.4 MB",
-            "created_at": datetime.now().isoformat()
-        }
+        "data": export_job_view(job)
     }
 
+@app.get("/api/v1/reports/download/{export_id}")
+async def download_report(export_id: str, current_user: dict = Depends(get_current_user)):
+    """Download a finished export (supports Range requests)"""
+    job = export_jobs.get(export_id, current_user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is {job['status']}")
+    
+    return FileResponse(
+        job["path"],
+        media_type=EXPORT_CONFIG["FORMATS"][job["format"]],
+        filename=f"osint_report_{export_id}.{job['format']}"
+    )
+
 @app.post("/api/v1/reports/custom")
 async def generate_custom_report(report_config: dict, current_user: dict = Depends(get_current_user)):
-    """Generate custom report based on configuration"""
+    """Run a custom report: every metric is computed in one pass over the filtered investigations.
+
+    `metrics` takes preset names (investigations, findings, performance,
+    trends) and/or definitions like `{"name", "agg", "field", "group_by",
+    "where"}`. Results are cached until the user's investigations change.
+    """
     
     required_fields = ["name", "type"]
     for field in required_fields:
         if field not in report_config:
             raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
     
+    query = CustomReportQuery(report_config.get("filters"), report_config.get("metrics") or ["investigations"])
+    user_id = current_user["id"]
+    version = await asyncio.to_thread(user_data_versions.get, user_id)
+    result = custom_report_cache.get(user_id, query.key, version)
+    cached = result is not None
+    if not cached:
+        result = await asyncio.to_thread(query.run, investigation_repo, user_id)
+        custom_report_cache.put(user_id, query.key, version, result)
+    
     custom_report = {
-        "id": f"custom_{int(time.time())}",
+        "id": f"custom_{hashlib.sha256(query.key.encode()).hexdigest()[:16]}",
         "name": report_config["name"],
         "type": report_config["type"],
         "metrics": report_config.get("metrics", []),
         "filters": report_config.get("filters", {}),
         "created_at": datetime.now().isoformat(),
         "created_by": current_user["email"],
-        "status": "generating"
+        "status": "completed",
+        "results": result["results"],
+        "matched": result["matched"],
+        "scanned": result["scanned"],
+        "query": query.explain(),
+        "cached": cached
     }
     
     return {
         "status": "success",
-        "message": "Custom report generation started",
+        "message": "Custom report generated",
         "data": custom_report
     }
 
@@ -1210,8 +6077,30 @@ async def health():
         "status": "healthy",
         "service": "osint-platform",
         "timestamp": datetime.now().isoformat(),
-        "users": len(users_db),
-        "investigations": len(investigations_db)
+        "users": await asyncio.to_thread(user_repo.count),
+        "investigations": await asyncio.to_thread(investigation_repo.count),
+        "load": {
+            "in_flight": admission_stats["in_flight"],
+            "event_loop_lag_ms": round(loop_lag_monitor.lag_ms, 1),
+            "rate_limited": admission_stats["rate_limited"],
+            "shed": admission_stats["shed"]
+        },
+        "password_hashing": {
+            **password_hash_stats,
+            "workers": PASSWORD_HASH_CONFIG["WORKERS"]
+        },
+        "exports": {
+            **export_jobs.stats,
+            "workers": EXPORT_CONFIG["WORKERS"]
+        },
+        "dns": {
+            **dns_resolver.stats,
+            "cached": dns_resolver.cache_size,
+            "upstreams": [host for host, _ in dns_resolver.upstreams]
+        },
+        "whois": whois_client.stats,
+        "ct_index": ct_index.stats(),
+        "passive_dns": passive_dns.stats()
     }
 
 @app.post("/auth/register")
@@ -1219,14 +6108,16 @@ async def register(user_data: UserCreate):
     """Register new user"""
     email = str(user_data.email).lower()
     
-    if email in users_db:
+    if await asyncio.to_thread(cached_user, email) is not None:
         raise HTTPException(status_code=400, detail="User already exists")
     
+    hashed_password = await hash_password_async(user_data.password)
+    
     user_id = secrets.token_hex(16)
-    users_db[email] = {
+    user = {
         "id": user_id,
         "email": email,
-        "hashed_password": hash_password(user_data.password),
+        "hashed_password": hashed_password,
         "role": user_data.role,
         "is_active": True,
         "created_at": datetime.now().isoformat(),
@@ -1235,6 +6126,10 @@ async def register(user_data: UserCreate):
             "email:investigate", "social:investigate"
         ]
     }
+    # La clave primaria resuelve la carrera con otro registro del mismo email
+    if not await asyncio.to_thread(user_repo.create, user):
+        raise HTTPException(status_code=400, detail="User already exists")
+    users_db[email] = user
     
     return {"message": "User created successfully", "user_id": user_id}
 
@@ -1242,16 +6137,21 @@ async def register(user_data: UserCreate):
 async def login(login_data: UserLogin):
     """User login"""
     email = str(login_data.email).lower()
-    user = users_db.get(email)
+    user = await asyncio.to_thread(cached_user, email)
     
-    if not user or not verify_password(login_data.password, user["hashed_password"]):
+    if not user or not await verify_password_async(login_data.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if password_needs_rehash(user["hashed_password"]):
+        user["hashed_password"] = await hash_password_async(login_data.password)
+        await asyncio.to_thread(user_repo.update_password, email, user["hashed_password"])
+    
     token = create_token(email)
     
     return {
         "access_token": token,
         "token_type": "bearer",
+        "expires_in": TOKEN_CONFIG["TTL_SECONDS"],
         "user": {
             "id": user["id"],
             "email": user["email"],
@@ -1260,6 +6160,14 @@ async def login(login_data: UserLogin):
         }
     }
 
+@app.post("/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Revoke the current token"""
+    if await asyncio.to_thread(resolve_user_from_token, credentials.credentials) is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    await asyncio.to_thread(revoke_token, credentials.credentials)
+    return {"message": "Logged out"}
+
 @app.get("/auth/profile")
 async def get_profile(current_user: Dict = Depends(get_current_user)):
     """Get user profile"""
@@ -1272,36 +6180,6 @@ async def get_profile(current_user: Dict = Depends(get_current_user)):
         "permissions": current_user.get("permissions", [])
     }
 
-@app.post("/api/v1/investigations")
-async def create_investigation(
-    investigation: Investigation,
-    current_user: Dict = Depends(get_current_user)
-):
-    """Create new investigation"""
-    inv_id = secrets.token_hex(16)
-    investigations_db[inv_id] = {
-        "id": inv_id,
-        "name": investigation.name,
-        "description": investigation.description,
-        "type": investigation.type,
-        "user_id": current_user["id"],
-        "status": "active",
-        "created_at": datetime.now().isoformat(),
-        "entities": [],
-        "findings": []
-    }
-    
-    return {"investigation_id": inv_id, "message": "Investigation created"}
-
-@app.get("/api/v1/investigations")
-async def list_investigations(current_user: Dict = Depends(get_current_user)):
-    """List user investigations"""
-    user_investigations = [
-        inv for inv in investigations_db.values() 
-        if inv["user_id"] == current_user["id"]
-    ]
-    return {"investigations": user_investigations}
-
 @app.post("/api/v1/email/investigate")
 async def investigate_email(
     email_data: EmailInvestigation
@@ -1325,7 +6203,7 @@ async def investigate_email(
     
     # Breach check (HaveIBeenPwned API)
     if email_data.check_breaches:
-        if API_CONFIG.get('DEMO_MODE', True) or API_CONFIG.get('HIBP_API_KEY') == 'YOUR_HIBP_API_KEY_HERE':
+        if not provider_enabled("hibp"):
             # Datos simulados para modo demo
             breach_results = {
                 "breaches_found": 2,
@@ -1347,22 +6225,29 @@ async def investigate_email(
                 "source": "demo_data"
             }
         else:
-            # TODO: Implementar llamada real a HaveIBeenPwned API
-            # headers = {'hibp-api-key': API_CONFIG['HIBP_API_KEY']}
-            # response = requests.get(f'https://haveibeenpwned.com/api/v3/breachedaccount/{email}', headers=headers)
+            try:
+                breaches = await fetch_hibp_breaches(email)
+            except httpx.HTTPError as e:
+                raise HTTPException(status_code=502, detail=f"HIBP lookup failed: {e}")
             breach_results = {
-                "breaches_found": 0,
-                "breaches": [],
+                "breaches_found": len(breaches),
+                "breaches": [
+                    {
+                        "name": breach.get("Name"),
+                        "date": breach.get("BreachDate"),
+                        "verified": breach.get("IsVerified", False),
+                        "data_classes": breach.get("DataClasses", [])
+                    } for breach in breaches
+                ],
                 "last_checked": datetime.now().isoformat(),
-                "source": "hibp_api",
-                "note": "API real no implementada aún - configure DEMO_MODE = True"
+                "source": "hibp_api"
             }
         
         results["findings"]["breaches"] = breach_results
     
     # Social media check (Hunter.io y búsquedas públicas)
     if email_data.check_social:
-        if API_CONFIG.get('DEMO_MODE', True) or API_CONFIG.get('HUNTER_API_KEY') == 'YOUR_HUNTER_API_KEY_HERE':
+        if not provider_enabled("hunter"):
             # Datos simulados para modo demo
             social_results = {
                 "platforms_found": ["twitter", "linkedin"],
@@ -1383,28 +6268,47 @@ async def investigate_email(
                 "source": "demo_data"
             }
         else:
-            # TODO: Implementar búsquedas reales en redes sociales
-            # Usar Hunter.io API para encontrar perfiles asociados
+            try:
+                person = (await fetch_hunter_person(email)).get("data") or {}
+            except httpx.HTTPError as e:
+                raise HTTPException(status_code=502, detail=f"Hunter lookup failed: {e}")
+            profiles = []
+            for platform in ("twitter", "linkedin", "github", "facebook"):
+                handle = (person.get(platform) or {}).get("handle")
+                if handle:
+                    profiles.append({"platform": platform, "username": handle, "verified": False})
             social_results = {
-                "platforms_found": [],
-                "platforms": [],
-                "profiles": [],
-                "source": "hunter_api",
-                "note": "API real no implementada aún - configure DEMO_MODE = True"
+                "platforms_found": [profile["platform"] for profile in profiles],
+                "platforms": [profile["platform"].capitalize() for profile in profiles],
+                "profiles": profiles,
+                "source": "hunter_api"
             }
         
         results["findings"]["social_media"] = social_results
     
     # Domain intelligence
-    domain_results = {
-        "whois": {
-            "registrar": "Example Registrar",
-            "creation_date": "2015-03-20",
-            "expiry_date": "2025-03-20"
-        },
-        "mx_records": [f"mail.{domain}", f"mail2.{domain}"],
-        "reputation": "clean"
-    }
+    domain_results = {"reputation": "clean"}
+    mx, whois = await asyncio.gather(
+        dns_resolver.resolve(domain, "MX"), whois_client.lookup(domain), return_exceptions=True
+    )
+    if isinstance(whois, WhoisError):
+        domain_results["whois"] = {"error": str(whois)}
+    elif isinstance(whois, BaseException):
+        raise whois
+    else:
+        domain_results["whois"] = {
+            "registrar": whois["registrar"],
+            "creation_date": whois["creation_date"],
+            "expiry_date": whois["expiration_date"]
+        }
+    if isinstance(mx, DNSError):
+        domain_results["mx_records"] = []
+        domain_results["dns_error"] = str(mx)
+    elif isinstance(mx, BaseException):
+        raise mx
+    else:
+        domain_results["mx_records"] = [record["value"] for record in sorted(mx["records"], key=lambda r: r["priority"])]
+        domain_results["accepts_mail"] = bool(mx["records"])
     results["findings"]["domain_intelligence"] = domain_results
     
     # Risk assessment
@@ -1500,30 +6404,23 @@ async def analyze_domain(
     current_user: Dict = Depends(get_current_user)
 ):
     """Analyze domain and subdomains"""
+    # Sin WHOIS el resto del análisis sigue siendo útil
+    (records, _), whois = await asyncio.gather(
+        lookup_dns_records(domain, ["A", "AAAA", "MX", "NS", "TXT"]), whois_overview(domain)
+    )
+    records["MX"] = sorted(records["MX"], key=lambda r: r["priority"])
+    
     return {
         "domain": domain,
-        "whois": {
-            "registrar": "Example Registrar Inc.",
-            "creation_date": "2020-01-15",
-            "expiration_date": "2025-01-15",
-            "registrant": "Privacy Protected",
-            "nameservers": ["ns1.example.com", "ns2.example.com"],
-            "status": "Active"
-        },
+        "whois": whois,
         "subdomains": [
-            {"name": f"www.{domain}", "ip": "192.168.1.1", "status": "Active"},
-            {"name": f"mail.{domain}", "ip": "192.168.1.2", "status": "Active"},
-            {"name": f"ftp.{domain}", "ip": "192.168.1.3", "status": "Active"},
-            {"name": f"admin.{domain}", "ip": "192.168.1.4", "status": "Potential Risk"},
-            {"name": f"api.{domain}", "ip": "192.168.1.5", "status": "Active"}
+            {
+                "name": name,
+                "ip": None,
+                "status": "Potential Risk" if name.split(".")[0] in INTERESTING_SUBDOMAIN_LABELS else "Seen in CT logs"
+            } for name in ct_index.subdomains(domain)
         ],
-        "dns": {
-            "A": ["192.168.1.1"],
-            "AAAA": ["2001:db8::1"],
-            "MX": [f"mail.{domain}", f"mail2.{domain}"],
-            "NS": ["ns1.example.com", "ns2.example.com"],
-            "TXT": ["v=spf1 include:_spf.google.com ~all"]
-        },
+        "dns": {rtype: [record["value"] for record in values] for rtype, values in records.items()},
         "security": {
             "ssl_certificate": "Valid (Let's Encrypt)",
             "security_headers": "Partial Implementation",
@@ -1642,13 +6539,13 @@ async def docs_info():
         "documentation": "Available at /docs",
         "openapi": "Available at /openapi.json",
         "endpoints": {
-            "authentication": ["/auth/register", "/auth/login"],
+            "authentication": ["/auth/register", "/auth/login", "/auth/logout"],
             "investigations": ["/api/v1/investigations"],
-            "reports": ["/api/v1/reports/metrics", "/api/v1/reports/activity", "/api/v1/reports/export"],
+            "reports": ["/api/v1/reports/dashboard", "/api/v1/reports/metrics", "/api/v1/reports/activity", "/api/v1/reports/export"],
             "email_intel": ["/api/v1/email/investigate"],
             "search": ["/api/v1/search/engines"],
             "phone_intel": ["/api/v1/phone/investigate"],
-            "domain_intel": ["/api/v1/domain/basic-info", "/api/v1/domain/whois", "/api/v1/domain/dns", "/api/v1/domain/subdomains", "/api/v1/domain/technology", "/api/v1/domain/security", "/api/v1/domain/geolocation", "/api/v1/domain/related", "/api/v1/domain/bulk-analyze"],
+            "domain_intel": ["/api/v1/domain/basic-info", "/api/v1/domain/whois", "/api/v1/domain/dns", "/api/v1/domain/subdomains", "/api/v1/domain/technology", "/api/v1/domain/security", "/api/v1/domain/geolocation", "/api/v1/domain/related", "/api/v1/domain/profile", "/api/v1/domain/bulk-analyze"],
             "image_analysis": ["/api/v1/image/analyze", "/api/v1/image/reverse-search", "/api/v1/image/extract-metadata", "/api/v1/image/bulk-analyze"]
         }
     }
@@ -1656,8 +6553,8 @@ async def docs_info():
 def create_admin_user():
     """Create default admin user"""
     admin_email = "admin@example.com"
-    if admin_email not in users_db:
-        users_db[admin_email] = {
+    if cached_user(admin_email) is None:
+        admin = {
             "id": "admin-001",
             "email": admin_email,
             "hashed_password": hash_password("admin123"),
@@ -1671,6 +6568,8 @@ def create_admin_user():
                 "admin:users", "admin:audit", "admin:metrics"
             ]
         }
+        user_repo.create(admin)
+        users_db[admin_email] = admin
         print("✅ Admin user created:")
         print(f"   📧 Email: {admin_email}")
         print(f"   🔑 Password: admin123")
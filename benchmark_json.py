@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización JSON por endpoint.
+
+Para cada endpoint mide:
+  - encoder: payloads/s con la ruta por defecto de FastAPI (jsonable_encoder + json)
+    frente a la ruta rápida de la plataforma (render_json, con orjson si está instalado)
+  - req/s: peticiones completas contra la app en proceso (sin red), para los
+    endpoints que no simulan esperas
+
+Uso (desde la carpeta del proyecto):
+    python benchmark_json.py [--investigations 500] [--requests 200]
+
+Trabaja en un directorio temporal: el usuario, las investigaciones de prueba y
+el resto de ficheros de data/ no tocan la base de datos configurada.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import tempfile
+import time
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+
+# La app abre sus rutas de data/ (relativas al directorio actual) al importarse
+WORKDIR = tempfile.TemporaryDirectory(prefix="osint-benchmark-")
+os.chdir(WORKDIR.name)
+
+import OSINT_PLATFORM_PARA_HERMANO as platform  # noqa: E402
+
+def default_render(content) -> bytes:
+    # Lo que hace JSONResponse de FastAPI/Starlette con el resultado de un endpoint
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode()
+
+def encoder_rate(render, payload, seconds: float = 0.5) -> float:
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        render(payload)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+async def request_rate(client: httpx.AsyncClient, method: str, url: str, body, total: int, concurrency: int = 8) -> float:
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.request(method, url, json=body)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+async def main(investigations: int, requests: int):
+    platform.INBOUND_LIMIT_CONFIG["ENABLED"] = False
+    transport = httpx.ASGITransport(app=platform.app)
+
+    async with platform.app.router.lifespan_context(platform.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            email, password = f"bench-{secrets.token_hex(4)}@example.com", secrets.token_urlsafe(12)
+            (await client.post("/auth/register", json={"email": email, "password": password})).raise_for_status()
+            login = await client.post("/auth/login", json={"email": email, "password": password})
+            client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+            created = []
+            for i in range(investigations):
+                response = await client.post("/api/v1/investigations", json={
+                    "name": f"Benchmark investigation {i}",
+                    "type": ("email", "domain", "social", "phone", "image")[i % 5],
+                    "target": f"target-{i}.example.com",
+                    "description": "Generated by benchmark_json.py",
+                    "priority": ("high", "medium", "low")[i % 3],
+                    "tags": ["benchmark", f"batch-{i % 10}"]
+                })
+                investigation_id = response.json()["data"]["id"]
+                created.append(investigation_id)
+                for j in range(3):
+                    await client.post(f"/api/v1/investigations/{investigation_id}/findings", json={
+                        "content": f"Finding {j} for investigation {i}", "severity": "medium"
+                    })
+
+            # (nombre, método, url, cuerpo, medir req/s)
+            endpoints = [
+                ("health", "GET", "/health", None, True),
+                ("investigations list", "GET", "/api/v1/investigations?limit=100", None, True),
+                ("investigation detail", "GET", f"/api/v1/investigations/{created[0]}", None, True),
+                ("reports dashboard", "GET", "/api/v1/reports/dashboard", None, True),
+                ("custom report", "POST", "/api/v1/reports/custom",
+                 {"name": "bench", "type": "summary", "metrics": ["investigations", "findings", "performance", "trends"]}, True),
+                ("image analyze", "POST", "/api/v1/image/analyze", {"image_data": "data:image/png;base64,AAAA"}, False)
+            ]
+
+            encoder = "orjson" if platform.ORJSON_AVAILABLE else "stdlib json"
+            print(f"Fast path encoder: {encoder}\n")
+            print(f"{'endpoint':<22}{'bytes':>9}{'default/s':>12}{'fast/s':>12}{'speedup':>9}{'req/s':>10}")
+            for name, method, url, body, measure_requests in endpoints:
+                response = await client.request(method, url, json=body)
+                response.raise_for_status()
+                payload = response.json()
+                default_rate = encoder_rate(default_render, payload)
+                fast_rate = encoder_rate(platform.render_json, payload)
+                rate = await request_rate(client, method, url, body, requests) if measure_requests else None
+                print(
+                    f"{name:<22}{len(response.content):>9}{default_rate:>12.0f}{fast_rate:>12.0f}"
+                    f"{fast_rate / default_rate:>8.1f}x{(f'{rate:.0f}' if rate else '-'):>10}"
+                )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization per endpoint")
+    parser.add_argument("--investigations", type=int, default=500, help="Investigations to seed")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint for req/s")
+    args = parser.parse_args()
+    asyncio.run(main(args.investigations, args.requests))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Build de los archivos estáticos: static/ -> static/dist/
+
+  - CSS y JS se copian con un hash del contenido en el nombre (styles.3f9a1c2b7d4e.css)
+  - Los HTML se copian con las referencias a esos archivos reescritas
+  - Todo lo comprimible se pre-comprime en .gz y, si el paquete brotli está
+    instalado (pip install brotli), en .br
+  - manifest.json guarda nombre original -> nombre con hash
+
+El servidor sirve static/dist/ si existe (con cabeceras immutable para los
+archivos con hash) y si no, static/ tal cual. Volver a ejecutar tras cambiar
+cualquier archivo de static/.
+
+Uso:
+    python build_static.py
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+SOURCE = Path(__file__).resolve().parent / "static"
+BUILD = SOURCE / "dist"
+FINGERPRINT_SUFFIXES = (".css", ".js")
+COMPRESS_SUFFIXES = (".html", ".css", ".js", ".json", ".svg", ".txt")
+HASH_LENGTH = 12
+
+def fingerprint(path: Path) -> str:
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+def rewrite_references(html: str, assets: dict) -> str:
+    """Point src/href attributes at the fingerprinted names (relative or /static/ prefixed)"""
+    def replace(match):
+        prefix, name = match.group(2), match.group(3)
+        if name not in assets:
+            return match.group(0)
+        return f'{match.group(1)}="{prefix}{assets[name]}"'
+    return re.sub(r'\b(src|href)="((?:\./|/static/)?)([^"/?#]+)"', replace, html)
+
+def compress(path: Path):
+    data = path.read_bytes()
+    # mtime=0: el mismo contenido produce siempre el mismo .gz
+    with open(path.with_name(path.name + ".gz"), "wb") as f:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=f, compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+    if BROTLI_AVAILABLE:
+        path.with_name(path.name + ".br").write_bytes(brotli.compress(data, quality=11))
+
+def build():
+    if BUILD.exists():
+        shutil.rmtree(BUILD)
+    BUILD.mkdir()
+
+    sources = sorted(path for path in SOURCE.iterdir() if path.is_file())
+    assets = {}
+    for path in sources:
+        if path.suffix in FINGERPRINT_SUFFIXES:
+            assets[path.name] = fingerprint(path)
+            shutil.copyfile(path, BUILD / assets[path.name])
+
+    for path in sources:
+        if path.suffix == ".html":
+            (BUILD / path.name).write_text(rewrite_references(path.read_text(encoding="utf-8"), assets), encoding="utf-8")
+        elif path.suffix not in FINGERPRINT_SUFFIXES:
+            shutil.copyfile(path, BUILD / path.name)
+
+    (BUILD / "manifest.json").write_text(json.dumps({
+        "built_at": datetime.now().isoformat(),
+        "assets": assets
+    }, indent=2), encoding="utf-8")
+
+    original = compressed = 0
+    for path in sorted(BUILD.iterdir()):
+        if path.suffix in COMPRESS_SUFFIXES:
+            compress(path)
+            original += path.stat().st_size
+            compressed += path.with_name(path.name + (".br" if BROTLI_AVAILABLE else ".gz")).stat().st_size
+
+    print(f"✅ {len(assets)} assets fingerprinted, {len(sources)} files written to {BUILD}")
+    print(f"   {original / 1024:.0f} KB -> {compressed / 1024:.0f} KB ({'brotli' if BROTLI_AVAILABLE else 'gzip'})")
+    if not BROTLI_AVAILABLE:
+        print("   brotli not installed: only .gz variants generated (pip install brotli)")
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Ingesta de volcados de Certificate Transparency en el índice de subdominios.
+
+Lee exportaciones en JSON lines (planas o .gz: certstream, crt.sh, Censys...),
+extrae los nombres SAN/CN del certificado final, los normaliza y los agrupa por
+dominio registrado en CT_INDEX_CONFIG["PATH"]. Por defecto se fusiona con el
+índice existente; el servidor detecta el índice nuevo sin reiniciarse.
+
+Para agrupar bien dominios como ejemplo.co.uk, descargar la Public Suffix List
+en CT_INDEX_CONFIG["PUBLIC_SUFFIX_LIST"]:
+    curl -o data/public_suffix_list.dat https://publicsuffix.org/list/public_suffix_list.dat
+
+Uso (desde la carpeta del proyecto):
+    python ingest_ct.py dump-2024-01.jsonl.gz dump-2024-02.jsonl.gz [--rebuild]
+"""
+
+import argparse
+import time
+
+import OSINT_PLATFORM_PARA_HERMANO as platform
+
+def report(stats):
+    print(f"   {stats['records']:,} records, {stats['names']:,} names...", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest certificate transparency exports into the subdomain index")
+    parser.add_argument("sources", nargs="+", help="JSON-lines exports, optionally gzip-compressed")
+    parser.add_argument("--index", default=platform.CT_INDEX_CONFIG["PATH"], help="Index file to write")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the existing index instead of merging")
+    parser.add_argument("--buckets", type=int, default=platform.CT_INDEX_CONFIG["BUCKETS"],
+                        help="Temporary spill files (more buckets, less memory)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        stats = platform.build_ct_index(args.sources, args.index, args.buckets, merge=not args.rebuild, progress=report)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {stats['domains']:,} registered domains, {stats['indexed_names']:,} names written to {args.index}")
+    print(f"   {stats['records']:,} records from {stats['files']} files in {elapsed:.1f}s "
+          f"({stats['records'] / elapsed:,.0f} records/s)")
+    if stats["malformed"] or stats["skipped_names"]:
+        print(f"   {stats['malformed']:,} malformed lines, {stats['skipped_names']:,} names skipped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Carga masiva de resoluciones de DNS pasivo en el almacén local.
+
+Acepta CSV (cabecera domain,rrtype,value,first_seen,last_seen) o JSON lines
+(mismas claves, o rrname/rrtype/rdata/time_first/time_last de los volcados
+habituales de DNS pasivo), planos o .gz. Las fechas pueden ser epoch o ISO 8601.
+Por defecto se fusiona con el almacén existente (PASSIVE_DNS_CONFIG["PATH"]);
+el servidor detecta el fichero nuevo sin reiniciarse.
+
+Uso (desde la carpeta del proyecto):
+    python load_passive_dns.py resoluciones-2024.csv.gz mas.jsonl [--rebuild]
+"""
+
+import argparse
+import time
+
+import OSINT_PLATFORM_PARA_HERMANO as platform
+
+def report(stats):
+    print(f"   {stats['rows']:,} rows...", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load passive DNS resolutions into the local store")
+    parser.add_argument("sources", nargs="+", help="CSV or JSON-lines files, optionally gzip-compressed")
+    parser.add_argument("--store", default=platform.PASSIVE_DNS_CONFIG["PATH"], help="Store file to write")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the existing store instead of merging")
+    parser.add_argument("--buckets", type=int, default=platform.PASSIVE_DNS_CONFIG["BUCKETS"],
+                        help="Temporary spill files per table, all open at once (more buckets, less memory)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        stats = platform.build_passive_dns_store(args.sources, args.store, args.buckets, merge=not args.rebuild, progress=report)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {stats['stored_rows']:,} rows ({stats['domains']:,} domains, {stats['values']:,} values) written to {args.store}")
+    print(f"   {stats['rows']:,} rows from {stats['files']} files in {elapsed:.1f}s ({stats['rows'] / elapsed:,.0f} rows/s)")
+    if stats["skipped"]:
+        print(f"   {stats['skipped']:,} unusable rows skipped")
+
+if __name__ == "__main__":
+    main()
@@ -623,6 +623,15 @@ class OSINTPlatform {
     }
 
     logout() {
+        if (this.token) {
+            // Revoca el token en el servidor; la sesión local se cierra igualmente
+            fetch(`${this.apiBase}/auth/logout`, {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${this.token}`
+                }
+            }).catch(() => {});
+        }
         this.token = null;
         this.currentUser = null;
         localStorage.removeItem('osint_token');
@@ -661,13 +670,13 @@ class OSINTPlatform {
     async loadDashboardData() {
         try {
             // Load investigations count
-            const investigationsResponse = await fetch(`${this.apiBase}/api/v1/investigations`, {
+            const investigationsResponse = await fetch(`${this.apiBase}/api/v1/investigations?limit=1&fields=id`, {
                 headers: { 'Authorization': `Bearer ${this.token}` }
             });
             
             if (investigationsResponse.ok) {
                 const investigations = await investigationsResponse.json();
-                document.getElementById('totalInvestigations').textContent = investigations.length || 0;
+                document.getElementById('totalInvestigations').textContent = investigations.data.total || 0;
             }
 
             // Simulate other stats
@@ -1583,12 +1592,13 @@ OSINTPlatform.prototype.displayDomainResults = function(data) {
         <div class="domain-info">
             <div class="info-section">
                 <h4>WHOIS Information</h4>
+                ${data.whois.error ? `<div class="info-grid"><div><strong>Unavailable:</strong> ${data.whois.error}</div></div>` : `
                 <div class="info-grid">
                     <div><strong>Registrar:</strong> ${data.whois.registrar}</div>
                     <div><strong>Created:</strong> ${data.whois.creation_date}</div>
                     <div><strong>Expires:</strong> ${data.whois.expiration_date}</div>
                     <div><strong>Status:</strong> <span class="status-active">${data.whois.status}</span></div>
-                </div>
+                </div>`}
             </div>
             <div class="info-section">
                 <h4>Subdomains Found</h4>
@@ -1772,7 +1782,8 @@ OSINTPlatform.prototype.displayImageResults = function(data) {
 
 OSINTPlatform.prototype.loadInvestigationsData = async function() {
     try {
-        const response = await fetch(`${this.apiBase}/api/v1/investigations`, {
+        // Solo las 3 más recientes y los campos que muestra el panel
+        const response = await fetch(`${this.apiBase}/api/v1/investigations?limit=3&fields=id,name,type,status,target`, {
             headers: {
                 'Authorization': `Bearer ${this.token}`
             }
@@ -1781,7 +1792,7 @@ OSINTPlatform.prototype.loadInvestigationsData = async function() {
         if (response.ok) {
             const data = await response.json();
             this.updateInvestigationsStats(data.data.statistics);
-            this.displayRecentInvestigations(data.data.investigations.slice(0, 3));
+            this.displayRecentInvestigations(data.data.investigations);
         } else {
             throw new Error('Failed to load investigations');
         }
@@ -94,11 +94,11 @@ class DomainIntelligence {
                 const data = result.data;
                 
                 document.getElementById('domainName').textContent = data.domain;
-                document.getElementById('domainIP').textContent = data.ip;
-                document.getElementById('sslStatus').textContent = data.ssl_status;
-                document.getElementById('registrationDate').textContent = data.registration_date;
-                document.getElementById('expirationDate').textContent = data.expiration_date;
-                document.getElementById('registrar').textContent = data.registrar;
+                document.getElementById('domainIP').textContent = data.ip || 'No A record';
+                document.getElementById('sslStatus').textContent = data.ssl_status || 'Not checked';
+                document.getElementById('registrationDate').textContent = data.registration_date || 'Unknown';
+                document.getElementById('expirationDate').textContent = data.expiration_date || 'Unknown';
+                document.getElementById('registrar').textContent = data.registrar || 'Unknown';
             } else {
                 throw new Error('API request failed');
             }
@@ -1,5 +1,16 @@
 // Reports & Analytics JavaScript
 
+// Secciones de /api/v1/reports/dashboard que sustituyen a cada petición individual
+const REPORT_BUNDLE_SECTIONS = {
+    '/api/v1/reports/metrics': 'metrics',
+    '/api/v1/reports/top-investigations?sort_by=findings': 'top_investigations',
+    '/api/v1/reports/activity-log?filter_type=all': 'activity_log',
+    '/api/v1/reports/activity?period=30d': 'activity',
+    '/api/v1/reports/investigation-types': 'investigation_types',
+    '/api/v1/reports/success-trends?period=monthly': 'success_trends',
+    '/api/v1/reports/priority-distribution': 'priority_distribution'
+};
+
 class ReportsManager {
     constructor() {
         this.charts = {};
@@ -48,6 +59,9 @@ class ReportsManager {
 
     async loadReportsData() {
         try {
+            // One round-trip for the whole page; sections fall back to their own endpoint
+            await this.loadDashboardBundle();
+            
             // Load all data from API endpoints
             await this.loadMetrics();
             await this.loadTopInvestigations();
@@ -66,16 +80,42 @@ class ReportsManager {
         } catch (error) {
             console.error('Error loading reports data:', error);
             this.showToast('Error loading reports data', 'error');
+        } finally {
+            // Later refreshes must hit the API again
+            this.bundle = null;
         }
     }
 
-    async loadMetrics() {
+    async loadDashboardBundle() {
         try {
-            const response = await fetch('/api/v1/reports/metrics', {
+            const response = await fetch('/api/v1/reports/dashboard', {
                 headers: {
                     'Authorization': `Bearer ${localStorage.getItem('token')}`
                 }
             });
+            this.bundle = response.ok ? (await response.json()).data : null;
+        } catch (error) {
+            console.error('Error loading reports bundle:', error);
+            this.bundle = null;
+        }
+    }
+
+    fetchReport(url) {
+        const section = REPORT_BUNDLE_SECTIONS[url];
+        if (this.bundle && section && section in this.bundle) {
+            const data = this.bundle[section];
+            return Promise.resolve({ ok: true, json: async () => ({ status: 'success', data }) });
+        }
+        return fetch(url, {
+            headers: {
+                'Authorization': `Bearer ${localStorage.getItem('token')}`
+            }
+        });
+    }
+
+    async loadMetrics() {
+        try {
+            const response = await this.fetchReport('/api/v1/reports/metrics');
             
             if (response.ok) {
                 const result = await response.json();
@@ -111,11 +151,7 @@ class ReportsManager {
 
     async loadTopInvestigations() {
         try {
-            const response = await fetch('/api/v1/reports/top-investigations?sort_by=findings', {
-                headers: {
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                }
-            });
+            const response = await this.fetchReport('/api/v1/reports/top-investigations?sort_by=findings');
             
             let investigations;
             if (response.ok) {
@@ -219,11 +255,7 @@ class ReportsManager {
 
     async loadActivityLog() {
         try {
-            const response = await fetch('/api/v1/reports/activity-log?filter_type=all', {
-                headers: {
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                }
-            });
+            const response = await this.fetchReport('/api/v1/reports/activity-log?filter_type=all');
             
             let activities;
             if (response.ok) {
@@ -319,11 +351,7 @@ class ReportsManager {
         const ctx = document.getElementById('activityChart').getContext('2d');
         
         try {
-            const response = await fetch('/api/v1/reports/activity?period=30d', {
-                headers: {
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                }
-            });
+            const response = await this.fetchReport('/api/v1/reports/activity?period=30d');
             
             let data;
             if (response.ok) {
@@ -432,11 +460,7 @@ class ReportsManager {
         const ctx = document.getElementById('typesChart').getContext('2d');
         
         try {
-            const response = await fetch('/api/v1/reports/investigation-types', {
-                headers: {
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                }
-            });
+            const response = await this.fetchReport('/api/v1/reports/investigation-types');
             
             let data;
             if (response.ok) {
@@ -519,11 +543,7 @@ class ReportsManager {
         const ctx = document.getElementById('successChart').getContext('2d');
         
         try {
-            const response = await fetch('/api/v1/reports/success-trends?period=monthly', {
-                headers: {
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                }
-            });
+            const response = await this.fetchReport('/api/v1/reports/success-trends?period=monthly');
             
             let data;
             if (response.ok) {
@@ -640,11 +660,7 @@ class ReportsManager {
         const ctx = document.getElementById('priorityChart').getContext('2d');
         
         try {
-            const response = await fetch('/api/v1/reports/priority-distribution', {
-                headers: {
-                    'Authorization': `Bearer ${localStorage.getItem('token')}`
-                }
-            });
+            const response = await this.fetchReport('/api/v1/reports/priority-distribution');
             
             let data;
             if (response.ok) {
@@ -960,7 +976,7 @@ class ReportsManager {
         tbody.innerHTML = '';
         
         investigations.forEach(inv => {
-            const successRate = inv.success_rate || inv.successRate || 0;
+            const progress = inv.progress || inv.success_rate || 0;
             const row = document.createElement('tr');
             row.innerHTML = `
                 <td>
@@ -975,9 +991,9 @@ class ReportsManager {
                 <td>
                     <div class="success-rate">
                         <div class="success-bar">
-                            <div class="success-fill" style="width: ${successRate}%"></div>
+                            <div class="success-fill" style="width: ${progress}%"></div>
                         </div>
-                        <span>${successRate}%</span>
+                        <span>${progress}%</span>
                     </div>
                 </td>
                 <td><span class="status-badge status-${inv.status}">${inv.status}</span></td>
@@ -1160,18 +1176,14 @@ class ReportsManager {
             
             if (response.ok) {
                 const result = await response.json();
+                const job = await this.waitForExport(result.data);
                 this.hideLoading();
-                this.showToast(`${format.toUpperCase()} report export initiated successfully`, 'success');
-                
-                // Simulate download after a delay
-                setTimeout(() => {
-                    this.showToast('Report ready for download', 'info');
-                    // In a real implementation, this would use the download_url from the response
-                    const link = document.createElement('a');
-                    link.href = '#';
-                    link.download = `osint-report-${result.data.export_id}.${format}`;
-                    link.click();
-                }, 3000);
+                if (job.status === 'completed') {
+                    await this.downloadExport(job);
+                    this.showToast(`${format.toUpperCase()} report exported successfully`, 'success');
+                } else {
+                    this.showToast(`Export failed: ${job.error || 'unknown error'}`, 'error');
+                }
             } else {
                 this.hideLoading();
                 this.showToast('Export failed. Please try again.', 'error');
@@ -1179,15 +1191,34 @@ class ReportsManager {
         } catch (error) {
             console.error('Export error:', error);
             this.hideLoading();
-            // Fallback to simulated export
-            setTimeout(() => {
-                this.showToast(`${format.toUpperCase()} report exported successfully`, 'success');
-                const link = document.createElement('a');
-                link.href = '#';
-                link.download = `osint-report.${format}`;
-                link.click();
-            }, 2000);
+            this.showToast('Export failed. Please try again.', 'error');
+        }
+    }
+
+    async waitForExport(job) {
+        // Poll the export job until the worker process has finished the file
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const response = await fetch(job.status_url, {
+                headers: { 'Authorization': `Bearer ${localStorage.getItem('token')}` }
+            });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            job = (await response.json()).data;
         }
+        return job;
+    }
+
+    async downloadExport(job) {
+        const response = await fetch(job.download_url, {
+            headers: { 'Authorization': `Bearer ${localStorage.getItem('token')}` }
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const url = URL.createObjectURL(await response.blob());
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = `osint-report-${job.export_id}.${job.format}`;
+        link.click();
+        URL.revokeObjectURL(url);
     }
 
     exportAllReports() {
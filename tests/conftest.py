@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# La plataforma es un único módulo en la raíz del proyecto
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
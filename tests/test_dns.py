@@ -0,0 +1,195 @@
+"""
+DNS stub resolver against a local UDP/TCP fake upstream.
+
+Uso (desde la carpeta del proyecto):
+    python -m pytest -q tests
+"""
+
+import asyncio
+import socket
+import struct
+import time
+from contextlib import asynccontextmanager
+
+import OSINT_PLATFORM_PARA_HERMANO as platform
+
+SOA_MINIMUM = 30
+LONG_TXT = [b"x" * 200 for _ in range(30)]  # ~6 KB: no cabe en UDP (EDNS 1232), pide TCP
+
+
+def soa_record(zone: str, ttl: int, minimum: int) -> bytes:
+    mname = platform.encode_dns_name(f"ns.{zone}")
+    rdata = mname + mname + struct.pack("!IIIII", 1, 7200, 3600, 1209600, minimum)
+    return platform.encode_dns_name(zone) + struct.pack("!HHIH", 6, 1, ttl, len(rdata)) + rdata
+
+
+def answer_record(rtype: int, ttl: int, rdata: bytes) -> bytes:
+    # Nombre comprimido: puntero a la pregunta (offset 12)
+    return b"\xc0\x0c" + struct.pack("!HHIH", rtype, 1, ttl, len(rdata)) + rdata
+
+
+class FakeDNSServer:
+    """Upstream on localhost answering A/AAAA/MX/TXT for *.test over UDP and TCP.
+
+    `missing.test` is NXDOMAIN, other types are NODATA (SOA in authority) and
+    `big.test` TXT sets TC over UDP, only answering in full over TCP.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.udp = None
+        self.tcp = None
+
+    def reply(self, query: bytes, over_tcp: bool) -> bytes:
+        txid = struct.unpack_from("!H", query)[0]
+        name, offset = platform.read_dns_name(query, 12)
+        qtype = struct.unpack_from("!H", query, offset)[0]
+        self.queries.append((name, platform.DNS_TYPE_NAMES.get(qtype, qtype), "tcp" if over_tcp else "udp"))
+        question = query[12:offset + 4]
+
+        rcode, truncated, answers, authority = 0, False, [], []
+        if name == "missing.test":
+            rcode = 3
+            authority.append(soa_record("test", 600, 3600))
+        elif name == "big.test" and qtype == 16:
+            if over_tcp:
+                answers = [answer_record(16, 60, bytes([len(chunk)]) + chunk) for chunk in LONG_TXT]
+            else:
+                truncated = True
+        elif qtype == 1:
+            answers.append(answer_record(1, 120, socket.inet_aton("192.0.2.10")))
+        elif qtype == 28:
+            answers.append(answer_record(28, 120, socket.inet_pton(socket.AF_INET6, "2001:db8::10")))
+        elif qtype == 15:
+            answers.append(answer_record(15, 300, struct.pack("!H", 10) + platform.encode_dns_name(f"mail.{name}")))
+        elif qtype == 16:
+            answers.append(answer_record(16, 300, b"\x0bv=spf1 -all"))
+        else:
+            authority.append(soa_record("test", 900, SOA_MINIMUM))
+
+        flags = 0x8180 | rcode | (0x0200 if truncated else 0)
+        header = struct.pack("!HHHHHH", txid, flags, 1, len(answers), len(authority), 0)
+        return header + question + b"".join(answers) + b"".join(authority)
+
+    async def _handle_tcp(self, reader, writer):
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+        response = self.reply(await reader.readexactly(length), over_tcp=True)
+        writer.write(struct.pack("!H", len(response)) + response)
+        await writer.drain()
+        writer.close()
+
+    async def start(self):
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                self.transport.sendto(server.reply(data, over_tcp=False), addr)
+
+        loop = asyncio.get_running_loop()
+        self.udp, _ = await loop.create_datagram_endpoint(Protocol, local_addr=("127.0.0.1", 0))
+        self.tcp = await asyncio.start_server(self._handle_tcp, "127.0.0.1", self.port)
+        return self
+
+    @property
+    def port(self):
+        return self.udp.get_extra_info("sockname")[1]
+
+    def count(self, name, rtype):
+        return sum(1 for query in self.queries if query[:2] == (name, rtype))
+
+    async def close(self):
+        self.udp.close()
+        self.tcp.close()
+        await self.tcp.wait_closed()
+
+
+@asynccontextmanager
+async def dns_server():
+    """Fake upstream plus a resolver pointed at it"""
+    server = await FakeDNSServer().start()
+    resolver = platform.AsyncDNSResolver(
+        ["127.0.0.1"], server.port, timeout=1.0, attempts=2, sockets=2,
+        max_in_flight=64, cache_entries=100, max_ttl=3600, negative_ttl=300
+    )
+    try:
+        yield resolver, server
+    finally:
+        resolver.close()
+        await server.close()
+
+
+def test_resolve_many_queries_every_type_in_parallel():
+    async def scenario():
+        async with dns_server() as (resolver, server):
+            answers = await resolver.resolve_many("Example.Test.", ["A", "AAAA", "MX", "TXT", "NS"])
+
+            assert answers["A"]["records"] == [{"value": "192.0.2.10", "ttl": 120}]
+            assert answers["AAAA"]["records"] == [{"value": "2001:db8::10", "ttl": 120}]
+            assert answers["MX"]["records"] == [{"value": "mail.example.test", "priority": 10, "ttl": 300}]
+            assert answers["TXT"]["records"] == [{"value": "v=spf1 -all", "ttl": 300}]
+            # NODATA: sin registros pero sin error
+            assert answers["NS"]["rcode"] == "NOERROR"
+            assert answers["NS"]["records"] == []
+            assert sorted(rtype for _, rtype, _ in server.queries) == ["A", "AAAA", "MX", "NS", "TXT"]
+
+            # Consultas simultáneas del mismo nombre y tipo comparten una sola
+            await asyncio.gather(*(resolver.resolve("burst.test", "A") for _ in range(20)))
+            assert server.count("burst.test", "A") == 1
+
+    asyncio.run(scenario())
+
+
+def test_truncated_reply_falls_back_to_tcp():
+    async def scenario():
+        async with dns_server() as (resolver, server):
+            answer = await resolver.resolve("big.test", "TXT")
+
+            assert [record["value"] for record in answer["records"]] == [chunk.decode() for chunk in LONG_TXT]
+            assert [query for query in server.queries if query[0] == "big.test"] == [
+                ("big.test", "TXT", "udp"), ("big.test", "TXT", "tcp")
+            ]
+            assert resolver.stats["tcp_fallbacks"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_nxdomain_is_cached():
+    async def scenario():
+        async with dns_server() as (resolver, server):
+            answer = await resolver.resolve("missing.test", "A")
+            assert answer["rcode"] == "NXDOMAIN"
+            assert answer["records"] == []
+
+            again = await resolver.resolve("missing.test", "A")
+            assert again["rcode"] == "NXDOMAIN"
+            assert server.count("missing.test", "A") == 1
+            assert resolver.stats["negative_hits"] == 1
+
+            # TTL negativo: mínimo del SOA, con tope NEGATIVE_TTL
+            expires, _ = resolver._cache[("missing.test", 1)]
+            assert expires - time.monotonic() <= 300 + 1
+
+    asyncio.run(scenario())
+
+
+def test_repeated_lookup_served_from_cache():
+    async def scenario():
+        async with dns_server() as (resolver, server):
+            first = await resolver.resolve("example.test", "A")
+            second = await resolver.resolve("EXAMPLE.test.", "A")
+
+            assert second["records"][0]["value"] == first["records"][0]["value"]
+            assert second["records"][0]["ttl"] <= 120
+            assert server.count("example.test", "A") == 1
+            assert resolver.stats["cache_hits"] == 1
+            assert resolver.cache_size == 1
+
+            # NODATA se guarda durante el mínimo del SOA
+            await resolver.resolve("example.test", "NS")
+            await resolver.resolve("example.test", "NS")
+            assert server.count("example.test", "NS") == 1
+
+    asyncio.run(scenario())
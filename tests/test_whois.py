@@ -0,0 +1,219 @@
+"""
+WHOIS client against local port-43 fakes: IANA bootstrap -> registry -> registrar.
+
+Uso (desde la carpeta del proyecto):
+    python -m pytest -q tests
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+import OSINT_PLATFORM_PARA_HERMANO as platform
+
+REGISTRY_REPLY = """\
+   Domain Name: EXAMPLE.TEST
+   Registry Domain ID: 2336799_DOMAIN_TEST-VRSN
+   Registrar WHOIS Server: {registrar}
+   Updated Date: 2024-08-14T07:01:34Z
+   Creation Date: 1995-08-14T04:00:00Z
+   Registry Expiry Date: 2025-08-13T04:00:00Z
+   Registrar: Example Registrar, Inc.
+   Domain Status: clientDeleteProhibited https://icann.org/epp#clientDeleteProhibited
+   Domain Status: clientTransferProhibited https://icann.org/epp#clientTransferProhibited
+   Name Server: A.IANA-SERVERS.NET
+   Name Server: B.IANA-SERVERS.NET.
+>>> Last update of whois database: 2024-09-01T00:00:00Z <<<
+"""
+
+REGISTRAR_REPLY = """\
+% Registrar reply
+Domain Name: example.test
+Registrar: Example Registrar, Inc.
+Registrant Name: Jane Doe
+Registrant Organization: Example Org
+Registrant Street: 1 Main St
+Registrant City: Springfield
+Registrant State/Province: CA
+Registrant Postal Code: 90000
+Registrant Country: US
+Admin Email: admin@example.test
+Tech Email: tech@example.test
+"""
+
+NOT_FOUND_REPLY = 'No match for "MISSING.TEST".\r\n>>> Last update of whois database: 2024-09-01T00:00:00Z <<<\r\n'
+
+
+class FakeWhoisServer:
+    """Port-43 server on localhost answering from a query -> reply table"""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.queries = []
+        self.server = None
+
+    async def _handle(self, reader, writer):
+        query = (await reader.readline()).decode().strip()
+        self.queries.append(query)
+        writer.write(self.replies.get(query.lower(), "").encode())
+        await writer.drain()
+        writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+@asynccontextmanager
+async def whois_servers(registrar_replies=None):
+    """IANA, registry and registrar fakes plus a client bootstrapped from the IANA one"""
+    registrar = await FakeWhoisServer(registrar_replies or {"example.test": REGISTRAR_REPLY}).start()
+    registry = await FakeWhoisServer({
+        "example.test": REGISTRY_REPLY.format(registrar=registrar.address),
+        "other.test": REGISTRY_REPLY.format(registrar=registrar.address).replace("EXAMPLE.TEST", "OTHER.TEST"),
+        "missing.test": NOT_FOUND_REPLY
+    }).start()
+    iana = await FakeWhoisServer({
+        "test": f"% IANA WHOIS server\ndomain:       TEST\nwhois:        {registry.address}\n",
+        "nowhere": "% IANA WHOIS server\n% This query returned 0 objects.\n"
+    }).start()
+    client = platform.AsyncWhoisClient(
+        bootstrap=iana.address, servers={}, port=43, timeout=2.0, max_per_server=2, min_interval=0,
+        max_referrals=2, max_response_bytes=65536, cache_ttl=60, cache_entries=100
+    )
+    try:
+        yield client, iana, registry, registrar
+    finally:
+        for server in (iana, registry, registrar):
+            await server.close()
+
+
+def test_parse_whois_response_maps_registry_fields():
+    record = platform.parse_whois_response(REGISTRY_REPLY.format(registrar="whois.registrar.test"))
+
+    assert record["registered"] is True
+    assert record["registrar"] == "Example Registrar, Inc."
+    assert record["creation_date"] == "1995-08-14T04:00:00Z"
+    assert record["expiration_date"] == "2025-08-13T04:00:00Z"
+    assert record["updated_date"] == "2024-08-14T07:01:34Z"
+    assert record["name_servers"] == ["a.iana-servers.net", "b.iana-servers.net"]
+    assert record["status"] == ["clientDeleteProhibited", "clientTransferProhibited"]
+    assert record["referral"] == "whois.registrar.test"
+
+
+def test_parse_whois_response_builds_contacts():
+    record = platform.parse_whois_response(REGISTRAR_REPLY)
+
+    assert record["registrant"] == {
+        "name": "Jane Doe",
+        "organization": "Example Org",
+        "address": "1 Main St, Springfield, CA 90000, US"
+    }
+    assert record["admin"] == {"email": "admin@example.test"}
+    assert record["technical"] == {"email": "tech@example.test"}
+
+
+def test_parse_whois_response_detects_not_found():
+    record = platform.parse_whois_response(NOT_FOUND_REPLY)
+
+    assert record["registered"] is False
+    assert record["registrar"] is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-08-14T07:01:34Z", "2024-08-14T07:01:34Z"),
+    ("2024-08-14T09:01:34+02:00", "2024-08-14T07:01:34Z"),
+    ("2024-08-14", "2024-08-14T00:00:00Z"),
+    ("14-Aug-2024", "2024-08-14T00:00:00Z"),
+    ("2024.08.14", "2024-08-14T00:00:00Z"),
+    ("2024/08/14", "2024-08-14T00:00:00Z"),
+    ("14.08.2024", "2024-08-14T00:00:00Z"),
+    ("2024-08-14 07:01:34 (GMT+0:00)", "2024-08-14T07:01:34Z"),
+    ("before 1996", "before 1996"),
+])
+def test_normalize_whois_date(value, expected):
+    assert platform.normalize_whois_date(value) == expected
+
+
+def test_lookup_follows_referral_chain():
+    async def scenario():
+        async with whois_servers() as (client, iana, registry, registrar):
+            record = await client.lookup("Example.Test.")
+
+            assert iana.queries == ["test"]
+            assert registry.queries == ["example.test"]
+            assert registrar.queries == ["example.test"]
+            assert record["whois_server"] == registrar.address
+            assert "referral" not in record
+            # Fechas y servidores del registro, contactos del registrador
+            assert record["creation_date"] == "1995-08-14T04:00:00Z"
+            assert record["name_servers"] == ["a.iana-servers.net", "b.iana-servers.net"]
+            assert record["registrant"]["organization"] == "Example Org"
+            assert client.stats["referrals"] == 1
+
+            # El servidor del TLD y el registro quedan en caché
+            await client.lookup("example.test")
+            await client.lookup("other.test")
+            assert iana.queries == ["test"]
+            assert registry.queries == ["example.test", "other.test"]
+            assert client.stats["cache_hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_lookup_not_found_skips_referral():
+    async def scenario():
+        async with whois_servers() as (client, iana, registry, registrar):
+            record = await client.lookup("missing.test")
+
+            assert record["registered"] is False
+            assert record["whois_server"] == registry.address
+            assert registrar.queries == []
+
+    asyncio.run(scenario())
+
+
+def test_lookup_keeps_registry_record_when_registrar_fails():
+    async def scenario():
+        async with whois_servers() as (client, iana, registry, registrar):
+            await registrar.close()
+            record = await client.lookup("example.test")
+
+            assert record["registrar"] == "Example Registrar, Inc."
+            assert record["whois_server"] == registry.address
+            assert record["registrant"] == {}
+
+    asyncio.run(scenario())
+
+
+def test_lookup_unknown_tld_raises():
+    async def scenario():
+        async with whois_servers() as (client, iana, registry, registrar):
+            with pytest.raises(platform.WhoisError):
+                await client.lookup("example.nowhere")
+
+    asyncio.run(scenario())
+
+
+def test_whois_overview_reports_errors(monkeypatch):
+    async def scenario():
+        async with whois_servers() as (client, iana, registry, registrar):
+            monkeypatch.setattr(platform, "whois_client", client)
+
+            overview = await platform.whois_overview("example.test")
+            assert overview["registrar"] == "Example Registrar, Inc."
+            assert overview["registrant"] == "Example Org"
+            assert overview["status"] == "clientDeleteProhibited, clientTransferProhibited"
+
+            assert "error" in await platform.whois_overview("example.nowhere")
+
+    asyncio.run(scenario())